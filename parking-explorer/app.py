@@ -1,8 +1,11 @@
 """Franklin Parking Explorer — Streamlit front-end over the local DuckDB cache.
 
 Reads only from DuckDB (never scans DynamoDB). The sidebar "Sync" button pulls
-new snapshots via parking.sync. All aggregation is pushed into DuckDB SQL so the
-UI stays responsive over ~1.5M rows.
+new snapshots via parking.sync on a background thread, so the dashboard stays
+usable on the current data while it runs. All aggregation is pushed into DuckDB
+SQL, and charts read the rollup tables maintained by parking.store (per-snapshot
+garage rows, hourly and daily aggregates) rather than the raw ``parking`` table,
+so render time doesn't grow with the length of the history.
 """
 
 from __future__ import annotations
@@ -14,9 +17,9 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
-from parking import anomalies, store
-from parking.config import DB_PATH, LOCAL_TZ, TABLE_NAME
-from parking.sync import sync
+from parking import anomalies, export, queries, resultcache, series, service, store
+from parking.config import APP_POLL_SECONDS, DB_PATH, LOCAL_TZ, QUERY_SERVICE, TABLE_NAME
+from parking.sync import BackgroundSync
 
 st.set_page_config(page_title="Franklin Parking Explorer", page_icon="🅿️", layout="wide")
 
@@ -49,51 +52,107 @@ def _humanize_age(td: dt.timedelta) -> str:
 
 
 # --------------------------------------------------------------------------- #
-# Data access: short-lived read-only connections, results cached and keyed on a
-# data "version" (row count + newest timestamp) so a sync busts the cache.
+# Data access: every query goes through the process-wide read-only connection
+# pool (one open file, a cursor per script thread), results cached and keyed on
+# a data "version" (store.DataVersion: a sync-generation counter kept in the
+# cache's one-row sync_state table) so a sync busts the cache. With
+# PARKING_QUERY_SERVICE set, all of it goes through the shared query service
+# (parking.service) instead, so replicas share one connection and one cache.
 # --------------------------------------------------------------------------- #
-def data_version() -> tuple:
+@st.cache_resource
+def query_service() -> service.Client | None:
+    return service.Client(QUERY_SERVICE) if QUERY_SERVICE else None
+
+
+def data_version() -> store.DataVersion:
+    if query_service():
+        return query_service().version()
     if not DB_PATH.exists():
-        return (0, None)
-    con = store.connect(read_only=True)
-    try:
-        return (store.row_count(con), store.get_last_timestamp(con))
-    finally:
-        con.close()
+        return store.DataVersion(0, 0, None)
+    with store.pool().cursor() as con:
+        return store.data_version(con)
 
 
+# Under st.cache_data (per process) sits the on-disk result cache, so a
+# restarted app renders from the previous process's results.
 @st.cache_data(ttl=300, show_spinner=False)
 def q(sql: str, params: tuple, version: tuple) -> pd.DataFrame:
-    con = store.connect(read_only=True)
-    try:
-        return con.execute(sql, list(params)).df()
-    finally:
-        con.close()
+    if query_service():
+        return query_service().query(sql, params)
+    return resultcache.for_db().get_or_compute(
+        sql, params, version, lambda: store.pool().execute(sql, params)
+    )
+
+
+def _anomalies() -> pd.DataFrame:
+    with store.pool().cursor() as con:
+        return anomalies.current(con)
 
 
 @st.cache_data(ttl=300, show_spinner=False)
 def get_anomalies(version: tuple) -> pd.DataFrame:
-    con = store.connect(read_only=True)
-    try:
-        return anomalies.detect(con)
-    finally:
-        con.close()
+    if query_service():
+        return query_service().anomalies()
+    return resultcache.for_db().get_or_compute("-- anomalies", (), version, _anomalies)
 
 
-def in_clause(garages: list[str]) -> tuple[str, tuple]:
-    """Build an ``IN (?, ?, …)`` fragment + params for a garage list."""
-    placeholders = ",".join(["?"] * len(garages))
-    return f"({placeholders})", tuple(garages)
+def query_latency() -> pd.DataFrame:
+    """Recent pooled queries (newest first): cursor checkout vs execution time."""
+    if query_service():
+        timings = query_service().timings()
+    else:
+        timings = pd.DataFrame(list(store.pool().timings))
+    if timings.empty:
+        return timings
+    timings["sql"] = timings["sql"].str.split().str.join(" ").str.slice(0, 80)
+    return timings.iloc[::-1].reset_index(drop=True)
 
 
-def run_sync() -> None:
-    with st.spinner("Scanning DynamoDB for new snapshots…"):
-        result = sync()
-    st.cache_data.clear()
-    if result["new_items"]:
+@st.fragment(run_every=APP_POLL_SECONDS or None)
+def _watch_version(shown: store.DataVersion) -> None:
+    """Rerun the page once a sync elsewhere (e.g. the daemon) has bumped the version."""
+    if data_version() != shown:
+        st.rerun()
+
+
+# Sync runs on a background thread shared by every session: the page stays
+# interactive on the current data version and reruns onto the new one at the end.
+@st.cache_resource
+def sync_job() -> BackgroundSync:
+    return BackgroundSync()
+
+
+@st.fragment(run_every=1)
+def sync_status() -> None:
+    """Live progress of the running sync; reruns the whole page once it finishes."""
+    job = sync_job()
+    if not job.running:
+        st.rerun()
+    new_items, scanned, rows = job.progress
+    st.caption(
+        f"⏳ Syncing… {new_items:,} new snapshots · {scanned:,} items scanned · "
+        f"{rows:,} rows written"
+    )
+
+
+def report_sync() -> None:
+    """Toast the outcome of a sync that finished since this session last looked."""
+    job = sync_job()
+    seen = st.session_state.setdefault("sync_runs_seen", job.runs)
+    if job.running or job.runs == seen:
+        return
+    st.session_state["sync_runs_seen"] = job.runs
+    if isinstance(job.error, store.WriterBusy):
         st.toast(
-            f"Synced {result['new_items']:,} new snapshots "
-            f"({result['rows_inserted']:,} rows).",
+            "A sync is already running (e.g. the sync daemon); new data will appear when it finishes.",
+            icon="⏳",
+        )
+    elif job.error is not None:
+        st.toast(f"Sync failed: {job.error}", icon="⚠️")
+    elif job.result["new_items"]:
+        st.toast(
+            f"Synced {job.result['new_items']:,} new snapshots "
+            f"({job.result['rows_inserted']:,} rows).",
             icon="✅",
         )
     else:
@@ -104,43 +163,57 @@ def run_sync() -> None:
 # Empty-state onboarding
 # --------------------------------------------------------------------------- #
 version = data_version()
-if version[0] == 0:
+if version.rows == 0:
     st.title("🅿️ Franklin Parking Explorer")
     st.info(
         f"No local data yet. Click below to pull snapshots from `{TABLE_NAME}` "
         "into the local DuckDB cache (the first sync scans the whole table)."
     )
-    if st.button("🔄 Sync from DynamoDB", type="primary"):
-        run_sync()
-        st.rerun()
+    report_sync()
+    if st.button("🔄 Sync from DynamoDB", type="primary", disabled=sync_job().running):
+        sync_job().start()
+    if sync_job().running:
+        sync_status()
     st.stop()
 
+# Caches synced before the rollup tables existed get them built once here
+# (by the query service, when the app uses one; a running sync builds them itself).
+if not query_service() and not sync_job().running:
+    store.ensure_rollups()
+
 
 # --------------------------------------------------------------------------- #
 # Sidebar: sync + filters
 # --------------------------------------------------------------------------- #
-bounds = q(
-    "SELECT min(ts_local)::DATE, max(ts_local)::DATE, max(ts_local) FROM parking",
-    (),
-    version,
-)
+bounds = q(queries.BOUNDS_SQL, (), version)
 min_date, max_date, latest_ts = bounds.iloc[0]
 
-all_garages = q(
-    "SELECT DISTINCT garage FROM parking WHERE node_type='garage' ORDER BY garage",
-    (),
-    version,
-)["garage"].tolist()
+all_garages = q(queries.GARAGES_SQL, (), version)["garage"].tolist()
 
 with st.sidebar:
     st.header("🅿️ Parking Explorer")
-    if st.button("🔄 Sync new data", use_container_width=True):
-        run_sync()
-        st.rerun()
+    report_sync()
+    if st.button("🔄 Sync new data", use_container_width=True, disabled=sync_job().running):
+        sync_job().start()
+    if sync_job().running:
+        sync_status()
     st.caption(
         f"Latest snapshot: **{pd.Timestamp(latest_ts):%b %-d, %Y %-I:%M %p}**  \n"
-        f"{version[0]:,} rows cached"
+        f"{version.rows:,} rows cached"
     )
+    if APP_POLL_SECONDS:
+        _watch_version(version)
+    with st.expander("Query latency"):
+        latency = query_latency()
+        if latency.empty:
+            st.caption("No uncached queries yet this session.")
+        else:
+            st.caption(
+                f"{len(latency)} uncached queries · median open "
+                f"{latency['open_ms'].median():.1f} ms, execute "
+                f"{latency['execute_ms'].median():.1f} ms"
+            )
+            st.dataframe(latency, hide_index=True, use_container_width=True)
     st.divider()
 
     selected_garages = st.multiselect("Garages", all_garages, default=all_garages)
@@ -161,11 +234,8 @@ if not selected_garages:
     st.warning("Select at least one garage in the sidebar.")
     st.stop()
 
-# Shared filter fragments. end is exclusive → add a day so the end date is inclusive.
-g_clause, g_params = in_clause(selected_garages)
+# Query date range: end is exclusive → add a day so the end date is inclusive.
 date_params = (start_date, end_date + dt.timedelta(days=1))
-where = f"node_type='garage' AND ts_local >= ? AND ts_local < ? AND garage IN {g_clause}"
-base_params = date_params + g_params
 
 st.title("🅿️ Franklin Parking Explorer")
 
@@ -194,21 +264,7 @@ tab_overview, tab_patterns, tab_anomalies, tab_drill, tab_data = st.tabs(
 # Overview: current status KPIs + occupancy over time
 # --------------------------------------------------------------------------- #
 with tab_overview:
-    latest = q(
-        """
-        WITH last2 AS (
-            SELECT DISTINCT request_timestamp FROM parking
-            ORDER BY request_timestamp DESC LIMIT 2
-        )
-        SELECT p.request_timestamp, p.garage, p.available_bays, p.total_bays,
-               p.occupancy_pct
-        FROM parking p JOIN last2 USING (request_timestamp)
-        WHERE p.node_type='garage'
-        ORDER BY p.request_timestamp DESC, p.garage
-        """,
-        (),
-        version,
-    )
+    latest = q(queries.LATEST_SQL, (), version)
 
     st.subheader("Right now")
     st.caption("Available bays at the latest snapshot (Δ vs the previous 5-min reading).")
@@ -246,67 +302,62 @@ with tab_overview:
 
     st.divider()
     st.subheader("Occupancy over time")
-    ts_df = q(
-        f"""
-        SELECT date_trunc('hour', ts_local) AS hour, garage,
-               avg(occupancy_pct) AS occupancy_pct,
-               avg(available_bays) AS available_bays
-        FROM parking WHERE {where}
-        GROUP BY 1, 2 ORDER BY 1
-        """,
-        base_params,
-        version,
-    )
+    # Resolution follows the range (5-min → hourly → daily → weekly buckets), then
+    # LTTB caps each garage's line at about one point per pixel.
+    tier, trend_sql, trend_params = series.plan(*date_params, selected_garages)
+    ts_df = series.reduce(q(trend_sql, trend_params, version))
     if ts_df.empty:
         st.info("No data in the selected range.")
     else:
+        st.caption(
+            f"{tier.label} resolution"
+            + ("" if tier.name == "5min" else " · line = average, band = min–max within each point")
+        )
         color = alt.Color(
             "garage:N",
             scale=alt.Scale(domain=all_garages, range=GARAGE_COLORS[: len(all_garages)]),
             legend=alt.Legend(title=None, orient="top"),
         )
+        x = alt.X("bucket:T", title=None)
         line = (
             alt.Chart(ts_df)
             .mark_line(strokeWidth=2)
             .encode(
-                x=alt.X("hour:T", title=None),
+                x=x,
                 y=alt.Y(
-                    "occupancy_pct:Q",
+                    "occ_avg:Q",
                     title="Occupancy %",
                     scale=alt.Scale(domain=[0, 100]),
                 ),
                 color=color,
                 tooltip=[
-                    alt.Tooltip("hour:T", title="Hour"),
+                    alt.Tooltip("bucket:T", title="Time"),
                     alt.Tooltip("garage:N", title="Garage"),
-                    alt.Tooltip("occupancy_pct:Q", title="Occupancy %", format=".0f"),
+                    alt.Tooltip("occ_avg:Q", title="Occupancy %", format=".0f"),
+                    alt.Tooltip("occ_min:Q", title="Min %", format=".0f"),
+                    alt.Tooltip("occ_max:Q", title="Max %", format=".0f"),
                     alt.Tooltip("available_bays:Q", title="Avg free", format=".0f"),
                 ],
             )
             .properties(height=360)
         )
+        if tier.name != "5min":
+            band = (
+                alt.Chart(ts_df)
+                .mark_area(opacity=0.15)
+                .encode(x=x, y="occ_min:Q", y2="occ_max:Q", color=color)
+            )
+            line = band + line
         st.altair_chart(line, use_container_width=True)
 
     st.divider()
     st.subheader("Daily peak occupancy calendar")
     st.caption(
-        "Each cell is one day (rows = months, columns = day of month), shaded by that day's "
-        "peak occupancy across selected garages. Full history — ignores the date slider."
-    )
-    cal = q(
-        f"""
-        WITH snap AS (
-            SELECT request_timestamp, ts_local::DATE AS day,
-                   100.0 * sum(occupied_bays) / nullif(sum(total_bays), 0) AS occ
-            FROM parking WHERE node_type='garage' AND garage IN {g_clause}
-            GROUP BY request_timestamp, day
-        )
-        SELECT day, max(occ) AS peak, avg(occ) AS avg_occ
-        FROM snap GROUP BY day ORDER BY day
-        """,
-        g_params,
-        version,
+        "Each cell is one day (rows = months, columns = day of month), shaded by the "
+        "occupancy of that day's busiest hour across selected garages. Full history — "
+        "ignores the date slider."
     )
+    cal = q(*queries.calendar(selected_garages), version)
     if cal.empty:
         st.info("No data.")
     else:
@@ -345,16 +396,7 @@ with tab_patterns:
         "Average occupancy by hour and weekday, capacity-weighted across the "
         "selected garages. Darker = fuller."
     )
-    heat = q(
-        f"""
-        SELECT dayname(ts_local) AS dow, hour(ts_local) AS hr,
-               100.0 * sum(occupied_bays) / nullif(sum(total_bays), 0) AS occupancy_pct
-        FROM parking WHERE {where}
-        GROUP BY 1, 2
-        """,
-        base_params,
-        version,
-    )
+    heat = q(*queries.heatmap(*date_params, selected_garages), version)
     if heat.empty:
         st.info("No data in the selected range.")
     else:
@@ -401,42 +443,10 @@ with tab_patterns:
         if not picked:
             st.info("Pick at least one day of week to compare.")
         else:
-            day_ph = ",".join(["?"] * len(picked))
-            curve = q(
-                f"""
-                WITH snap AS (
-                    SELECT request_timestamp, hour(ts_local) AS hr,
-                           dayname(ts_local) AS day_type,
-                           100.0 * sum(occupied_bays) / nullif(sum(total_bays), 0) AS occ
-                    FROM parking WHERE {where} AND dayname(ts_local) IN ({day_ph})
-                    GROUP BY request_timestamp, hr, day_type
-                )
-                SELECT hr, day_type, median(occ) AS med,
-                       quantile_cont(occ, 0.1) AS lo, quantile_cont(occ, 0.9) AS hi
-                FROM snap GROUP BY hr, day_type ORDER BY hr
-                """,
-                base_params + tuple(picked),
-                version,
-            )
+            curve = q(*queries.typical_day(*date_params, selected_garages, picked), version)
             domain, color_range = picked, [DOW_COLORS[d] for d in picked]
     else:
-        curve = q(
-            f"""
-            WITH snap AS (
-                SELECT request_timestamp, hour(ts_local) AS hr,
-                       CASE WHEN dayofweek(ts_local) IN (0, 6) THEN 'Weekend'
-                            ELSE 'Weekday' END AS day_type,
-                       100.0 * sum(occupied_bays) / nullif(sum(total_bays), 0) AS occ
-                FROM parking WHERE {where}
-                GROUP BY request_timestamp, hr, day_type
-            )
-            SELECT hr, day_type, median(occ) AS med,
-                   quantile_cont(occ, 0.1) AS lo, quantile_cont(occ, 0.9) AS hi
-            FROM snap GROUP BY hr, day_type ORDER BY hr
-            """,
-            base_params,
-            version,
-        )
+        curve = q(*queries.typical_day(*date_params, selected_garages), version)
         domain, color_range = ["Weekday", "Weekend"], [WEEKDAY_COLOR, WEEKEND_COLOR]
 
     if curve is None:
@@ -493,26 +503,7 @@ with tab_patterns:
         "Average net change in parked cars by hour — bars above zero mean the garages "
         "are filling, below zero emptying. Capacity across selected garages."
     )
-    flow = q(
-        f"""
-        WITH snap AS (
-            SELECT request_timestamp, ts_local, sum(occupied_bays) AS occ
-            FROM parking WHERE {where}
-            GROUP BY request_timestamp, ts_local
-        ),
-        deltas AS (
-            SELECT ts_local,
-                   occ - lag(occ) OVER (ORDER BY ts_local) AS delta,
-                   epoch(ts_local) - epoch(lag(ts_local) OVER (ORDER BY ts_local)) AS gap_s
-            FROM snap
-        )
-        SELECT hour(ts_local) AS hr, avg(delta) * 12 AS net_per_hour
-        FROM deltas WHERE gap_s BETWEEN 1 AND 900
-        GROUP BY 1 ORDER BY 1
-        """,
-        base_params,
-        version,
-    )
+    flow = q(*queries.net_flow(*date_params, selected_garages), version)
     if flow.empty:
         st.info("No data in the selected range.")
     else:
@@ -596,13 +587,7 @@ table and drive the severity slider.
     m4.metric("Level outages", int(anoms["type"].str.startswith("Level").sum()))
 
     # Daily peak occupancy over full history, with suppressed days marked.
-    peaks = q(
-        f"SELECT ts_local::DATE AS day, garage, max(occupancy_pct) AS peak "
-        f"FROM parking WHERE node_type='garage' AND garage IN {g_clause} "
-        f"GROUP BY 1, 2 ORDER BY 1",
-        g_params,
-        version,
-    )
+    peaks = q(*queries.daily_peaks(selected_garages), version)
     if not peaks.empty:
         peaks["day"] = pd.to_datetime(peaks["day"])
         line = (
@@ -689,18 +674,7 @@ table and drive the severity slider.
 # --------------------------------------------------------------------------- #
 with tab_drill:
     garage = st.selectbox("Garage", selected_garages)
-    levels = q(
-        r"""
-        SELECT level, available_bays, occupied_bays, total_bays, occupancy_pct
-        FROM parking
-        WHERE node_type='level' AND garage = ?
-          AND request_timestamp = (SELECT max(request_timestamp) FROM parking)
-          AND total_bays > 0
-        ORDER BY try_cast(regexp_extract(level, '\d+') AS INTEGER) NULLS LAST, level
-        """,
-        (garage,),
-        version,
-    )
+    levels = q(queries.LEVELS_SQL, (garage,), version)
     st.subheader(f"{garage} — levels at the latest snapshot")
     if levels.empty:
         st.info("No level breakdown available for this garage.")
@@ -749,15 +723,7 @@ with tab_drill:
 # --------------------------------------------------------------------------- #
 with tab_data:
     st.subheader("Garage snapshots in range")
-    raw = q(
-        f"""
-        SELECT ts_local, garage, available_bays, occupied_bays, total_bays, occupancy_pct
-        FROM parking WHERE {where}
-        ORDER BY ts_local DESC, garage
-        """,
-        base_params,
-        version,
-    )
+    raw = q(*queries.snapshot_rows(*date_params, selected_garages), version)
     display_cap = 5000
     note = (
         f" — showing the most recent {display_cap:,}; download for all"
@@ -786,9 +752,32 @@ with tab_data:
             "Occupancy %": st.column_config.NumberColumn("Occupancy %", format="%.0f"),
         },
     )
+
+    # Downloads are written by DuckDB (COPY ... TO a temp file) only when the
+    # button is clicked, never built in memory from the table above.
+    st.markdown("**Download**")
+    c1, c2, c3 = st.columns([2, 2, 1])
+    granularity = c1.radio(
+        "Rows", list(export.GRANULARITIES), horizontal=True, format_func=str.title,
+        help="Garage totals (as shown above), or every level / zone of the selected garages.",
+    )
+    fmt = c2.radio("Format", export.FORMATS, horizontal=True, format_func=str.upper)
+    compress = c3.checkbox("zstd", help="Compress the file (CSV becomes .csv.zst).")
+
+    def _export_file():
+        options = dict(
+            start=date_params[0], end=date_params[1], garages=selected_garages,
+            granularity=granularity, fmt=fmt, compress=compress,
+        )
+        if query_service():
+            return query_service().export_file(**options)
+        with store.pool().cursor() as con:
+            return export.export_file(con, **options)
+
     st.download_button(
-        "Download CSV",
-        raw.to_csv(index=False).encode(),
-        file_name="parking_snapshots.csv",
-        mime="text/csv",
+        f"Download {fmt.upper()}",
+        _export_file,
+        file_name=export.file_name(granularity, fmt, compress),
+        mime=export.mime_type(fmt, compress),
+        on_click="ignore",
     )
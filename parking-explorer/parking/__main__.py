@@ -0,0 +1,7 @@
+"""``python -m parking``: the headless query CLI (see parking.cli)."""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
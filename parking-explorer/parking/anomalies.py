@@ -13,12 +13,33 @@ to each garage/level instead of using a global threshold:
 
 Detectors only judge occupancy on days with a near-full snapshot count, so a
 collection gap is never double-reported as suppressed activity.
+
+Detectors read the per-node ``daily_rollup`` that sync maintains, never the raw
+table (caches synced before it existed fall back to aggregating ``parking``). :func:`refresh` keeps a persisted result set (``anomaly_log``) current
+after each sync: it re-judges only days touched by the sync, plus the whole
+history of any series whose baseline drifted by more than ``BASELINE_DRIFT``
+from the one its history was last judged against (kept in
+``anomaly_baselines``) — so a refresh after a 5-minute sync costs
+O(new data), not O(history). :func:`detect` is the stateless full pass.
+
+Detectors are :class:`Detector` entries in the ``DETECTORS`` registry: SQL
+fragments over one shared per-(series, day) aggregate that is materialized once
+per evaluation. Baselines for every detector come from one query and all
+detectors are judged in a single ``UNION ALL`` pass, so :func:`register`-ing a
+new rule adds no extra scans of the rollup.
 """
 
 from __future__ import annotations
 
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import duckdb
 import pandas as pd
 
+from . import store
+
 # --- Tunables (fractions of each series' own baseline) ---
 GAP_RATIO = 0.9  # a day below this fraction of a normal day's snapshots = gap
 MIN_FULL_SNAPS_RATIO = 0.7  # need this fraction of a full day before judging occupancy
@@ -26,108 +47,357 @@ PEAK_RATIO = 0.5  # garage peak below this fraction of its weekday-typical peak
 MIN_TYP_PEAK = 20.0  # only judge garages that normally get reasonably busy
 LEVEL_REDUCED_RATIO = 0.2  # level peak below this fraction of its own norm
 MIN_TYP_LEVEL_MAX = 5.0  # only judge levels that are normally used
+BASELINE_DRIFT = 0.05  # re-judge a series' history once its baseline moves this much
 
 _COLUMNS = ["date", "garage", "level", "type", "severity", "detail"]
 
+_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS anomaly_baselines (
+    detector VARCHAR NOT NULL,
+    garage   VARCHAR NOT NULL,
+    level    VARCHAR NOT NULL,
+    dow      VARCHAR NOT NULL,
+    baseline DOUBLE,
+    spread   DOUBLE
+);
 
-def detect(con) -> pd.DataFrame:
-    """Return a DataFrame of anomalies, newest and most severe first."""
-    counts = con.execute(
-        "SELECT ts_local::DATE AS day, count(DISTINCT request_timestamp) AS snaps "
-        "FROM parking GROUP BY 1 ORDER BY 1"
-    ).df()
-    if counts.empty:
-        return pd.DataFrame(columns=_COLUMNS)
+CREATE TABLE IF NOT EXISTS anomaly_log (
+    detector VARCHAR NOT NULL,
+    date     DATE NOT NULL,
+    garage   VARCHAR,
+    level    VARCHAR,
+    type     VARCHAR,
+    severity DOUBLE,
+    detail   VARCHAR
+);
+"""
 
-    expected = int(counts["snaps"].median())
-    first_day, last_day = counts["day"].min(), counts["day"].max()
-    min_full = int(MIN_FULL_SNAPS_RATIO * expected)
-
-    records: list[dict] = []
-
-    # 1) Collection gaps (skip the naturally-partial first/last days).
-    for _, r in counts.iterrows():
-        if r["day"] in (first_day, last_day) or r["snaps"] >= GAP_RATIO * expected:
-            continue
-        records.append(
-            {
-                "date": r["day"], "garage": "All", "level": "",
-                "type": "Collection gap",
-                "severity": round(1 - r["snaps"] / expected, 2),
-                "detail": f"{int(r['snaps'])}/{expected} snapshots logged",
-            }
-        )
+# The shared per-(series, day) aggregate every detector reads: one row per
+# system/garage/level node per local day, materialized once per evaluation.
+_SERIES_DAYS = """
+CREATE OR REPLACE TEMP TABLE series_days AS
+SELECT day, dayname(day) AS dow, node_type, garage, level, snaps,
+       max_pct AS peak, max_occupied AS day_max, sd_occupied AS day_sd,
+       min_total, max_total
+FROM daily_rollup
+"""
 
-    # 2) Suppressed garage peak vs weekday-typical peak.
-    sup = con.execute(
-        """
-        WITH daily AS (
-            SELECT garage, ts_local::DATE AS day, dayname(ts_local) AS dow,
-                   count(DISTINCT request_timestamp) AS snaps,
-                   max(occupancy_pct) AS peak
-            FROM parking WHERE node_type='garage' GROUP BY 1, 2, 3
-        ),
-        base AS (SELECT garage, dow, median(peak) AS typ_peak FROM daily GROUP BY 1, 2)
-        SELECT d.garage, d.day, d.peak, b.typ_peak
-        FROM daily d JOIN base b USING (garage, dow)
-        WHERE d.snaps >= ? AND b.typ_peak >= ? AND d.peak < ? * b.typ_peak
-        ORDER BY d.day
-        """,
-        [min_full, MIN_TYP_PEAK, PEAK_RATIO],
-    ).df()
-    for _, r in sup.iterrows():
-        records.append(
-            {
-                "date": r["day"], "garage": r["garage"], "level": "",
-                "type": "Suppressed activity",
-                "severity": round(1 - r["peak"] / r["typ_peak"], 2),
-                "detail": f"peak {r['peak']:.0f}% vs typical {r['typ_peak']:.0f}% for this weekday",
-            }
-        )
+# The same aggregate straight from ``parking``, for caches synced before
+# ``daily_rollup`` existed (read-only front-ends can't build it for them).
+_SERIES_DAYS_FROM_PARKING = """
+CREATE OR REPLACE TEMP TABLE series_days AS
+SELECT ts_local::DATE AS day, dayname(ts_local::DATE) AS dow, node_type, garage, level,
+       count(*) AS snaps, max(occupancy_pct) AS peak, max(occupied_bays) AS day_max,
+       stddev_pop(occupied_bays) AS day_sd, min(total_bays) AS min_total,
+       max(total_bays) AS max_total
+FROM parking WHERE node_type IN ('system', 'garage', 'level')
+GROUP BY ts_local::DATE, node_type, garage, level, path
+"""
 
-    # 3) Level outages vs the level's own baseline.
-    lvl = con.execute(
-        """
-        WITH lvl AS (
-            SELECT garage, level, ts_local::DATE AS day,
-                   count(DISTINCT request_timestamp) AS snaps,
-                   max(occupied_bays) AS day_max,
-                   stddev_pop(occupied_bays) AS day_sd
-            FROM parking WHERE node_type='level' GROUP BY 1, 2, 3
-        ),
-        base AS (
-            SELECT garage, level, median(day_max) AS typ_max, avg(day_sd) AS typ_sd
-            FROM lvl GROUP BY 1, 2
-        )
-        SELECT l.garage, l.level, l.day, l.day_max, l.day_sd, b.typ_max, b.typ_sd
-        FROM lvl l JOIN base b USING (garage, level)
-        WHERE l.snaps >= ? AND b.typ_max > ?
-          AND ( l.day_max = 0
-             OR (l.day_sd = 0 AND b.typ_sd > 1)
-             OR (l.day_max < ? * b.typ_max) )
-        ORDER BY l.day
-        """,
-        [min_full, MIN_TYP_LEVEL_MAX, LEVEL_REDUCED_RATIO],
-    ).df()
-    for _, r in lvl.iterrows():
-        if r["day_max"] == 0:
-            mode, severity = "emptied", 1.0
-        elif r["day_sd"] == 0 and r["typ_sd"] > 1:
-            mode, severity = "frozen sensor", 0.8
-        else:
-            mode, severity = "far below normal", round(1 - r["day_max"] / r["typ_max"], 2)
-        records.append(
-            {
-                "date": r["day"], "garage": r["garage"], "level": r["level"],
-                "type": f"Level {mode}",
-                "severity": severity,
-                "detail": f"{r['level']}: peak {int(r['day_max'])} cars vs typical {int(r['typ_max'])}",
-            }
+
+@dataclass(frozen=True)
+class Detector:
+    """One anomaly rule, expressed as SQL fragments over the shared aggregate.
+
+    Fragments see ``d`` (a ``series_days`` row of ``node_type``) and, except
+    for ``baseline``/``spread``, ``b`` (that series' baseline row). ``key`` is
+    the series identity as SQL over ``d`` — (garage, level, dow), with ``''``
+    for unused parts; ``dow`` must be ``''`` or ``d.dow``. ``$name``
+    placeholders bind to the lower-cased module tunables plus ``$expected``
+    (a normal day's snapshot count) and ``$min_full``.
+    """
+
+    name: str
+    node_type: str
+    key: tuple[str, str, str]
+    baseline: str  # aggregate over a series' days
+    when: str  # flag condition
+    type: str
+    severity: str  # 0-1, unrounded
+    detail: str
+    spread: str = "NULL"  # optional second baseline aggregate
+
+
+DETECTORS: dict[str, Detector] = {}
+
+
+def register(detector: Detector) -> Detector:
+    """Add (or replace) a detector; it joins the same single evaluation pass."""
+    DETECTORS[detector.name] = detector
+    return detector
+
+
+# 1) Collection gaps (skip the naturally-partial first/last days).
+register(Detector(
+    name="gap",
+    node_type="system",
+    key=("'All'", "''", "''"),
+    baseline="median(d.snaps)",
+    when="""
+        d.snaps < $gap_ratio * $expected
+        AND d.day NOT IN (
+            (SELECT min(day) FROM series_days WHERE node_type = 'system'),
+            (SELECT max(day) FROM series_days WHERE node_type = 'system'))
+    """,
+    type="'Collection gap'",
+    severity="1 - d.snaps / $expected",
+    detail="format('{}/{} snapshots logged', d.snaps, $expected)",
+))
+
+# 2) Suppressed garage peak vs weekday-typical peak.
+register(Detector(
+    name="peak",
+    node_type="garage",
+    key=("d.garage", "''", "d.dow"),
+    baseline="median(d.peak)",
+    when="d.snaps >= $min_full AND b.baseline >= $min_typ_peak AND d.peak < $peak_ratio * b.baseline",
+    type="'Suppressed activity'",
+    severity="1 - d.peak / b.baseline",
+    detail="printf('peak %.0f%% vs typical %.0f%% for this weekday', d.peak, b.baseline)",
+))
+
+# 3) Level outages vs the level's own baseline.
+register(Detector(
+    name="level",
+    node_type="level",
+    key=("d.garage", "d.level", "''"),
+    baseline="median(d.day_max)",
+    spread="avg(d.day_sd)",
+    when="""
+        d.snaps >= $min_full AND b.baseline > $min_typ_level_max
+        AND ( d.day_max = 0
+           OR (d.day_sd = 0 AND b.spread > 1)
+           OR (d.day_max < $level_reduced_ratio * b.baseline) )
+    """,
+    type="""
+        CASE WHEN d.day_max = 0 THEN 'Level emptied'
+             WHEN d.day_sd = 0 AND b.spread > 1 THEN 'Level frozen sensor'
+             ELSE 'Level far below normal' END
+    """,
+    severity="""
+        CASE WHEN d.day_max = 0 THEN 1.0
+             WHEN d.day_sd = 0 AND b.spread > 1 THEN 0.8
+             ELSE 1 - d.day_max / b.baseline END
+    """,
+    detail="format('{}: peak {} cars vs typical {}', d.level, d.day_max, trunc(b.baseline)::BIGINT)",
+))
+
+_LOG_COLUMNS = ["detector", *_COLUMNS]
+
+
+def _bind(sql: str, values: dict) -> dict:
+    """Just the ``$name`` parameters ``sql`` references (DuckDB rejects extras)."""
+    return {name: values[name] for name in dict.fromkeys(re.findall(r"\$(\w+)", sql))}
+
+
+def _tunables() -> dict:
+    # Read at call time so tests (and callers) can adjust the module constants.
+    return {
+        name.lower(): value
+        for name, value in globals().items()
+        if name.isupper() and not name.startswith("_") and isinstance(value, (int, float))
+    }
+
+
+def _baselines(con) -> pd.DataFrame:
+    """One row per series: (detector, garage, level, dow) -> baseline, spread.
+
+    Expects ``series_days`` to be materialized (see :func:`_series_days`).
+    """
+    parts = [
+        f"SELECT '{det.name}' AS detector, {det.key[0]} AS garage, {det.key[1]} AS level, "
+        f"{det.key[2]} AS dow, ({det.baseline})::DOUBLE AS baseline, "
+        f"({det.spread})::DOUBLE AS spread "
+        f"FROM series_days d WHERE d.node_type = '{det.node_type}' GROUP BY ALL"
+        for det in DETECTORS.values()
+    ]
+    return con.execute(" UNION ALL ".join(parts)).df()
+
+
+@contextmanager
+def _series_days(con):
+    """Materialize the shared aggregate for the duration of one evaluation."""
+    con.execute(_SERIES_DAYS if store.rollups_ready(con) else _SERIES_DAYS_FROM_PARKING)
+    try:
+        yield
+    finally:
+        con.execute("DROP TABLE IF EXISTS series_days")
+
+
+def _evaluate(con, base: pd.DataFrame, scope: str = "true", params: dict | None = None) -> pd.DataFrame:
+    """Run every registered detector against ``base`` in a single query.
+
+    Expects ``series_days`` to be materialized. ``scope`` limits which days are
+    judged: a SQL predicate over ``d`` that may use ``{detector}``,
+    ``{garage}``, ``{level}`` and ``{dow}`` (the detector's name and series
+    key expressions); ``params`` supplies its ``$name`` placeholders.
+    """
+    gap = base[base["detector"] == "gap"]
+    if gap.empty or pd.isna(gap["baseline"].iloc[0]):
+        return pd.DataFrame(columns=_LOG_COLUMNS)
+    expected = int(gap["baseline"].iloc[0])
+    values = {
+        **_tunables(),
+        "expected": expected,
+        "min_full": int(MIN_FULL_SNAPS_RATIO * expected),
+        **(params or {}),
+    }
+
+    parts = []
+    for det in DETECTORS.values():
+        g, lv, dow = det.key
+        det_scope = scope.format(detector=det.name, garage=g, level=lv, dow=dow)
+        parts.append(
+            f"""
+            SELECT '{det.name}' AS detector, d.day AS date, {g} AS garage, {lv} AS level,
+                   {det.type} AS type, ({det.severity})::DOUBLE AS severity,
+                   {det.detail} AS detail
+            FROM series_days d JOIN base b
+              ON b.detector = '{det.name}' AND b.garage = {g} AND b.level = {lv} AND b.dow = {dow}
+            WHERE d.node_type = '{det.node_type}' AND ({det.when}) AND ({det_scope})
+            """
         )
+    sql = " UNION ALL ".join(parts)
+
+    con.register("base", base)
+    try:
+        found = con.execute(sql, _bind(sql, values)).df()
+    finally:
+        con.unregister("base")
+    found["severity"] = found["severity"].round(2)
+    return found[_LOG_COLUMNS]
 
-    if not records:
-        return pd.DataFrame(columns=_COLUMNS)
 
-    df = pd.DataFrame.from_records(records)
+def _to_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Detector output -> the public anomalies frame, newest and most severe first."""
+    if df.empty:
+        return pd.DataFrame(columns=_COLUMNS)
+    df = df[_COLUMNS].copy()
     df["date"] = pd.to_datetime(df["date"]).dt.date
     return df.sort_values(["date", "severity"], ascending=[False, False]).reset_index(drop=True)
+
+
+def detect(con) -> pd.DataFrame:
+    """Return a DataFrame of anomalies, newest and most severe first."""
+    with _series_days(con):
+        return _to_frame(_evaluate(con, _baselines(con)))
+
+
+def _drifted(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Series whose baseline is new or moved by more than ``BASELINE_DRIFT``."""
+    keys = ["detector", "garage", "level", "dow"]
+    m = new.merge(old, on=keys, how="left", suffixes=("", "_old"))
+
+    def moved(col: str) -> pd.Series:
+        cur, prev = m[col], m[f"{col}_old"]
+        changed = (cur - prev).abs() > BASELINE_DRIFT * prev.abs()
+        return changed.fillna(False) | (cur.isna() != prev.isna())
+
+    return m.loc[m["baseline_old"].isna() | moved("baseline") | moved("spread"), keys]
+
+
+def refresh(con, after: str | None = None) -> dict:
+    """Update the persisted ``anomaly_log`` after a sync. Returns a summary.
+
+    ``after`` is the newest ``request_timestamp`` cached before the sync (None
+    = re-judge everything). Days from that snapshot's local day onward are
+    re-judged — the previous last day is included because it was partial, and
+    so exempt from gap detection, last time — along with the full history of
+    every drifted series. A drifted snapshot-count baseline moves every
+    detector's threshold, so it forces a full pass.
+    """
+    con.execute(_STATE_SCHEMA)
+    with _series_days(con):
+        return _refresh(con, after)
+
+
+def _refresh(con, after: str | None) -> dict:
+    base = _baselines(con)
+    since = None
+    if after is not None:
+        since = con.execute(
+            "SELECT max(ts_local)::DATE FROM garage_snapshots WHERE request_timestamp = ?",
+            [after],
+        ).fetchone()[0]
+    drifted = _drifted(con.execute("SELECT * FROM anomaly_baselines").df(), base)
+    if since is None or (drifted["detector"] == "gap").any():
+        since = None
+
+    con.begin()
+    try:
+        if since is None:
+            records = _evaluate(con, base)
+            con.execute("DELETE FROM anomaly_log")
+        else:
+            con.register("drifted", drifted)
+            scope = (
+                "d.day >= $since OR EXISTS (SELECT 1 FROM drifted x "
+                "WHERE x.detector = '{detector}' AND x.garage = {garage} "
+                "AND x.level = {level} AND x.dow = {dow})"
+            )
+            records = _evaluate(con, base, scope, {"since": since})
+            con.execute(
+                """
+                DELETE FROM anomaly_log l WHERE l.date >= ? OR EXISTS (
+                    SELECT 1 FROM drifted x WHERE x.detector = l.detector
+                      AND x.garage = l.garage AND x.level = l.level
+                      AND x.dow IN ('', dayname(l.date)))
+                """,
+                [since],
+            )
+            con.unregister("drifted")
+        if not records.empty:
+            con.register("fresh", records)
+            con.execute(
+                "INSERT INTO anomaly_log SELECT detector, date, garage, level, type, severity, "
+                "detail FROM fresh"
+            )
+            con.unregister("fresh")
+        # Stored baselines are the ones each series' history was last judged
+        # against, so only re-judged series get theirs replaced: a slow trend
+        # then accumulates against the stored value until it crosses
+        # BASELINE_DRIFT, instead of creeping past it one small step per sync.
+        con.register("fresh_base", base)
+        if since is None:
+            con.execute("DELETE FROM anomaly_baselines")
+            con.execute("INSERT INTO anomaly_baselines SELECT * FROM fresh_base")
+        else:
+            con.register("drifted", drifted)
+            con.execute(
+                """
+                DELETE FROM anomaly_baselines b WHERE EXISTS (
+                    SELECT 1 FROM drifted x WHERE x.detector = b.detector
+                      AND x.garage = b.garage AND x.level = b.level AND x.dow = b.dow)
+                """
+            )
+            con.execute(
+                "INSERT INTO anomaly_baselines SELECT f.* FROM fresh_base f "
+                "SEMI JOIN drifted x USING (detector, garage, level, dow)"
+            )
+            con.unregister("drifted")
+        con.unregister("fresh_base")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return {
+        "since": since,
+        "drifted_series": 0 if since is None else len(drifted),
+        "records": con.execute("SELECT count(*) FROM anomaly_log").fetchone()[0],
+    }
+
+
+def load(con) -> pd.DataFrame | None:
+    """The persisted anomalies (same shape as :func:`detect`), or None if never refreshed."""
+    try:
+        df = con.execute(f"SELECT {', '.join(_COLUMNS)} FROM anomaly_log").df()
+    except duckdb.CatalogException:  # cache predates persisted anomalies
+        return None
+    return _to_frame(df)
+
+
+def current(con) -> pd.DataFrame:
+    """The anomaly list front-ends show: the persisted log sync keeps current, or a
+    full :func:`detect` pass on caches that predate it."""
+    found = load(con)
+    return found if found is not None else detect(con)
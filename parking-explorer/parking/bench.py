@@ -0,0 +1,352 @@
+"""Benchmark harness: synthetic history in, a diffable JSON timing report out.
+
+    poetry run python -m parking.bench                                  # 1 month
+    poetry run python -m parking.bench --history 1m 1y 5y -o bench.json
+    poetry run python -m parking.bench --garages 5 --levels 8 --zones 4 --history 3m
+    poetry run python -m parking.bench --compare before.json after.json
+
+For each history length it builds a cache from deterministic synthetic
+DynamoDB items (:mod:`parking.synthetic`, ending 2026-01-05) and times:
+
+* ``generate`` / ``decode`` / ``flatten`` / ``insert`` — making the items,
+  ``json.loads`` of their ``api_response``, :func:`~parking.flatten.flatten_page`
+  and :func:`~parking.store.insert_arrow`, page by page over the whole history;
+* ``rollups`` / ``anomalies.refresh`` — a full rollup rebuild and anomaly pass,
+  as the first sync does;
+* ``sync`` (plus ``sync.<stage>`` from its summary) — a full backfill
+  :func:`~parking.sync.sync` against a moto DynamoDB table holding the newest
+  ``--sync-days`` of the history. moto handles every item in Python, so a
+  years-long table would time moto rather than the sync; skipped when moto
+  isn't installed;
+* ``query.<name>`` — every dashboard query the app runs (median of
+  ``--repeat``, on a fresh read-only connection, no result cache), for the
+  app's default 28-day range and for the whole history;
+* ``anomalies.detect`` — a full detector pass.
+
+Each run's ``timings`` is a flat ``{name: seconds}`` map, so two reports diff
+key by key; ``--compare`` prints the ratios. Five years of the default shape
+is ~40M rows and takes several minutes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from . import anomalies, cli, export, queries, series, store
+from . import sync as sync_mod
+from .config import PROJECT_ROOT, TABLE_NAME
+from .flatten import flatten_page
+from .synthetic import SNAPSHOT_INTERVAL, decode_items, make_items, moto_table
+
+try:
+    import moto
+except ImportError:  # dev dependency; without it the sync stage is skipped
+    moto = None
+
+END = dt.datetime(2026, 1, 5)  # newest synthetic snapshot (naive UTC), so runs are comparable
+PAGE_ITEMS = 1000
+REPORT_VERSION = 1
+_UNITS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+
+def history_days(value: str) -> int:
+    """``"30"``, ``"30d"``, ``"2w"``, ``"1m"``, ``"5y"`` -> days."""
+    unit = value[-1].lower() if value[-1].isalpha() else "d"
+    try:
+        days = int(value.rstrip("dwmyDWMY")) * _UNITS[unit]
+    except (KeyError, ValueError):
+        raise argparse.ArgumentTypeError(f"not a history length like 30d, 1m or 5y: {value!r}") from None
+    if days < 1:
+        raise argparse.ArgumentTypeError(f"history must be at least a day: {value!r}")
+    return days
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+class _Clock:
+    """Accumulates seconds per stage name."""
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def __call__(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - t0
+
+
+def build_cache(db_path: Path, days: int, shape: dict, storage: str, clock: _Clock) -> int:
+    """Fill a new cache with ``days`` of snapshots ending at :data:`END`. Returns rows inserted."""
+    snapshots = days * dt.timedelta(days=1) // SNAPSHOT_INTERVAL
+    start = END - snapshots * SNAPSHOT_INTERVAL
+    con = store.connect(db_path=db_path)
+    try:
+        store.init_schema(con, storage)
+        rows = 0
+        for offset in range(0, snapshots, PAGE_ITEMS):
+            with clock("generate"):
+                items = make_items(
+                    start + offset * SNAPSHOT_INTERVAL, min(PAGE_ITEMS, snapshots - offset), **shape
+                )
+            with clock("decode"):
+                page = decode_items(items)
+            with clock("flatten"):
+                table = flatten_page(page)
+            with clock("insert"):
+                rows += store.insert_arrow(con, table)
+        with clock("collapse"):
+            store.collapse_unchanged(con)
+        with clock("rollups"):
+            store.refresh_rollups(con)
+        with clock("anomalies.refresh"):
+            anomalies.refresh(con)
+        store.bump_generation(con)
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+    return rows
+
+
+def time_sync(work: Path, sync_days: float, shape: dict) -> dict[str, float]:
+    """Backfill ``sync_days`` of items through :func:`parking.sync.sync` against moto."""
+    count = max(1, int(sync_days * dt.timedelta(days=1) / SNAPSHOT_INTERVAL))
+    db_path = work / "sync.duckdb"
+    with moto_table() as client:
+        items = make_items(END - count * SNAPSHOT_INTERVAL, count, **shape)
+        for i in range(0, len(items), 25):
+            client.batch_write_item(
+                RequestItems={TABLE_NAME: [{"PutRequest": {"Item": item}} for item in items[i : i + 25]]}
+            )
+        t0 = time.perf_counter()
+        result = sync_mod.sync(db_path=db_path)
+        seconds = time.perf_counter() - t0
+    for suffix in ("", ".wal"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+    return {"sync": seconds, **{f"sync.{k}": v for k, v in result["timings"].items()}}
+
+
+def dashboard_queries(con: duckdb.DuckDBPyConnection) -> dict[str, Callable[[], object]]:
+    """Every query the app's dashboard runs, as name -> thunk, with the app's defaults.
+
+    Range-dependent queries appear twice: ``@28d`` (the default range) and
+    ``@all`` (the whole history).
+    """
+    run = lambda sql, params=(): lambda: con.execute(sql, params).df()  # noqa: E731
+    min_day, max_day, _ = con.execute(queries.BOUNDS_SQL).fetchone()
+    garages = [g for (g,) in con.execute(queries.GARAGES_SQL).fetchall()]
+    found = {
+        "bounds": run(queries.BOUNDS_SQL),
+        "garages": run(queries.GARAGES_SQL),
+        "latest": run(queries.LATEST_SQL),
+        "levels": run(queries.LEVELS_SQL, (garages[0],)),
+        "calendar": run(*queries.calendar(garages)),
+        "daily_peaks": run(*queries.daily_peaks(garages)),
+        "anomalies.load": lambda: anomalies.load(con),
+        "data_version": lambda: store.data_version(con),
+    }
+    end = max_day + dt.timedelta(days=1)
+    ranges = {"28d": max(min_day, max_day - dt.timedelta(days=cli.DEFAULT_DAYS)), "all": min_day}
+    for label, start in ranges.items():
+        _, trend_sql, trend_params = series.plan(start, end, garages)
+        found |= {
+            f"trend@{label}": lambda sql=trend_sql, params=trend_params: series.reduce(
+                con.execute(sql, params).df()
+            ),
+            f"heatmap@{label}": run(*queries.heatmap(start, end, garages)),
+            f"typical_day@{label}": run(*queries.typical_day(start, end, garages)),
+            f"typical_day.picked@{label}": run(*queries.typical_day(start, end, garages, ["Monday", "Friday"])),
+            f"net_flow@{label}": run(*queries.net_flow(start, end, garages)),
+            f"snapshot_rows@{label}": run(*queries.snapshot_rows(start, end, garages)),
+        }
+    tmp = Path(tempfile.gettempdir()) / f"parking-bench-export-{os.getpid()}"
+    found["export.garage.csv@28d"] = lambda: export.export(
+        con, tmp, start=ranges["28d"], end=end, garages=garages, granularity="garage", fmt="csv"
+    )
+    found["export.level.parquet@28d"] = lambda: export.export(
+        con, tmp, start=ranges["28d"], end=end, garages=garages, granularity="level", fmt="parquet"
+    )
+    return found
+
+
+def time_queries(db_path: Path, repeat: int) -> dict[str, float]:
+    """Median seconds of each dashboard query, plus a full ``anomalies.detect``."""
+    con = store.connect(read_only=True, db_path=db_path)
+    timings = {}
+    try:
+        for name, thunk in dashboard_queries(con).items():
+            runs = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                thunk()
+                runs.append(time.perf_counter() - t0)
+            timings[f"query.{name}"] = statistics.median(runs)
+        runs = []
+        for _ in range(max(1, repeat // 2)):
+            t0 = time.perf_counter()
+            anomalies.detect(con)
+            runs.append(time.perf_counter() - t0)
+        timings["anomalies.detect"] = statistics.median(runs)
+    finally:
+        con.close()
+        (Path(tempfile.gettempdir()) / f"parking-bench-export-{os.getpid()}").unlink(missing_ok=True)
+    return timings
+
+
+def run_history(
+    days: int,
+    work: Path,
+    *,
+    shape: dict,
+    storage: str = "full",
+    repeat: int = 5,
+    sync_days: float = 7,
+    log: Callable[[str], None] = lambda msg: None,
+) -> dict:
+    """Build, sync and query one history length; returns its report entry."""
+    db_path = work / f"bench-{days}d.duckdb"
+    clock = _Clock()
+    log(f"{days}d: building cache ...")
+    rows = build_cache(db_path, days, shape, storage, clock)
+    timings = dict(clock.seconds)
+    if moto is not None and sync_days > 0:
+        log(f"{days}d: syncing {sync_days:g} days from moto ...")
+        timings |= time_sync(work, min(sync_days, days), shape)
+    log(f"{days}d: timing dashboard queries ...")
+    timings |= time_queries(db_path, repeat)
+    con = store.connect(read_only=True, db_path=db_path)
+    try:
+        readings = con.execute("SELECT count(*) FROM readings").fetchone()[0]
+    finally:
+        con.close()
+    return {
+        "days": days,
+        "snapshots": days * dt.timedelta(days=1) // SNAPSHOT_INTERVAL,
+        "rows": rows,
+        "readings": readings,
+        "file_mb": round(db_path.stat().st_size / 1e6, 2),
+        "timings": {k: round(v, 6) for k, v in timings.items()},
+    }
+
+
+def report(histories: list[int], work: Path, **kwargs) -> dict:
+    """The full benchmark report for each history length (in days)."""
+    shape = kwargs["shape"]
+    return {
+        "version": REPORT_VERSION,
+        "meta": {
+            "commit": _git_commit(),
+            "created": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "pyarrow": pa.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            **shape,
+            "storage": kwargs.get("storage", "full"),
+            "repeat": kwargs.get("repeat", 5),
+            "sync_days": kwargs.get("sync_days", 7) if moto is not None else 0,
+            "page_items": PAGE_ITEMS,
+        },
+        "runs": {f"{days}d": run_history(days, work, **kwargs) for days in histories},
+    }
+
+
+def compare(before: dict, after: dict) -> pd.DataFrame:
+    """Per run and timing: seconds before, after, and the after/before ratio."""
+    rows = []
+    for run, old in before["runs"].items():
+        new = after["runs"].get(run)
+        if new is None:
+            continue
+        for name, seconds in old["timings"].items():
+            if name in new["timings"]:
+                rows.append((run, name, seconds, new["timings"][name]))
+    df = pd.DataFrame(rows, columns=["run", "timing", "before_s", "after_s"])
+    df["ratio"] = df["after_s"] / df["before_s"].where(df["before_s"] > 0)
+    return df
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m parking.bench", description="Time the parking pipeline over synthetic history."
+    )
+    parser.add_argument(
+        "--history", nargs="+", type=history_days, default=[30], metavar="LEN",
+        help="history lengths to build, e.g. 30d 1m 1y 5y (default: 1m)",
+    )
+    parser.add_argument("--garages", type=int, default=3)
+    parser.add_argument("--levels", type=int, default=6, help="levels per garage")
+    parser.add_argument("--zones", type=int, default=3, help="zones per level")
+    parser.add_argument("--storage", choices=store.STORAGE_MODES, default="full", help="readings layout")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query (the median is reported)")
+    parser.add_argument("--sync-days", type=float, default=7, help="days of items to sync from moto (0 = skip)")
+    parser.add_argument("--keep", type=Path, help="build the caches in this directory and keep them")
+    parser.add_argument("-o", "--output", type=Path, help="write the JSON report here (default: stdout)")
+    parser.add_argument(
+        "--compare", nargs=2, type=Path, metavar=("BEFORE", "AFTER"), help="diff two reports and exit"
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        before, after = (json.loads(p.read_text()) for p in args.compare)
+        with pd.option_context("display.max_rows", None, "display.width", 120):
+            print(compare(before, after).to_string(index=False, float_format="{:.4f}".format))
+        return 0
+
+    def log(msg: str) -> None:
+        print(msg, file=sys.stderr, flush=True)
+
+    kwargs = dict(
+        shape={"garages": args.garages, "levels": args.levels, "zones": args.zones},
+        storage=args.storage, repeat=args.repeat, sync_days=args.sync_days, log=log,
+    )
+    if moto is None:
+        log("moto isn't installed; skipping the sync stage.")
+    if args.keep:
+        args.keep.mkdir(parents=True, exist_ok=True)
+        result = report(args.history, args.keep, **kwargs)
+    else:
+        with tempfile.TemporaryDirectory(prefix="parking-bench-") as work:
+            result = report(args.history, Path(work), **kwargs)
+    text = json.dumps(result, indent=2) + "\n"
+    if args.output:
+        args.output.write_text(text)
+        log(f"Wrote {args.output}.")
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
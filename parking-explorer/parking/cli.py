@@ -0,0 +1,209 @@
+"""Headless queries over the DuckDB cache, for scripts, cron jobs and batch reports:
+
+    poetry run python -m parking latest
+    poetry run python -m parking trend --start 2026-01-01 --end 2026-03-31 -f csv
+    poetry run python -m parking heatmap --garage "Second Avenue"
+    poetry run python -m parking anomalies --since 2026-01-01 -f parquet -o anomalies.parquet
+    poetry run python -m parking export --granularity level -f parquet -o levels.parquet
+
+Every subcommand runs the same SQL as the matching app view (``parking.queries``,
+``parking.series``, ``parking.export``, ``parking.anomalies``) over a read-only
+connection, and goes through the app's on-disk result cache — so a report the
+app (or an earlier run) already computed at this data version is read back
+from Parquet without touching the query engine. Results are written as JSON
+records (default), CSV or Parquet, to stdout or ``--output``.
+
+Like the app's sidebar, the date range defaults to the last 28 days of cached
+data and the garages to all of them; ``--end`` is inclusive.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import sys
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from . import anomalies, export, queries, resultcache, series, store
+from .config import DB_PATH
+
+OUTPUT_FORMATS = ("json", "csv", "parquet")
+DEFAULT_DAYS = 28  # the app's default range
+
+
+class Session:
+    """A read-only connection (to the read replica, when one is published) plus the
+    cache's data version and result cache."""
+
+    def __init__(self, db_path: Path):
+        self.con = store.connect(read_only=True, db_path=store.read_path(db_path))
+        self.version = store.data_version(self.con)
+        self.cache = resultcache.for_db(db_path)
+
+    def query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        return self.cache.get_or_compute(
+            sql, params, self.version, lambda: self.con.execute(sql, params).df()
+        )
+
+    def date_range(self, start: dt.date | None, end: dt.date | None) -> tuple[dt.date, dt.date]:
+        """``[start, end + 1 day)``, defaulting like the app's date picker."""
+        min_date, max_date, _ = self.query(queries.BOUNDS_SQL).iloc[0]
+        min_date, max_date = pd.Timestamp(min_date).date(), pd.Timestamp(max_date).date()
+        end = end or max_date
+        start = start or max(min_date, end - dt.timedelta(days=DEFAULT_DAYS))
+        return start, end + dt.timedelta(days=1)
+
+    def garages(self, picked: list[str] | None) -> list[str]:
+        return picked or self.query(queries.GARAGES_SQL)["garage"].tolist()
+
+    def close(self) -> None:
+        self.con.close()
+
+
+def emit(df: pd.DataFrame, fmt: str, output: str | None) -> None:
+    """Write ``df`` as ``fmt`` to ``output`` (a path) or stdout."""
+    if fmt == "parquet":
+        df.to_parquet(output or sys.stdout.buffer, index=False)
+    elif fmt == "csv":
+        df.to_csv(output or sys.stdout, index=False)
+    else:
+        text = df.to_json(orient="records", date_format="iso", indent=None)
+        if output:
+            Path(output).write_text(text + "\n")
+        else:
+            sys.stdout.write(text + "\n")
+
+
+# --- subcommands: each returns the result frame -------------------------------
+
+
+def cmd_latest(s: Session, args) -> pd.DataFrame:
+    """Each garage at the newest snapshot, with the change in free bays since the previous one."""
+    rows = s.query(queries.LATEST_SQL)
+    stamps = sorted(rows["request_timestamp"].unique(), reverse=True)
+    cur = rows[rows["request_timestamp"] == stamps[0]]
+    if len(stamps) > 1:
+        prev = rows.loc[rows["request_timestamp"] == stamps[1], ["garage", "available_bays"]]
+        cur = cur.merge(prev, on="garage", how="left", suffixes=("", "_prev"))
+        cur["available_delta"] = cur["available_bays"] - cur.pop("available_bays_prev")
+    return cur.reset_index(drop=True)
+
+
+def cmd_trend(s: Session, args) -> pd.DataFrame:
+    start, end = s.date_range(args.start, args.end)
+    _, sql, params = series.plan(start, end, s.garages(args.garage), args.width)
+    return series.reduce(s.query(sql, params), args.width)
+
+
+def cmd_heatmap(s: Session, args) -> pd.DataFrame:
+    start, end = s.date_range(args.start, args.end)
+    return s.query(*queries.heatmap(start, end, s.garages(args.garage)))
+
+
+def cmd_anomalies(s: Session, args) -> pd.DataFrame:
+    if args.full:
+        found = s.cache.get_or_compute("-- anomalies detect", (), s.version, lambda: anomalies.detect(s.con))
+    else:  # the app's cache entry: the persisted log, or a full pass on older caches
+        found = s.cache.get_or_compute("-- anomalies", (), s.version, lambda: anomalies.current(s.con))
+    keep = pd.Series(True, index=found.index)
+    if args.since:
+        keep &= pd.to_datetime(found["date"]) >= pd.Timestamp(args.since)
+    if args.garage:
+        keep &= found["garage"].isin(args.garage)
+    if args.type:
+        keep &= found["type"].isin(args.type)
+    return found[keep].reset_index(drop=True)
+
+
+def cmd_export(s: Session, args) -> int:
+    """Stream rows to ``--output`` with DuckDB's COPY; returns rows written."""
+    start, end = s.date_range(args.start, args.end)
+    return export.export(
+        s.con, args.output, start=start, end=end, garages=s.garages(args.garage),
+        granularity=args.granularity, fmt=args.format, compress=args.zstd,
+    )
+
+
+# --- argument parsing ----------------------------------------------------------
+
+
+def _date(value: str) -> dt.date:
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value!r}") from None
+
+
+def _range_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--start", type=_date, help="first local day (default: 28 days before --end)")
+    p.add_argument("--end", type=_date, help="last local day, inclusive (default: newest cached)")
+    p.add_argument("--garage", action="append", help="limit to this garage (repeatable; default: all)")
+
+
+def _output_args(p: argparse.ArgumentParser, formats=OUTPUT_FORMATS) -> None:
+    p.add_argument("-f", "--format", choices=formats, default=formats[0])
+    p.add_argument("-o", "--output", help="write to this file instead of stdout")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="parking", description="Query the local parking cache.")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help=f"DuckDB cache file (default: {DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("latest", help="free bays per garage at the newest snapshot")
+    _output_args(p)
+    p.set_defaults(run=cmd_latest)
+
+    p = sub.add_parser("trend", help="occupancy over time (the Overview chart's series)")
+    _range_args(p)
+    p.add_argument("--width", type=int, default=series.DEFAULT_WIDTH_PX, help="point budget per garage")
+    _output_args(p)
+    p.set_defaults(run=cmd_trend)
+
+    p = sub.add_parser("heatmap", help="occupancy by weekday x hour (the Patterns heatmap)")
+    _range_args(p)
+    _output_args(p)
+    p.set_defaults(run=cmd_heatmap)
+
+    p = sub.add_parser("anomalies", help="flagged days, newest and most severe first")
+    p.add_argument("--since", type=_date, help="only days on or after this date")
+    p.add_argument("--garage", action="append", help="limit to this garage (repeatable)")
+    p.add_argument("--type", action="append", help="limit to this anomaly type (repeatable)")
+    p.add_argument("--full", action="store_true", help="run every detector now instead of reading the log")
+    _output_args(p)
+    p.set_defaults(run=cmd_anomalies)
+
+    p = sub.add_parser("export", help="snapshot rows to a CSV/Parquet file (streamed by DuckDB)")
+    _range_args(p)
+    p.add_argument("--granularity", choices=list(export.GRANULARITIES), default="garage")
+    p.add_argument("--zstd", action="store_true", help="zstd-compress the file")
+    p.add_argument("-f", "--format", choices=export.FORMATS, default="csv")
+    p.add_argument("-o", "--output", required=True, help="file to write")
+    p.set_defaults(run=cmd_export)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.db.exists():
+        sys.exit(f"No cache at {args.db}; run sync_cli.py first.")
+    try:
+        session = Session(args.db)
+    except duckdb.IOException as e:  # e.g. a sync holds the file for writing
+        sys.exit(f"Can't read {args.db}: {e}")
+    try:
+        if session.version.rows == 0:
+            sys.exit("The cache is empty; run sync_cli.py first.")
+        if not store.rollups_ready(session.con):
+            sys.exit("The cache's derived tables are out of date; run sync_cli.py first.")
+        result = args.run(session, args)
+    finally:
+        session.close()
+    if isinstance(result, int):
+        print(f"Wrote {result:,} rows to {args.output}.", file=sys.stderr)
+    else:
+        emit(result, args.format, args.output)
+    return 0
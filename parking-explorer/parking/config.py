@@ -22,6 +22,68 @@ LOCAL_TZ = os.getenv("PARKING_TZ", "America/Chicago")
 
 DB_PATH = Path(os.getenv("PARKING_DB_PATH", PROJECT_ROOT / "parking.duckdb"))
 
+# How long a connection waits for another process's conflicting DuckDB file
+# lock (a sync writing, or a reader holding the file open) before giving up.
+WRITE_LOCK_WAIT_SECONDS = float(os.getenv("PARKING_WRITE_LOCK_WAIT_SECONDS", "60"))
+
+# Sync daemon (``sync_cli.py --daemon``): sync every interval on a grid aligned
+# to the collector's 5-minute cadence, shifted by an offset so each run starts
+# after that slot's snapshot has landed. The app polls the data version as often
+# as APP_POLL_SECONDS (0 = only on interaction).
+SYNC_INTERVAL_SECONDS = max(1, int(os.getenv("PARKING_SYNC_INTERVAL_SECONDS", "300")))
+SYNC_OFFSET_SECONDS = int(os.getenv("PARKING_SYNC_OFFSET_SECONDS", "60"))
+APP_POLL_SECONDS = int(os.getenv("PARKING_APP_POLL_SECONDS", "60"))
+
+# The app keeps one shared read-only connection open between queries; it is
+# closed after this many idle seconds so a sync in another process can write.
+POOL_IDLE_SECONDS = float(os.getenv("PARKING_POOL_IDLE_SECONDS", "30"))
+
+# Read replica: each sync publishes a copy of the cache as ``<db stem>.read.duckdb``
+# (written to a staging file, then renamed into place) and readers open that copy,
+# so the app and CLI never contend with a sync for the cache file's lock. Set it
+# for the sync daemon and the app alike.
+READ_REPLICA = os.getenv("PARKING_READ_REPLICA", "").strip().lower() in ("1", "true", "yes", "on")
+
+# On-disk query result cache (``<db stem>_results/`` beside the cache file),
+# bounded to this many megabytes with LRU eviction. 0 disables it.
+RESULT_CACHE_MB = max(0, int(os.getenv("PARKING_RESULT_CACHE_MB", "256")))
+
+# Query service (``python -m parking.service``): when set, the app sends its
+# queries to the service at this address -- ``http://host:port`` or
+# ``unix:/path/to.sock`` -- instead of opening the cache itself. The service
+# keeps up to SERVICE_MEMORY_MB of recent results in memory on top of the
+# on-disk result cache.
+QUERY_SERVICE = os.getenv("PARKING_QUERY_SERVICE", "").strip()
+SERVICE_MEMORY_MB = max(0, int(os.getenv("PARKING_SERVICE_MEMORY_MB", "128")))
+
+# Archive mode: after each sync, move whole months older than the newest N
+# months of hot rows into Parquet beside the cache file. Unset/0 = keep all hot.
+ARCHIVE_HOT_MONTHS = int(os.getenv("PARKING_ARCHIVE_HOT_MONTHS") or 0)
+
+# How readings are stored: "full" keeps every node of every snapshot, "changes"
+# keeps a node's reading only when its counts changed (see parking/store.py).
+# Switching converts the cache on the next sync.
+STORAGE_MODE = os.getenv("PARKING_STORAGE_MODE", "full").strip().lower()
+
+# Incremental sync source: "scan" uses the filtered table scan, "query" reads only
+# new items through the time-bucket GSI (see parking/gsi.py), "auto" queries when
+# the index exists and is ACTIVE. Querying is opt-in: it only sees items the
+# collector tagged with the bucket attribute, so enable it once it does.
+SYNC_MODES = ("scan", "query", "auto")
+SYNC_MODE = os.getenv("PARKING_SYNC_MODE", "scan").strip().lower()
+if SYNC_MODE not in SYNC_MODES:
+    raise ValueError(f"PARKING_SYNC_MODE must be one of {', '.join(SYNC_MODES)}, not {SYNC_MODE!r}")
+GSI_NAME = os.getenv("PARKING_GSI_NAME", "gsi_pk-request_timestamp-index")
+
+# Parallel scan segments (DynamoDB Segment/TotalSegments), one worker thread
+# each. Backfills scale with this instead of being bound by one page round-trip.
+SCAN_SEGMENTS = max(1, int(os.getenv("PARKING_SCAN_SEGMENTS", "4")))
+
+# Sync pipeline: flattened rows are inserted in batches of up to this many rows,
+# and at most this many scan pages may wait between stages (backpressure).
+INSERT_BATCH_ROWS = max(1, int(os.getenv("PARKING_INSERT_BATCH_ROWS", "50000")))
+PIPELINE_DEPTH = max(1, int(os.getenv("PARKING_PIPELINE_DEPTH", "8")))
+
 # Ignore data before this local date. The Lambda had a ~6-month outage in 2025;
 # continuous collection resumed 2025-08-20, so earlier data is dropped on sync
 # and never re-downloaded. Set PARKING_START_DATE="" to keep everything.
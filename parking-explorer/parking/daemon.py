@@ -0,0 +1,72 @@
+"""Scheduled sync service: keep the cache current without anyone pressing Sync.
+
+The collector writes one snapshot every 5 minutes, so the daemon syncs on the
+same grid: runs start at ``k * interval + offset`` seconds past the epoch (by
+default 1 minute after each 5-minute mark, once that slot's snapshot has
+landed). It syncs once immediately on start, then at each grid point; a run
+that overruns simply skips the grid points it missed rather than queueing them.
+
+The daemon is the cache file's single writer: :func:`parking.sync.sync` holds
+the file's writer lock, so a second daemon — or a manual sync while one is
+running — skips instead of contending. The Streamlit app keeps serving
+read-only queries meanwhile and picks up each run's data by polling the cheap
+data version (``store.data_version``), never by scanning anything itself.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from typing import Callable
+
+from . import store
+from .config import SYNC_INTERVAL_SECONDS, SYNC_OFFSET_SECONDS
+from .sync import sync
+
+log = logging.getLogger(__name__)
+
+
+def next_run(now: float, interval: float, offset: float = 0.0) -> float:
+    """The first grid point (epoch seconds) strictly after ``now``."""
+    return (math.floor((now - offset) / interval) + 1) * interval + offset
+
+
+def run(
+    db_path=None,
+    *,
+    interval: float = SYNC_INTERVAL_SECONDS,
+    offset: float = SYNC_OFFSET_SECONDS,
+    stop: threading.Event | None = None,
+    max_runs: int | None = None,
+    clock: Callable[[], float] = time.time,
+) -> int:
+    """Sync now, then on every grid point until ``stop`` is set. Returns runs attempted.
+
+    A failed run is logged and retried at the next grid point; the daemon only
+    exits when stopped (or after ``max_runs``, for tests).
+    """
+    stop = stop or threading.Event()
+    runs = 0
+    while not stop.is_set():
+        try:
+            result = sync(db_path=db_path)
+        except store.WriterBusy as e:
+            log.info("skipping this run: %s", e)
+        except Exception:
+            log.exception("sync failed; retrying at the next run")
+        else:
+            log.info(
+                "synced %d new snapshots (%d rows) in %.1fs; cache generation %d, %d rows",
+                result["new_items"], result["rows_inserted"], result["timings"]["wall"],
+                result["generation"], result["total_rows"],
+            )
+        runs += 1
+        if max_runs is not None and runs >= max_runs:
+            break
+        now = clock()
+        wake = next_run(now, interval, offset)
+        log.debug("next run at %s", time.strftime("%H:%M:%S", time.localtime(wake)))
+        stop.wait(wake - now)
+    return runs
@@ -0,0 +1,98 @@
+"""Export snapshot rows to CSV or Parquet straight from DuckDB.
+
+``COPY (SELECT ...) TO`` streams the result from DuckDB's executor to the file,
+so an export never becomes a DataFrame (or a Python string) however long the
+range. Exports come at three granularities — the garage rows the Data tab
+shows, or the per-level / per-zone rows from the raw ``parking`` view — and
+either format can be zstd-compressed (CSV as ``.csv.zst``).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO
+
+import duckdb
+
+from .queries import in_clause
+
+FORMATS = ("csv", "parquet")
+
+# Granularity -> (source + node filter, identifying columns).
+GRANULARITIES = {
+    "garage": ("garage_snapshots WHERE true", ["garage"]),
+    "level": ("parking WHERE node_type = 'level'", ["garage", "level"]),
+    "zone": ("parking WHERE node_type = 'zone'", ["garage", "level", "zone"]),
+}
+
+_MEASURES = "available_bays, occupied_bays, total_bays, occupancy_pct"
+
+
+def export_sql(
+    granularity: str, start: dt.date | dt.datetime, end: dt.date | dt.datetime, garages: list[str]
+) -> tuple[str, tuple]:
+    """The export SELECT + params, over local time ``[start, end)``."""
+    source, keys = GRANULARITIES[granularity]
+    key_list = ", ".join(keys)
+    g_clause, g_params = in_clause(garages)
+    sql = (
+        f"SELECT ts_local, {key_list}, {_MEASURES} FROM {source} "
+        f"AND ts_local >= ? AND ts_local < ? AND garage IN {g_clause} "
+        f"ORDER BY ts_local, {key_list}"
+    )
+    return sql, (start, end, *g_params)
+
+
+def file_name(granularity: str, fmt: str, compress: bool) -> str:
+    suffix = {"csv": ".csv.zst" if compress else ".csv", "parquet": ".parquet"}[fmt]
+    return f"parking_{granularity}_snapshots{suffix}"
+
+
+def mime_type(fmt: str, compress: bool) -> str:
+    if fmt == "csv" and not compress:
+        return "text/csv"
+    return "application/zstd" if fmt == "csv" else "application/vnd.apache.parquet"
+
+
+def export(
+    con: duckdb.DuckDBPyConnection,
+    path,
+    *,
+    start: dt.date | dt.datetime,
+    end: dt.date | dt.datetime,
+    garages: list[str],
+    granularity: str = "garage",
+    fmt: str = "csv",
+    compress: bool = False,
+) -> int:
+    """Write the rows to ``path`` with ``COPY ... TO``. Returns rows written."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}; expected one of {FORMATS}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"unknown granularity {granularity!r}; expected one of {tuple(GRANULARITIES)}")
+    options = ["FORMAT csv", "HEADER"] if fmt == "csv" else ["FORMAT parquet"]
+    if compress:
+        options.append("COMPRESSION zstd")
+    target = str(path).replace("'", "''")
+    sql, params = export_sql(granularity, start, end, garages)
+    return con.execute(f"COPY ({sql}) TO '{target}' ({', '.join(options)})", params).fetchone()[0]
+
+
+def export_file(con: duckdb.DuckDBPyConnection, dir=None, **kwargs) -> BinaryIO:
+    """Export into a temp file (in ``dir``, default the system's) and return it opened for reading.
+
+    The file is unlinked as soon as it is open, so it disappears when the
+    handle is closed (or garbage-collected) with nothing left to clean up.
+    """
+    fd, name = tempfile.mkstemp(prefix="parking-export-", dir=dir)
+    os.close(fd)
+    path = Path(name)
+    try:
+        export(con, path, **kwargs)
+        fh = open(path, "rb")
+    finally:
+        path.unlink(missing_ok=True)
+    return fh
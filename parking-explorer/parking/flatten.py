@@ -15,9 +15,13 @@ per node, tagged with its depth (``node_type``) and its ancestry
 from __future__ import annotations
 
 import datetime as dt
-from typing import Any
+from typing import Any, Iterable
 from zoneinfo import ZoneInfo
 
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
 from .config import LOCAL_TZ
 
 _UTC = ZoneInfo("UTC")
@@ -43,6 +47,25 @@ COLUMNS = [
     "occupancy_pct",
 ]
 
+# Arrow types for the columnar path; must line up with COLUMNS and store._SCHEMA.
+ARROW_SCHEMA = pa.schema(
+    [
+        ("request_timestamp", pa.string()),
+        ("ts_utc", pa.timestamp("us")),
+        ("ts_local", pa.timestamp("us")),
+        ("node_type", pa.string()),
+        ("garage", pa.string()),
+        ("level", pa.string()),
+        ("zone", pa.string()),
+        ("name", pa.string()),
+        ("path", pa.string()),
+        ("total_bays", pa.int32()),
+        ("occupied_bays", pa.int32()),
+        ("available_bays", pa.int32()),
+        ("occupancy_pct", pa.float64()),
+    ]
+)
+
 
 def parse_timestamp(raw: str) -> dt.datetime:
     """Parse ``request_timestamp`` into an aware UTC datetime.
@@ -60,6 +83,27 @@ def parse_timestamp(raw: str) -> dt.datetime:
     return parsed.astimezone(_UTC)
 
 
+def parse_timestamps(raws: list[str]) -> tuple[pa.Array, pa.Array]:
+    """Vectorized :func:`parse_timestamp` for a whole page: naive UTC + naive local.
+
+    One pandas parse and one tz conversion per column instead of a
+    ``fromisoformat`` and two ``ZoneInfo`` hops per item. Accepts the same
+    variants (naive, ``Z``, explicit offset); the local conversion uses the tz
+    database, so DST transitions in ``LOCAL_TZ`` are handled per value.
+    """
+    if not raws:
+        empty = pa.array([], pa.timestamp("us"))
+        return empty, empty
+    utc = pd.to_datetime(
+        pd.Series(raws, dtype="string").str.strip(), utc=True, format="ISO8601"
+    ).dt.as_unit("us")
+    local = utc.dt.tz_convert(LOCAL_TZ).dt.tz_localize(None)
+    return (
+        pa.array(utc.dt.tz_localize(None), pa.timestamp("us")),
+        pa.array(local, pa.timestamp("us")),
+    )
+
+
 def flatten_response(api: dict[str, Any], request_timestamp: str) -> list[dict]:
     """Flatten one ``api_response`` dict into a list of row dicts."""
     ts_utc_aware = parse_timestamp(request_timestamp)
@@ -96,3 +140,71 @@ def flatten_response(api: dict[str, Any], request_timestamp: str) -> list[dict]:
 
     walk(api, [], 0)
     return rows
+
+
+def flatten_page(snapshots: Iterable[tuple[str, dict[str, Any]]]) -> pa.Table:
+    """Flatten a whole page of ``(request_timestamp, api_response)`` pairs at once.
+
+    Same rows as calling :func:`flatten_response` per snapshot, but values are
+    appended straight into per-column lists and returned as one Arrow table, so
+    a backfill never builds a dict per node.
+    """
+    raw_ts: list[str] = []
+    snap_idx: list[int] = []  # which snapshot each node row came from
+    node_type: list[str] = []
+    garage: list[str | None] = []
+    level: list[str | None] = []
+    zone: list[str | None] = []
+    name: list[str | None] = []
+    path: list[str] = []
+    total: list[int] = []
+    occupied: list[int] = []
+
+    for i, (request_timestamp, api) in enumerate(snapshots):
+        raw_ts.append(request_timestamp)
+        # Explicit stack instead of recursion; children are pushed reversed so
+        # rows come out in the same pre-order as flatten_response.
+        stack: list[tuple[dict, tuple[str, ...]]] = [(api, ())]
+        while stack:
+            node, ancestry = stack.pop()
+            t = int(node.get("TotalBays") or 0)
+            n = node.get("Name")
+            depth = len(ancestry)
+            snap_idx.append(i)
+            node_type.append(_NODE_TYPES.get(depth, f"depth_{depth}"))
+            garage.append(ancestry[0] if depth >= 1 else None)
+            level.append(ancestry[1] if depth >= 2 else None)
+            zone.append(ancestry[2] if depth >= 3 else None)
+            name.append(n)
+            path.append(" > ".join(ancestry) if ancestry else (n or "root"))
+            total.append(t)
+            occupied.append(int(node.get("OccupiedBays") or 0))
+            for child in reversed(node.get("Zones") or []):
+                stack.append((child, ancestry + (child.get("Name"),)))
+
+    ts_utc, ts_local = parse_timestamps(raw_ts)
+    idx = pa.array(snap_idx, pa.int32())
+    total_arr = pa.array(total, pa.int32())
+    occupied_arr = pa.array(occupied, pa.int32())
+    return pa.Table.from_arrays(
+        [
+            pa.array(raw_ts, pa.string()).take(idx),
+            ts_utc.take(idx),
+            ts_local.take(idx),
+            pa.array(node_type, pa.string()),
+            pa.array(garage, pa.string()),
+            pa.array(level, pa.string()),
+            pa.array(zone, pa.string()),
+            pa.array(name, pa.string()),
+            pa.array(path, pa.string()),
+            total_arr,
+            occupied_arr,
+            pc.subtract(total_arr, occupied_arr),
+            pc.if_else(
+                pc.equal(total_arr, 0),
+                pa.scalar(None, pa.float64()),
+                pc.multiply(pc.divide(occupied_arr.cast(pa.float64()), total_arr), 100.0),
+            ),
+        ],
+        schema=ARROW_SCHEMA,
+    )
@@ -0,0 +1,106 @@
+"""Time-bucket GSI that lets incremental syncs Query instead of Scan.
+
+The base table's partition key is ``request_timestamp`` itself, so "everything
+newer than X" can only be a filtered Scan that reads (and bills) every item.
+A global secondary index keyed on a coarse bucket fixes that:
+
+* partition key ``gsi_pk`` — the snapshot's UTC month, e.g. ``"2026-01"``
+* sort key ``request_timestamp``
+
+so ``gsi_pk = :month AND request_timestamp > :last`` reads only new items, one
+small Query per month since the last sync. Monthly buckets keep the number of
+Queries tiny while each partition still takes just one write every 5 minutes.
+
+The index is sparse: only items carrying ``gsi_pk`` appear in it. The
+collector must set the attribute on every new item, and :func:`backfill`
+writes it once onto the items stored before that. Nothing here can tell
+whether the collector does: an untagged item is simply never returned, and
+sync would report "no new data" forever. So Query mode is opt-in
+(``PARKING_SYNC_MODE=auto`` or ``query``; the default is ``scan``). With
+``auto``, sync uses the index only when it exists and is ACTIVE (see
+:func:`index_ready`), falling back to the filtered Scan otherwise.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+from botocore.exceptions import ClientError
+
+from .config import GSI_NAME, TABLE_NAME
+
+BUCKET_ATTR = "gsi_pk"
+
+
+def bucket_of(request_timestamp: str) -> str:
+    """The GSI bucket of a UTC ISO ``request_timestamp``: its ``YYYY-MM`` month."""
+    return request_timestamp[:7]
+
+
+def buckets_between(first: str, now: dt.datetime | None = None) -> list[str]:
+    """Every monthly bucket from ``first`` (a bucket) through the current UTC month."""
+    now = now or dt.datetime.now(dt.timezone.utc)
+    year, month = int(first[:4]), int(first[5:7])
+    buckets = []
+    while (year, month) <= (now.year, now.month):
+        buckets.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
+
+def index_ready(client, table_name: str = TABLE_NAME, index_name: str = GSI_NAME) -> bool:
+    """True if the table has the bucket index, ACTIVE (done building) and projecting
+    ``api_response`` — a keys-only index would hand sync items it can't decode."""
+    try:
+        table = client.describe_table(TableName=table_name)["Table"]
+    except ClientError:
+        return False
+    for idx in table.get("GlobalSecondaryIndexes", []):
+        if idx["IndexName"] != index_name or idx.get("IndexStatus", "ACTIVE") != "ACTIVE":
+            continue
+        projection = idx.get("Projection", {})
+        return projection.get("ProjectionType") == "ALL" or (
+            projection.get("ProjectionType") == "INCLUDE"
+            and "api_response" in projection.get("NonKeyAttributes", [])
+        )
+    return False
+
+
+def backfill(client, table_name: str = TABLE_NAME, progress=None) -> dict:
+    """Write ``gsi_pk`` onto every item that lacks it. Safe to re-run.
+
+    Scans keys only (``request_timestamp``) for items without the attribute and
+    sets it with a conditional update, so items the collector tags meanwhile
+    are left alone. ``progress(updated, scanned)`` is called after each page.
+    """
+    kwargs = {
+        "TableName": table_name,
+        "ProjectionExpression": "request_timestamp",
+        "FilterExpression": "attribute_not_exists(#b)",
+        "ExpressionAttributeNames": {"#b": BUCKET_ATTR},
+    }
+    updated = scanned = 0
+    while True:
+        resp = client.scan(**kwargs)
+        scanned += resp.get("ScannedCount", 0)
+        for item in resp.get("Items", []):
+            ts = item["request_timestamp"]["S"]
+            try:
+                client.update_item(
+                    TableName=table_name,
+                    Key={"request_timestamp": {"S": ts}},
+                    UpdateExpression="SET #b = :b",
+                    ConditionExpression="attribute_not_exists(#b)",
+                    ExpressionAttributeNames={"#b": BUCKET_ATTR},
+                    ExpressionAttributeValues={":b": {"S": bucket_of(ts)}},
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+        if progress:
+            progress(updated, scanned)
+        lek = resp.get("LastEvaluatedKey")
+        if not lek:
+            return {"updated": updated, "scanned": scanned}
+        kwargs["ExclusiveStartKey"] = lek
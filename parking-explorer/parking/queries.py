@@ -0,0 +1,155 @@
+"""SQL shared by the Streamlit app and the ``parking`` CLI.
+
+Both front-ends build their queries here, so a CLI report and the chart it
+mirrors read exactly the same rows — and, since the on-disk result cache is
+keyed by SQL + params, they share each other's cached results too.
+
+Builders return ``(sql, params)``; date ranges are local time ``[start, end)``.
+The benchmark harness (``parking.bench``) times every one of them.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+# min/max local day plus the newest snapshot time.
+BOUNDS_SQL = "SELECT min(ts_local)::DATE, max(ts_local)::DATE, max(ts_local) FROM garage_snapshots"
+
+GARAGES_SQL = "SELECT DISTINCT garage FROM garage_snapshots ORDER BY garage"
+
+# Garage rows of the two newest snapshots (the "Right now" KPIs and their deltas),
+# from the two-snapshot ``latest_snapshot`` table sync keeps.
+LATEST_SQL = """
+    SELECT request_timestamp, garage, available_bays, total_bays, occupancy_pct
+    FROM latest_snapshot WHERE node_type = 'garage'
+    ORDER BY recency, garage
+    """
+
+# Level rows of one garage (param) at the newest snapshot, in level order.
+LEVELS_SQL = r"""
+    SELECT level, available_bays, occupied_bays, total_bays, occupancy_pct
+    FROM latest_snapshot
+    WHERE recency = 0 AND node_type = 'level' AND garage = ? AND total_bays > 0
+    ORDER BY try_cast(regexp_extract(level, '\d+') AS INTEGER) NULLS LAST, level
+    """
+
+
+def in_clause(garages: list[str]) -> tuple[str, tuple]:
+    """Build an ``IN (?, ?, …)`` fragment + params for a garage list.
+
+    No garages gives ``IN (NULL)``, which matches nothing (``IN ()`` doesn't parse).
+    """
+    placeholders = ",".join(["?"] * len(garages)) or "NULL"
+    return f"({placeholders})", tuple(garages)
+
+
+def heatmap(start: dt.date, end: dt.date, garages: list[str]) -> tuple[str, tuple]:
+    """Capacity-weighted occupancy by weekday x hour of day, Monday first."""
+    g_clause, g_params = in_clause(garages)
+    sql = f"""
+        SELECT dayname(hour) AS dow, hour(hour) AS hr,
+               100.0 * sum(sum_occupied) / nullif(sum(sum_total), 0) AS occupancy_pct
+        FROM hourly_rollup
+        WHERE node_type='garage' AND hour >= ? AND hour < ? AND garage IN {g_clause}
+        GROUP BY 1, 2 ORDER BY any_value(isodow(hour)), hr
+        """
+    return sql, (start, end, *g_params)
+
+
+def calendar(garages: list[str]) -> tuple[str, tuple]:
+    """Daily peak and mean capacity-weighted occupancy over the whole history.
+
+    The peak is the day's busiest hour (hourly means, from ``hourly_rollup``),
+    so the full-history chart reads 24 rows per garage-day, not every snapshot.
+    """
+    g_clause, g_params = in_clause(garages)
+    sql = f"""
+        WITH hours AS (
+            SELECT hour, sum(sum_occupied) AS occupied, sum(sum_total) AS total
+            FROM hourly_rollup WHERE node_type='garage' AND garage IN {g_clause}
+            GROUP BY hour
+        )
+        SELECT hour::DATE AS day, max(100.0 * occupied / nullif(total, 0)) AS peak,
+               100.0 * sum(occupied) / nullif(sum(total), 0) AS avg_occ
+        FROM hours GROUP BY day ORDER BY day
+        """
+    return sql, g_params
+
+
+def typical_day(
+    start: dt.date, end: dt.date, garages: list[str], days: list[str] | None = None
+) -> tuple[str, tuple]:
+    """Median and 10th-90th percentile occupancy by hour of day, one curve per
+    weekday in ``days`` (day names), or weekday vs weekend when ``days`` is None.
+
+    The spread is across the range's days: each day contributes its hourly mean
+    for every hour of day (``hourly_rollup``).
+    """
+    g_clause, g_params = in_clause(garages)
+    where = f"node_type='garage' AND hour >= ? AND hour < ? AND garage IN {g_clause}"
+    if days:
+        day_type = "dayname(hour)"
+        where += f" AND dayname(hour) IN ({','.join(['?'] * len(days))})"
+    else:
+        day_type = "CASE WHEN dayofweek(hour) IN (0, 6) THEN 'Weekend' ELSE 'Weekday' END"
+    sql = f"""
+        WITH hours AS (
+            SELECT hour, hour(hour) AS hr, {day_type} AS day_type,
+                   100.0 * sum(sum_occupied) / nullif(sum(sum_total), 0) AS occ
+            FROM hourly_rollup WHERE {where}
+            GROUP BY hour
+        )
+        SELECT hr, day_type, median(occ) AS med,
+               quantile_cont(occ, 0.1) AS lo, quantile_cont(occ, 0.9) AS hi
+        FROM hours GROUP BY hr, day_type ORDER BY hr
+        """
+    return sql, (start, end, *g_params, *(days or ()))
+
+
+def net_flow(start: dt.date, end: dt.date, garages: list[str]) -> tuple[str, tuple]:
+    """Average net change in parked cars per hour, by hour of day.
+
+    An hour's net change is its closing occupancy minus the previous hour's
+    (``hourly_rollup.last_occupied``); hours after a gap in the data are skipped.
+    """
+    g_clause, g_params = in_clause(garages)
+    sql = f"""
+        WITH hours AS (
+            SELECT hour, sum(last_occupied) AS occ
+            FROM hourly_rollup
+            WHERE node_type='garage' AND hour >= ? AND hour < ? AND garage IN {g_clause}
+            GROUP BY hour
+        ),
+        deltas AS (
+            SELECT hour,
+                   occ - lag(occ) OVER (ORDER BY hour) AS delta,
+                   hour - lag(hour) OVER (ORDER BY hour) AS gap
+            FROM hours
+        )
+        SELECT hour(hour) AS hr, avg(delta) AS net_per_hour
+        FROM deltas WHERE gap = INTERVAL 1 HOUR
+        GROUP BY 1 ORDER BY 1
+        """
+    return sql, (start, end, *g_params)
+
+
+def daily_peaks(garages: list[str]) -> tuple[str, tuple]:
+    """Each garage's peak occupancy per day, over the whole history."""
+    g_clause, g_params = in_clause(garages)
+    sql = (
+        f"SELECT day, garage, max_pct AS peak "
+        f"FROM daily_rollup WHERE node_type='garage' AND garage IN {g_clause} "
+        f"ORDER BY 1"
+    )
+    return sql, g_params
+
+
+def snapshot_rows(start: dt.date, end: dt.date, garages: list[str]) -> tuple[str, tuple]:
+    """Garage rows in range, newest first (the Data tab's table)."""
+    g_clause, g_params = in_clause(garages)
+    sql = f"""
+        SELECT ts_local, garage, available_bays, occupied_bays, total_bays, occupancy_pct
+        FROM garage_snapshots WHERE ts_local >= ? AND ts_local < ? AND garage IN {g_clause}
+        ORDER BY ts_local DESC, garage
+        """
+    return sql, (start, end, *g_params)
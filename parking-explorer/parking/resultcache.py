@@ -0,0 +1,133 @@
+"""On-disk cache of query results, so a restarted app renders from warm results.
+
+``st.cache_data`` lives in process memory and is lost on every restart. This
+cache sits underneath it: each result DataFrame is stored as a Parquet file
+named by a hash of (normalized SQL, params, data version). Because the data
+version changes on every sync, stale entries are never read again — they just
+age out. The directory is bounded in bytes with least-recently-used eviction
+(file mtimes are touched on every hit).
+
+The default location is ``<db stem>_results/`` beside the cache file, so each
+DuckDB file has its own results.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .config import DB_PATH, RESULT_CACHE_MB
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _param(value) -> list:
+    # Type-tagged so e.g. the date 2026-01-01 and the string "2026-01-01" differ.
+    return [type(value).__name__, str(value)]
+
+
+def cache_key(sql: str, params, version) -> str:
+    """Stable hash of (normalized SQL, params, data version)."""
+    payload = json.dumps(
+        [_normalize(sql), [_param(p) for p in params or ()], [_param(v) for v in version]]
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """A size-bounded directory of Parquet result blobs with LRU eviction."""
+
+    def __init__(self, root, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()  # serializes eviction, not reads
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.parquet"
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        path = self._path(key)
+        try:
+            table = pq.read_table(path)
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, pa.ArrowInvalid):  # missing, or evicted mid-read
+            self.misses += 1
+            return None
+        self.hits += 1
+        return table.to_pandas()
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{key}.{uuid.uuid4().hex}.tmp"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+        os.replace(tmp, self._path(key))  # readers never see a partial file
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least-recently-used blobs until under ``max_bytes``. Returns files removed."""
+        with self._lock:
+            entries = []
+            for path in self.root.glob("*.parquet"):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            return removed
+
+    def get_or_compute(self, sql: str, params, version, compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """The cached result for this query at this data version, computing it on a miss."""
+        if not self.enabled:
+            return compute()
+        key = cache_key(sql, params, version)
+        df = self.get(key)
+        if df is None:
+            df = compute()
+            self.put(key, df)
+        return df
+
+    def clear(self) -> None:
+        for path in self.root.glob("*.parquet"):
+            path.unlink(missing_ok=True)
+
+
+_caches: dict[Path, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def default_dir(db_path=None) -> Path:
+    db = Path(db_path or DB_PATH)
+    return db.with_name(f"{db.stem}_results")
+
+
+def for_db(db_path=None) -> ResultCache:
+    """The process-wide result cache beside a DuckDB cache file."""
+    root = default_dir(db_path).resolve()
+    with _caches_lock:
+        if root not in _caches:
+            _caches[root] = ResultCache(root, RESULT_CACHE_MB * 1024 * 1024)
+        return _caches[root]
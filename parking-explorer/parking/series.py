@@ -0,0 +1,178 @@
+"""Downsampled occupancy time series for long-range charts.
+
+A chart can't show more points than it has pixels, so shipping every 5-minute
+snapshot (or even every hour) of a multi-month range into Altair only costs
+payload and render time. Trends are served from one of four tiers, the finest
+that fits the range:
+
+============  ====================  ==========================================
+tier          step                  source
+============  ====================  ==========================================
+``5min``      one snapshot          ``garage_snapshots``
+``hour``      1 hour                ``hourly_rollup``
+``day``       1 day                 ``daily_rollup``
+``week``      7 days                ``daily_rollup`` (re-aggregated by week)
+============  ====================  ==========================================
+
+Every tier returns an average line plus a min/max band, so a coarse tier still
+shows the spread it smoothed over. :func:`plan` picks the finest tier with at
+most ``OVERSAMPLE`` x the point budget per series (the budget is one point per
+pixel of chart width); :func:`reduce` then brings each series down to the
+budget with Largest-Triangle-Three-Buckets (LTTB), which keeps the line's
+visual shape, and widens the band to cover the points it dropped.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from . import queries
+
+DEFAULT_WIDTH_PX = 1200  # the wide-layout main column
+OVERSAMPLE = 4  # let LTTB choose among up to this many candidates per output point
+
+COLUMNS = ["bucket", "garage", "occ_min", "occ_avg", "occ_max", "available_bays"]
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    label: str
+    step: dt.timedelta
+    sql: str  # ``{garages}`` slot for an ``IN (...)`` list; params: start, end, *garages
+
+
+TIERS = [
+    Tier(
+        "5min",
+        "5-minute",
+        dt.timedelta(minutes=5),
+        """
+        SELECT ts_local AS bucket, garage, occupancy_pct AS occ_min,
+               occupancy_pct AS occ_avg, occupancy_pct AS occ_max,
+               available_bays::DOUBLE AS available_bays
+        FROM garage_snapshots
+        WHERE ts_local >= ? AND ts_local < ? AND garage IN {garages}
+        ORDER BY garage, bucket
+        """,
+    ),
+    Tier(
+        "hour",
+        "Hourly",
+        dt.timedelta(hours=1),
+        """
+        SELECT hour AS bucket, garage, min(min_pct) AS occ_min,
+               sum(sum_pct) / nullif(sum(n_pct), 0) AS occ_avg, max(max_pct) AS occ_max,
+               (sum(sum_total) - sum(sum_occupied)) / sum(snaps) AS available_bays
+        FROM hourly_rollup
+        WHERE node_type = 'garage' AND hour >= ? AND hour < ? AND garage IN {garages}
+        GROUP BY 1, 2 ORDER BY garage, bucket
+        """,
+    ),
+    Tier(
+        "day",
+        "Daily",
+        dt.timedelta(days=1),
+        """
+        SELECT day::TIMESTAMP AS bucket, garage, min(min_pct) AS occ_min,
+               sum(sum_pct) / nullif(sum(n_pct), 0) AS occ_avg, max(max_pct) AS occ_max,
+               (sum(sum_total) - sum(sum_occupied)) / sum(snaps) AS available_bays
+        FROM daily_rollup
+        WHERE node_type = 'garage' AND day >= ?::TIMESTAMP AND day < ?::TIMESTAMP
+          AND garage IN {garages}
+        GROUP BY 1, 2 ORDER BY garage, bucket
+        """,
+    ),
+    Tier(
+        "week",
+        "Weekly",
+        dt.timedelta(days=7),
+        """
+        SELECT date_trunc('week', day)::TIMESTAMP AS bucket, garage, min(min_pct) AS occ_min,
+               sum(sum_pct) / nullif(sum(n_pct), 0) AS occ_avg, max(max_pct) AS occ_max,
+               (sum(sum_total) - sum(sum_occupied)) / sum(snaps) AS available_bays
+        FROM daily_rollup
+        WHERE node_type = 'garage' AND day >= ?::TIMESTAMP AND day < ?::TIMESTAMP
+          AND garage IN {garages}
+        GROUP BY 1, 2 ORDER BY garage, bucket
+        """,
+    ),
+]
+
+
+def max_points(width_px: int = DEFAULT_WIDTH_PX) -> int:
+    """Point budget per series for a chart ``width_px`` wide."""
+    return max(3, int(width_px))
+
+
+def choose_tier(start: dt.datetime, end: dt.datetime, budget: int) -> Tier:
+    """The finest tier whose bucket count over ``[start, end)`` fits ``OVERSAMPLE * budget``."""
+    span = end - start
+    for tier in TIERS:
+        if span / tier.step <= OVERSAMPLE * budget:
+            return tier
+    return TIERS[-1]
+
+
+def plan(
+    start: dt.datetime, end: dt.datetime, garages: list[str], width_px: int = DEFAULT_WIDTH_PX
+) -> tuple[Tier, str, tuple]:
+    """(tier, SQL, params) for the occupancy trend of ``garages`` over ``[start, end)``."""
+    tier = choose_tier(start, end, max_points(width_px))
+    g_clause, g_params = queries.in_clause(garages)
+    return tier, tier.sql.format(garages=g_clause), (start, end, *g_params)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the ``n`` points Largest-Triangle-Three-Buckets keeps.
+
+    Always keeps the first and last point; from each of the ``n - 2`` equal
+    buckets in between it keeps the point forming the largest triangle with the
+    previously kept point and the average of the next bucket. NaNs in ``y``
+    are treated as 0 for selection.
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, size - 1, n - 1).astype(int)  # n - 2 buckets over the interior
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else size
+        cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def reduce(df: pd.DataFrame, width_px: int = DEFAULT_WIDTH_PX) -> pd.DataFrame:
+    """Bring each garage's series down to the point budget (LTTB on ``occ_avg``).
+
+    Each kept point's band is widened to the min/max of every point it stands
+    for (those up to the next kept point), so no extreme is lost.
+    """
+    budget = max_points(width_px)
+    parts = []
+    for _, g in df.groupby("garage", sort=False):
+        g = g.sort_values("bucket").reset_index(drop=True)
+        if len(g) <= budget:
+            parts.append(g)
+            continue
+        x = g["bucket"].to_numpy(dtype="datetime64[ns]").astype("int64")
+        keep = lttb(x, g["occ_avg"].to_numpy(dtype=float), budget)
+        out = g.iloc[keep].reset_index(drop=True)
+        out["occ_min"] = np.fmin.reduceat(g["occ_min"].to_numpy(dtype=float), keep)
+        out["occ_max"] = np.fmax.reduceat(g["occ_max"].to_numpy(dtype=float), keep)
+        parts.append(out)
+    if not parts:
+        return df.reset_index(drop=True)
+    return pd.concat(parts, ignore_index=True)
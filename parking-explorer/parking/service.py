@@ -0,0 +1,477 @@
+"""Local query service: one process owns the cache connection and result cache.
+
+    poetry run python -m parking.service                        # http://127.0.0.1:8765
+    poetry run python -m parking.service --socket /tmp/parking.sock
+
+Each Streamlit replica otherwise opens the DuckDB file itself and keeps its own
+``st.cache_data``, so N replicas behind a load balancer mean N file handles and
+N cold caches. With ``PARKING_QUERY_SERVICE`` pointing here, the app's ``q()``
+(and its data version, anomaly list, latency panel and downloads) go through
+this one process instead. It holds the file's :func:`parking.store.pool`, the on-disk
+result cache and an in-memory LRU of encoded results, so a result one replica
+computed is served to all of them.
+
+Protocol (HTTP/1.1, keep-alive):
+
+=====================  =====================================================
+``GET /version``       the :class:`~parking.store.DataVersion`, a JSON list
+``POST /query``        ``{"sql": ..., "params": [...]}`` -> Arrow IPC stream
+``GET /anomalies``     the app's anomaly list -> Arrow IPC stream
+``GET /timings``       the pool's recent query timings, JSON records
+``POST /export``       ``{"range": [start, end], "garages": [...],
+                       "granularity": ..., "fmt": ..., "compress": ...}``
+                       -> the Data tab's download file
+=====================  =====================================================
+
+Results carry the data version they were computed at in ``X-Parking-Version``.
+Params are JSON with dates and timestamps tagged (``{"date": "2026-01-05"}``),
+so they hash to the same result-cache keys as the app's own. Errors come back
+as ``{"error": ..., "type": ...}`` with status 400 (bad request or SQL), 415
+(a ``/query`` body that isn't ``application/json``) or 500.
+
+``/query`` runs exactly one SELECT (or WITH ... SELECT) statement, on a
+read-only connection that can't touch files outside the cache's Parquet
+archive and its export directory (``<db stem>_exports/``, where ``/export``
+writes each file before streaming it back and unlinking it), so a browser
+page's cross-origin form POST can't make it write or read anything else. There is still no authentication: bind it to localhost or
+a Unix socket.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime as dt
+import http.client
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import BinaryIO, Callable
+from urllib.parse import urlsplit
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from . import anomalies, export, resultcache, store
+from .config import DB_PATH, QUERY_SERVICE, SERVICE_MEMORY_MB
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# --- wire format -----------------------------------------------------------------
+
+_TAGS = {"timestamp": pd.Timestamp, "datetime": dt.datetime.fromisoformat, "date": dt.date.fromisoformat}
+
+
+def encode_params(params) -> list:
+    """Query params as JSON values; dates, datetimes and pandas timestamps are tagged."""
+    out = []
+    for value in params or ():
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, pd.Timestamp):
+            value = {"timestamp": value.isoformat()}
+        elif isinstance(value, dt.datetime):
+            value = {"datetime": value.isoformat()}
+        elif isinstance(value, dt.date):
+            value = {"date": value.isoformat()}
+        out.append(value)
+    return out
+
+
+def decode_params(values: list) -> tuple:
+    """Inverse of :func:`encode_params`."""
+    out = []
+    for value in values:
+        if isinstance(value, dict):
+            ((tag, text),) = value.items()
+            value = _TAGS[tag](text)
+        out.append(value)
+    return tuple(out)
+
+
+def to_ipc(df: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def from_ipc(body: bytes) -> pd.DataFrame:
+    return pa.ipc.open_stream(body).read_all().to_pandas()
+
+
+# --- server ----------------------------------------------------------------------
+
+
+class _Recent:
+    """Encoded results by cache key, least-recently-used evicted past ``max_bytes``."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def put(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, dropped = self._items.popitem(last=False)
+                self._bytes -= len(dropped)
+
+
+def check_select(sql: str) -> None:
+    """Raise ``ValueError`` unless ``sql`` is a single SELECT statement (WITH included)."""
+    statements = duckdb.extract_statements(sql)
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        raise ValueError("only a single SELECT statement is accepted")
+
+
+class QueryService:
+    """What the HTTP handler serves: versioned, cached query results for one cache file."""
+
+    def __init__(self, db_path=None, memory_mb: int = SERVICE_MEMORY_MB):
+        self.db_path = Path(db_path or DB_PATH)
+        self.pool = store.ConnectionPool(self.db_path, setup=self._sandbox)
+        self.results = resultcache.for_db(self.db_path)
+        self.recent = _Recent(memory_mb * 1024 * 1024)
+        self.export_dir = self.db_path.with_name(f"{self.db_path.stem}_exports")
+
+    def _sandbox(self, con: duckdb.DuckDBPyConnection) -> None:
+        # Per database instance and irreversible, so only its first connection sets it.
+        if con.execute("SELECT current_setting('enable_external_access')").fetchone()[0]:
+            archive = store.archive_path(self.db_path)
+            con.execute("SET allowed_directories = ?", [[f"{archive}/", f"{self.export_dir}/"]])
+            con.execute("SET enable_external_access = false")
+
+    def version(self) -> store.DataVersion:
+        if not self.db_path.exists():
+            return store.DataVersion(0, 0, None)
+        with self.pool.cursor() as con:
+            return store.data_version(con)
+
+    def _result(self, sql: str, params: tuple, compute: Callable[[], pd.DataFrame]):
+        version = self.version()
+        key = resultcache.cache_key(sql, params, version)
+        body = self.recent.get(key)
+        if body is None:
+            body = to_ipc(self.results.get_or_compute(sql, params, version, compute))
+            self.recent.put(key, body)
+        return body, version
+
+    def query(self, sql: str, params: tuple = ()) -> tuple[bytes, store.DataVersion]:
+        """(Arrow IPC stream, data version) of one query's result."""
+        check_select(sql)
+        return self._result(sql, params, lambda: self.pool.execute(sql, params))
+
+    def _anomalies(self) -> pd.DataFrame:
+        with self.pool.cursor() as con:
+            return anomalies.current(con)
+
+    def anomalies(self) -> tuple[bytes, store.DataVersion]:
+        """The app's anomaly list: the persisted log, or a full pass on older caches."""
+        return self._result("-- anomalies", (), self._anomalies)
+
+    def timings(self) -> list[dict]:
+        return [dataclasses.asdict(t) for t in self.pool.timings]
+
+    def export(self, **kwargs) -> BinaryIO:
+        """:func:`parking.export.export_file`, written on the pool's connection into ``export_dir``."""
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        with self.pool.cursor() as con:
+            return export.export_file(con, dir=self.export_dir, **kwargs)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: one connection per client thread
+
+    def do_GET(self) -> None:
+        service: QueryService = self.server.service
+        if self.path == "/version":
+            self._json(list(service.version()))
+        elif self.path == "/anomalies":
+            self._respond(service.anomalies)
+        elif self.path == "/timings":
+            self._json(service.timings())
+        else:
+            self._error(404, LookupError(f"no such endpoint: {self.path}"))
+
+    def do_POST(self) -> None:
+        if self.path not in ("/query", "/export"):
+            self._error(404, LookupError(f"no such endpoint: {self.path}"))
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.close_connection = True  # its body is left unread on the socket
+            self._error(415, ValueError("the request body must be application/json"))
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if self.path == "/query":
+                sql, params = request["sql"], decode_params(request.get("params", []))
+            else:
+                start, end = decode_params(request["range"])
+                options = {
+                    "start": start,
+                    "end": end,
+                    "garages": list(request["garages"]),
+                    "granularity": request.get("granularity", "garage"),
+                    "fmt": request.get("fmt", "csv"),
+                    "compress": bool(request.get("compress", False)),
+                }
+        except (ValueError, KeyError, TypeError) as e:
+            self._error(400, e)
+            return
+        if self.path == "/query":
+            self._respond(lambda: self.server.service.query(sql, params))
+        else:
+            self._export(options)
+
+    def _export(self, options: dict) -> None:
+        try:
+            fh = self.server.service.export(**options)
+        except (duckdb.Error, ValueError) as e:
+            self._error(400, e)
+            return
+        except Exception as e:
+            log.exception("export failed")
+            self._error(500, e)
+            return
+        with fh:
+            self.send_response(200)
+            self.send_header("Content-Type", export.mime_type(options["fmt"], options["compress"]))
+            self.send_header("Content-Length", str(os.fstat(fh.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(fh, self.wfile)  # streamed, never read into memory whole
+
+    def _respond(self, run: Callable[[], tuple[bytes, store.DataVersion]]) -> None:
+        try:
+            body, version = run()
+        except (duckdb.Error, ValueError) as e:
+            self._error(400, e)
+            return
+        except Exception as e:
+            log.exception("query failed")
+            self._error(500, e)
+            return
+        self._send(200, body, ARROW_STREAM, {"X-Parking-Version": json.dumps(list(version))})
+
+    def _json(self, value) -> None:
+        self._send(200, json.dumps(value, default=str).encode(), "application/json")
+
+    def _error(self, status: int, error: Exception) -> None:
+        payload = {"error": str(error), "type": type(error).__name__}
+        self._send(status, json.dumps(payload).encode(), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        log.debug(format, *args)
+
+
+class _QuietDisconnects:
+    """Log a client hanging up mid-response at debug level instead of printing a traceback."""
+
+    def handle_error(self, request, client_address) -> None:
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            log.debug("client %s disconnected", client_address)
+            return
+        super().handle_error(request, client_address)
+
+
+class _TCPServer(_QuietDisconnects, ThreadingHTTPServer):
+    pass
+
+
+class _UnixServer(_QuietDisconnects, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)  # the handler expects a (host, port) peer
+
+
+def make_server(
+    service: QueryService, *, host: str = "127.0.0.1", port: int = DEFAULT_PORT, socket_path=None
+) -> socketserver.BaseServer:
+    """An HTTP server for ``service`` on ``host:port`` (0 = any free port) or a Unix socket."""
+    if socket_path:
+        Path(socket_path).unlink(missing_ok=True)  # left behind by a previous run
+        server = _UnixServer(str(socket_path), _Handler)
+    else:
+        server = _TCPServer((host, port), _Handler)
+    server.service = service
+    return server
+
+
+# --- client ----------------------------------------------------------------------
+
+
+class ServiceError(RuntimeError):
+    """The query service rejected a request or failed to run it."""
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class Client:
+    """Calls a :class:`QueryService` at ``http://host:port`` or ``unix:/path``.
+
+    Each thread keeps one keep-alive connection; a request that finds it closed
+    (e.g. the service restarted) is retried once on a fresh one.
+    """
+
+    def __init__(self, address: str = QUERY_SERVICE, timeout: float = 300.0):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.address.startswith("unix:"):
+            return _UnixConnection(self.address[len("unix:"):], self.timeout)
+        url = urlsplit(self.address)
+        return http.client.HTTPConnection(url.hostname, url.port or DEFAULT_PORT, timeout=self.timeout)
+
+    def _request(
+        self, method: str, path: str, payload=None, sink: BinaryIO | None = None
+    ) -> tuple[http.client.HTTPResponse, bytes]:
+        """Send one request; a successful response body goes to ``sink`` (if given) unread."""
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            con = getattr(self._local, "con", None) or self._connect()
+            self._local.con = con
+            try:
+                con.request(method, path, body, headers)
+                resp = con.getresponse()
+                if sink is not None and resp.status == 200:
+                    sink.seek(0)
+                    sink.truncate()
+                    shutil.copyfileobj(resp, sink)
+                    data = b""
+                else:
+                    data = resp.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                con.close()
+                self._local.con = None
+                if attempt:
+                    raise
+        if resp.status != 200:
+            error = json.loads(data)
+            raise ServiceError(f"{error['type']}: {error['error']}")
+        return resp, data
+
+    def version(self) -> store.DataVersion:
+        return store.DataVersion(*json.loads(self._request("GET", "/version")[1]))
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        payload = {"sql": sql, "params": encode_params(params)}
+        return from_ipc(self._request("POST", "/query", payload)[1])
+
+    def anomalies(self) -> pd.DataFrame:
+        return from_ipc(self._request("GET", "/anomalies")[1])
+
+    def timings(self) -> pd.DataFrame:
+        return pd.DataFrame(json.loads(self._request("GET", "/timings")[1]))
+
+    def export_file(
+        self,
+        *,
+        start: dt.date | dt.datetime,
+        end: dt.date | dt.datetime,
+        garages: list[str],
+        granularity: str = "garage",
+        fmt: str = "csv",
+        compress: bool = False,
+    ) -> BinaryIO:
+        """Like :func:`parking.export.export_file`: the service's export, in a self-cleaning temp file."""
+        payload = {
+            "range": encode_params([start, end]),
+            "garages": list(garages),
+            "granularity": granularity,
+            "fmt": fmt,
+            "compress": compress,
+        }
+        fh = tempfile.TemporaryFile(prefix="parking-export-")
+        try:
+            self._request("POST", "/export", payload, sink=fh)
+        except BaseException:
+            fh.close()
+            raise
+        fh.seek(0)
+        return fh
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m parking.service", description="Serve parking cache queries to app replicas."
+    )
+    parser.add_argument("--db", type=Path, default=DB_PATH, help=f"DuckDB cache file (default: {DB_PATH})")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    parser.add_argument("--socket", type=Path, help="listen on this Unix socket instead of TCP")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.db.exists():
+        # What each app process would otherwise do, on connections closed before
+        # serving: the service's sandboxed pool must be the file's only user.
+        store.ensure_rollups(args.db, pooled=False)
+    server = make_server(QueryService(args.db), host=args.host, port=args.port, socket_path=args.socket)
+    where = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{server.server_address[1]}"
+    log.info("query service for %s on %s (Ctrl-C to stop)", args.db, where)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket:
+            args.socket.unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,150 @@
 """DuckDB persistence layer for the local parking cache.
 
-The cache is a single ``parking.duckdb`` file holding one row per hierarchy node
-per snapshot. ``(request_timestamp, path)`` is the primary key so re-running a
-sync is idempotent (``ON CONFLICT DO NOTHING``).
+The cache is a single ``parking.duckdb`` file holding one reading per hierarchy
+node per snapshot, stored normalized so no string is repeated per row:
+
+* ``nodes`` — one row per hierarchy node (``path`` and its ancestry), keyed by
+  a small-integer ``node_id``.
+* ``snapshots`` — one row per collected snapshot (``request_timestamp`` and
+  its UTC / local times), keyed by an integer ``snapshot_id``.
+* ``readings`` — the facts: ``(snapshot_id, node_id, total_bays,
+  occupied_bays)``. ``available_bays`` and ``occupancy_pct`` are derived on
+  read. ``(snapshot_id, node_id)`` is the primary key, so re-running a sync is
+  idempotent (``ON CONFLICT DO NOTHING``).
+
+``parking_hot`` is a view joining the three back into the original wide rows,
+and caches written with the earlier wide ``parking_hot`` table are migrated in
+place by :func:`init_schema`.
+
+Alongside the raw ``parking`` view the cache keeps materialized rollups that
+the app reads instead of re-aggregating the whole history on every render:
+
+* ``garage_snapshots`` — the garage rows of each snapshot (a narrow slice).
+* ``hourly_rollup`` / ``daily_rollup`` — per-node sums, maxima and counts for
+  each local hour / day, for system, garage and level nodes (plus each hour's
+  closing ``occupied_bays``, which net-flow charts difference).
+* ``latest_snapshot`` — every row of the newest snapshot (``recency = 0``) and
+  of the one before it (``recency = 1``), so "right now" views and their
+  deltas read a few hundred rows instead of searching the history for its max.
+
+They are refreshed incrementally after each sync, in one transaction: only the
+hour/day buckets that new snapshots fall into are recomputed, and
+``latest_snapshot`` is replaced whole.
+
+With archiving enabled, whole closed months of readings are moved out of the
+hot tables into Hive-partitioned Parquet files (wide rows, which Parquet
+dictionary-encodes; ``<db stem>_archive/month=YYYY-MM/node_type=.../*.parquet``)
+beside the cache file, keeping ``readings`` and its primary-key index small.
+``snapshots`` keeps its rows for archived months. ``parking`` is a
+view over hot rows plus the archive, so every reader queries it unchanged;
+``node_type`` filters prune archive partitions and ``ts_local`` filters skip
+row groups via Parquet statistics.
+
+Readers in a long-lived process (the app) share one read-only connection per
+file through :func:`pool` instead of opening the file for every query.
+
+DuckDB lets one process write a file, and only while no other process has it
+open, so readers and a sync in different processes take turns on the lock.
+With ``PARKING_READ_REPLICA`` set they don't: each sync ends by publishing a
+copy of the cache (:func:`publish_replica`) that readers open instead
+(:func:`read_path`), and the writer keeps the cache file to itself.
 """
 
 from __future__ import annotations
 
+import datetime as dt
+import fcntl
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, NamedTuple
+
 import duckdb
 import pandas as pd
+import pyarrow as pa
 
-from .config import DB_PATH
+from .config import DB_PATH, POOL_IDLE_SECONDS, READ_REPLICA, STORAGE_MODE, WRITE_LOCK_WAIT_SECONDS
 from .flatten import COLUMNS
 
 _SCHEMA = """
-CREATE TABLE IF NOT EXISTS parking (
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id   SMALLINT PRIMARY KEY,
+    path      VARCHAR NOT NULL UNIQUE,
+    node_type VARCHAR,
+    garage    VARCHAR,
+    level     VARCHAR,
+    zone      VARCHAR,
+    name      VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id       INTEGER PRIMARY KEY,
+    request_timestamp VARCHAR NOT NULL UNIQUE,
+    ts_utc            TIMESTAMP,
+    ts_local          TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS readings (
+    snapshot_id   INTEGER NOT NULL,
+    node_id       SMALLINT NOT NULL,
+    total_bays    INTEGER,
+    occupied_bays INTEGER,
+    PRIMARY KEY (snapshot_id, node_id)
+);
+
+CREATE TABLE IF NOT EXISTS garage_snapshots (
+    request_timestamp VARCHAR NOT NULL,
+    ts_local          TIMESTAMP NOT NULL,
+    garage            VARCHAR,
+    total_bays        INTEGER,
+    occupied_bays     INTEGER,
+    available_bays    INTEGER,
+    occupancy_pct     DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS hourly_rollup (
+    hour          TIMESTAMP NOT NULL,
+    node_type     VARCHAR,
+    garage        VARCHAR,
+    level         VARCHAR,
+    path          VARCHAR NOT NULL,
+    snaps         INTEGER,
+    sum_total     BIGINT,
+    sum_occupied  BIGINT,
+    sum_pct       DOUBLE,
+    n_pct         INTEGER,
+    max_occupied  INTEGER,
+    max_pct       DOUBLE,
+    min_pct       DOUBLE,
+    last_occupied INTEGER  -- occupied_bays at the hour's last snapshot
+);
+
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    day           DATE NOT NULL,
+    node_type     VARCHAR,
+    garage        VARCHAR,
+    level         VARCHAR,
+    path          VARCHAR NOT NULL,
+    snaps         INTEGER,
+    sum_total     BIGINT,
+    sum_occupied  BIGINT,
+    min_total     INTEGER,
+    max_total     INTEGER,
+    max_occupied  INTEGER,
+    sd_occupied   DOUBLE,
+    max_pct       DOUBLE,
+    sum_pct       DOUBLE,
+    n_pct         INTEGER,
+    min_pct       DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS latest_snapshot (
+    recency           SMALLINT NOT NULL,  -- 0 = newest snapshot, 1 = the one before
     request_timestamp VARCHAR NOT NULL,
     ts_utc            TIMESTAMP,
     ts_local          TIMESTAMP,
@@ -27,26 +157,877 @@ CREATE TABLE IF NOT EXISTS parking (
     total_bays        INTEGER,
     occupied_bays     INTEGER,
     available_bays    INTEGER,
-    occupancy_pct     DOUBLE,
-    PRIMARY KEY (request_timestamp, path)
+    occupancy_pct     DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS cache_settings (
+    key   VARCHAR PRIMARY KEY,
+    value VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    id             INTEGER PRIMARY KEY,
+    generation     BIGINT NOT NULL,
+    row_count      BIGINT NOT NULL,
+    last_timestamp VARCHAR,
+    updated_at     TIMESTAMP NOT NULL
 );
 """
 
+# Rollup table -> (bucket column, bucket of a ts_local value, SELECT over
+# ``parking`` with a ``{where}`` slot). Refreshing a bucket always recomputes it
+# whole from ``parking``, so a partially-filled hour/day is never double-counted.
+_ROLLUPS = {
+    "garage_snapshots": (
+        "ts_local",
+        "date_trunc('hour', ?::TIMESTAMP)",
+        """
+        SELECT request_timestamp, ts_local, garage, total_bays, occupied_bays,
+               available_bays, occupancy_pct
+        FROM parking WHERE node_type = 'garage' AND {where}
+        """,
+    ),
+    "hourly_rollup": (
+        "hour",
+        "date_trunc('hour', ?::TIMESTAMP)",
+        """
+        SELECT date_trunc('hour', ts_local) AS hour, node_type, garage, level, path,
+               count(*), sum(total_bays), sum(occupied_bays),
+               sum(occupancy_pct), count(occupancy_pct),
+               max(occupied_bays), max(occupancy_pct), min(occupancy_pct),
+               arg_max(occupied_bays, ts_local)
+        FROM parking WHERE node_type IN ('system', 'garage', 'level') AND {where}
+        GROUP BY ALL
+        """,
+    ),
+    "daily_rollup": (
+        "day",
+        "?::TIMESTAMP::DATE",
+        """
+        SELECT ts_local::DATE AS day, node_type, garage, level, path,
+               count(*), sum(total_bays), sum(occupied_bays),
+               min(total_bays), max(total_bays), max(occupied_bays),
+               stddev_pop(occupied_bays), max(occupancy_pct),
+               sum(occupancy_pct), count(occupancy_pct), min(occupancy_pct)
+        FROM parking WHERE node_type IN ('system', 'garage', 'level') AND {where}
+        GROUP BY ALL
+        """,
+    ),
+}
+
 _COL_LIST = ", ".join(COLUMNS)
 
 
-def connect(read_only: bool = False, db_path=None) -> duckdb.DuckDBPyConnection:
-    """Open a short-lived connection. Use ``read_only=True`` for app queries."""
-    return duckdb.connect(str(db_path or DB_PATH), read_only=read_only)
+def connect(read_only: bool = False, db_path=None, wait: float = 0.0) -> duckdb.DuckDBPyConnection:
+    """Open a short-lived connection. Use ``read_only=True`` for app queries.
+
+    A writable connection first closes this process's shared read-only pool for
+    the file (DuckDB won't mix read-only and read-write handles in one process).
+    While another process holds a conflicting lock on the file, keep retrying
+    for up to ``wait`` seconds before raising.
+    """
+    if not read_only:
+        _release_pool(db_path)
+    return _open(db_path or DB_PATH, read_only, wait)
+
+
+def _open(db_path, read_only: bool, wait: float) -> duckdb.DuckDBPyConnection:
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return duckdb.connect(str(db_path), read_only=read_only)
+        except duckdb.IOException as e:
+            if "lock" not in str(e).lower() or time.monotonic() >= deadline:
+                raise
+            time.sleep(0.25)
+
+
+def replica_path(db_path=None) -> Path:
+    """Where a cache file's read replica is published: ``<db stem>.read.duckdb`` beside it."""
+    db = Path(db_path or DB_PATH)
+    return db.with_name(f"{db.stem}.read{db.suffix}")
+
+
+def read_path(db_path=None, replica: bool | None = None) -> Path:
+    """The file readers should open: the published replica when ``replica`` (default
+    ``PARKING_READ_REPLICA``) is on and one exists, else the cache file itself."""
+    db = Path(db_path or DB_PATH)
+    if READ_REPLICA if replica is None else replica:
+        published = replica_path(db)
+        if published.exists():
+            return published
+    return db
+
+
+def publish_replica(con: duckdb.DuckDBPyConnection) -> Path | None:
+    """Publish the committed state of ``con``'s cache file as its read replica.
 
+    DuckDB copies the database into a staging file that is then renamed over
+    the replica, so a reader opening it sees the previous snapshot or the new
+    one, never a partial file; readers that still have the old replica open
+    keep reading it until they reopen. Returns the replica's path (None for
+    in-memory databases).
+    """
+    db = _db_file(con)
+    if db is None:
+        return None
+    target = replica_path(db)
+    staging = target.with_name(f".{target.name}.staging")
+    staging.unlink(missing_ok=True)
+    # Not a plain file copy: closing any descriptor of the cache file would drop
+    # the POSIX lock DuckDB holds on it for this process.
+    name = con.execute("SELECT current_database()").fetchone()[0]
+    con.execute(f"ATTACH {_quote(staging)} AS replica")
+    try:
+        con.execute(f'COPY FROM DATABASE "{name}" TO replica')
+    finally:
+        con.execute("DETACH replica")
+    staging.replace(target)
+    return target
+
+
+class WriterBusy(RuntimeError):
+    """Another sync already holds the cache file's writer lock."""
+
+
+@contextmanager
+def writer_lock(db_path=None):
+    """Hold the cache file's single-writer lock (``<db>.sync.lock``) or raise :class:`WriterBusy`.
+
+    DuckDB already allows one writing process per file, but only while the
+    connection is open; this advisory lock makes a second sync (the daemon, the
+    CLI, the app's button) fail fast instead of queueing on DuckDB's lock.
+    """
+    db = Path(db_path or DB_PATH)
+    db.parent.mkdir(parents=True, exist_ok=True)
+    with open(db.with_name(f"{db.name}.sync.lock"), "w") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise WriterBusy(f"another sync is already writing {db}") from None
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _intent_path(db: Path) -> Path:
+    return db.with_name(f"{db.name}.write.lock")
+
+
+@contextmanager
+def _write_intent(db_path=None):
+    """Hold ``<db>.write.lock`` while waiting for and writing the cache file.
+
+    Pooled readers in other processes check it (:func:`writer_waiting`) and
+    close their read-only handle as soon as their queries finish, instead of
+    keeping the file locked until they go idle. Blocking, unlike
+    :func:`writer_lock`: probes only hold it for an instant.
+    """
+    db = Path(db_path or DB_PATH)
+    db.parent.mkdir(parents=True, exist_ok=True)
+    with open(_intent_path(db), "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
 
-def init_schema(con: duckdb.DuckDBPyConnection) -> None:
+
+def writer_waiting(db_path=None) -> bool:
+    """True while a sync (in any process) is opening or writing the cache file."""
+    try:
+        fd = os.open(_intent_path(Path(db_path or DB_PATH)), os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)  # also drops the shared lock, if we got it
+    return False
+
+
+@dataclass(frozen=True)
+class QueryTiming:
+    """Latency of one pooled query: getting a cursor vs running the SQL."""
+
+    sql: str
+    open_ms: float  # includes (re)opening the file when that was needed
+    execute_ms: float
+    reopened: bool
+
+
+class ConnectionPool:
+    """A reused read-only connection to one cache file, shared by all threads.
+
+    Each thread gets its own cursor (DuckDB connections aren't safe to share
+    across threads; cursors of one connection are, and skip the file open and
+    catalog load). The file's identity (inode, size, mtime) is checked on every
+    checkout and the connection reopened when a sync has changed it.
+
+    A read-only handle still locks the file against writers in *other*
+    processes, so the connection is closed after ``idle_seconds`` without
+    queries, or as soon as they finish while such a writer is waiting
+    (:func:`writer_waiting`); in-process writers close it via :func:`connect`.
+
+    An in-process sync writes through :meth:`writer` instead: for its duration
+    the shared connection is read-write and readers' cursors come from it, so
+    the app keeps querying the file while it is being written.
+
+    With ``replica`` (default ``PARKING_READ_REPLICA``) readers open the
+    published replica instead (see :func:`read_path`), switching to each new
+    one as it is published, and :meth:`writer` opens the cache file on its own.
+
+    ``setup``, if given, is called with each newly opened read-only connection
+    (e.g. to restrict what its queries may touch).
+    """
+
+    def __init__(
+        self,
+        db_path=None,
+        idle_seconds: float = POOL_IDLE_SECONDS,
+        history: int = 200,
+        replica: bool | None = None,
+        setup: Callable[[duckdb.DuckDBPyConnection], None] | None = None,
+    ):
+        self.path = Path(db_path or DB_PATH)
+        self.setup = setup
+        self.replica = READ_REPLICA if replica is None else replica
+        self.idle_seconds = idle_seconds
+        self.timings: deque[QueryTiming] = deque(maxlen=history)
+        self._con: duckdb.DuckDBPyConnection | None = None
+        self._stamp: tuple | None = None
+        self._generation = 0
+        self._active = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._timer: threading.Timer | None = None
+        self._writing = False
+        self._opening = False  # a cursor() is opening the file outside the lock
+
+    def _file_stamp(self) -> tuple | None:
+        path = read_path(self.path, self.replica)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return (path, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _close_locked(self) -> None:
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+            self._generation += 1
+
+    @contextmanager
+    def cursor(self):
+        """Yield this thread's cursor, reopening the file first if it changed."""
+        t0 = time.perf_counter()
+        reopened = False
+        with self._cond:
+            while True:
+                stamp = self._file_stamp()
+                if self._con is not None and (stamp == self._stamp or self._writing):
+                    break
+                if self._active or self._opening:  # let in-flight queries / an open finish first
+                    self._cond.wait()
+                    continue
+                self._close_locked()
+                # Opened outside the lock, which a slow open would otherwise hold
+                # up to WRITE_LOCK_WAIT_SECONDS; other checkouts wait on ``_opening``.
+                self._opening = True
+                self._cond.release()
+                try:
+                    con = self._open_reader(stamp[0] if stamp else self.path)
+                finally:
+                    self._cond.acquire()
+                    self._opening = False
+                    self._cond.notify_all()
+                self._con, self._stamp = con, stamp
+                reopened = True
+            cur = getattr(self._local, "cursor", None)
+            if cur is None or self._local.generation != self._generation:
+                cur = self._local.cursor = self._con.cursor()
+                self._local.generation = self._generation
+            self._active += 1
+        self._local.open_ms = (time.perf_counter() - t0) * 1e3
+        self._local.reopened = reopened
+        try:
+            yield cur
+        finally:
+            with self._cond:
+                self._active -= 1
+                if not self._active:
+                    self._cond.notify_all()
+                    if self._writer_waiting():
+                        self._close_locked()
+                    else:
+                        self._schedule_idle_close()
+
+    def _writer_waiting(self) -> bool:
+        # A sync in another process wants the cache file we hold read-only: let
+        # go now, not after idle_seconds (an app polling every few seconds would
+        # keep resetting the idle timer and starve it).
+        reading_cache = self._con is not None and (self._stamp is None or self._stamp[0] == self.path)
+        return reading_cache and not self._writing and writer_waiting(self.path)
+
+    def _open_reader(self, target: Path) -> duckdb.DuckDBPyConnection:
+        # A sync in another process may hold the write lock briefly.
+        con = _open(target, read_only=True, wait=WRITE_LOCK_WAIT_SECONDS)
+        try:
+            if self.setup is not None:
+                self.setup(con)
+        except BaseException:
+            con.close()
+            raise
+        return con
+
+    def execute(self, sql: str, params=None) -> pd.DataFrame:
+        """Run one query on this thread's cursor, recording its latency."""
+        with self.cursor() as cur:
+            t0 = time.perf_counter()
+            df = cur.execute(sql, list(params or [])).df()
+            execute_ms = (time.perf_counter() - t0) * 1e3
+        self.timings.append(QueryTiming(sql, self._local.open_ms, execute_ms, self._local.reopened))
+        return df
+
+    @contextmanager
+    def writer(self, wait: float = 0.0):
+        """Yield a read-write cursor; pooled readers share its database meanwhile.
+
+        Readers see each write as it commits, and the reopen-on-change check is
+        suspended until the writer is done (the file changes under it by design).
+        Readers of a published replica are left alone: the writer gets its own
+        connection to the cache file.
+        """
+        if read_path(self.path, self.replica) != self.path:
+            with self._cond:  # still on the cache file from before the first publish?
+                while self._active or self._opening:
+                    self._cond.wait()
+                if self._con is not None and (self._stamp is None or self._stamp[0] == self.path):
+                    self._close_locked()
+            con = _open(self.path, read_only=False, wait=wait)
+            try:
+                yield con
+            finally:
+                con.close()
+            return
+        with self._cond:
+            while self._active or self._writing or self._opening:
+                self._cond.wait()
+            self._close_locked()
+            self._con = _open(self.path, read_only=False, wait=wait)
+            self._writing = True
+            cur = self._con.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+            with self._cond:
+                while self._active:
+                    self._cond.wait()
+                self._close_locked()  # next checkout reopens read-only
+                self._writing = False
+                self._cond.notify_all()
+
+    def _schedule_idle_close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.idle_seconds > 0:
+            self._timer = threading.Timer(self.idle_seconds, self._idle_close, [self._generation])
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _idle_close(self, generation: int) -> None:
+        with self._cond:
+            if not self._active and not self._writing and self._generation == generation:
+                self._close_locked()
+
+    def close(self) -> None:
+        """Close the shared connection once in-flight queries finish."""
+        with self._cond:
+            while self._active or self._opening:
+                self._cond.wait()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._close_locked()
+
+
+_pools: dict[Path, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool(db_path=None) -> ConnectionPool:
+    """The process-wide :class:`ConnectionPool` for a cache file."""
+    path = Path(db_path or DB_PATH).resolve()
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
+
+
+@contextmanager
+def writer(db_path=None, wait: float = 0.0):
+    """A read-write connection for a sync, via the file's shared pool.
+
+    In the app this keeps pooled readers working during an in-process sync; in
+    a process without readers it is simply a writable connection. Pools in
+    other processes release the file while it waits (:func:`writer_waiting`).
+    """
+    with _write_intent(db_path), pool(db_path).writer(wait) as con:
+        yield con
+
+
+def _release_pool(db_path=None) -> None:
+    with _pools_lock:
+        shared = _pools.get(Path(db_path or DB_PATH).resolve())
+    if shared is not None:
+        shared.close()
+
+
+# Rollup columns added after the tables first shipped. Caches missing one get
+# those tables recreated empty (the rollups are derived, so nothing is lost) and
+# the next refresh rebuilds them whole.
+_ROLLUP_UPGRADES = [
+    ("hourly_rollup", "min_pct"),
+    ("hourly_rollup", "last_occupied"),
+    ("daily_rollup", "sum_pct"),
+    ("daily_rollup", "n_pct"),
+    ("daily_rollup", "min_pct"),
+]
+
+
+def _missing_rollup_columns(con: duckdb.DuckDBPyConnection) -> list[tuple[str, str]]:
+    have = set(
+        con.execute(
+            "SELECT table_name, column_name FROM duckdb_columns() "
+            "WHERE database_name = current_database() AND schema_name = 'main'"
+        ).fetchall()
+    )
+    return [u for u in _ROLLUP_UPGRADES if u not in have]
+
+
+def _table_type(con: duckdb.DuckDBPyConnection, name: str) -> str | None:
+    """``"BASE TABLE"``, ``"VIEW"`` or None for a name in the cache's main schema."""
+    row = con.execute(
+        "SELECT table_type FROM information_schema.tables "
+        "WHERE table_catalog = current_database() AND table_schema = 'main' AND table_name = ?",
+        [name],
+    ).fetchone()
+    return row[0] if row else None
+
+
+STORAGE_MODES = ("full", "changes")
+
+# The wide rows, rebuilt from the normalized tables (same columns as flatten.COLUMNS).
+_WIDE_COLUMNS = """
+    s.request_timestamp, s.ts_utc, s.ts_local, n.node_type, n.garage, n.level,
+    n.zone, n.name, n.path, r.total_bays, r.occupied_bays,
+    r.total_bays - r.occupied_bays AS available_bays,
+    CASE WHEN r.total_bays <> 0 THEN r.occupied_bays / r.total_bays * 100.0 END AS occupancy_pct
+"""
+
+# Change-only storage: each node's newest reading at or before every snapshot
+# (ASOF JOIN), skipping nodes whose newest reading is a "gone" marker.
+_AS_OF_JOIN = """
+FROM snapshots s CROSS JOIN nodes n
+ASOF JOIN (
+    SELECT r.node_id, s.request_timestamp, r.total_bays, r.occupied_bays
+    FROM readings r JOIN snapshots s USING (snapshot_id)
+) r ON r.node_id = n.node_id AND s.request_timestamp >= r.request_timestamp
+WHERE r.total_bays IS NOT NULL
+"""
+
+_HOT_VIEWS = {
+    "full": f"""
+        CREATE OR REPLACE VIEW parking_hot AS SELECT {_WIDE_COLUMNS}
+        FROM readings r JOIN snapshots s USING (snapshot_id) JOIN nodes n USING (node_id)
+        """,
+    "changes": f"CREATE OR REPLACE VIEW parking_hot AS SELECT {_WIDE_COLUMNS} {_AS_OF_JOIN}",
+}
+
+
+def init_schema(con: duckdb.DuckDBPyConnection, storage: str | None = None) -> None:
+    """Create or upgrade the cache's tables and views.
+
+    ``storage`` (default ``PARKING_STORAGE_MODE``) is the readings layout to
+    keep; a cache stored the other way is converted here.
+    """
+    # Caches from before the archive split hold the raw rows in a ``parking``
+    # table; it becomes ``parking_hot`` and ``parking`` turns into a view.
+    if _table_type(con, "parking") == "BASE TABLE":
+        con.execute("ALTER TABLE parking RENAME TO parking_hot")
     con.execute(_SCHEMA)
+    # Caches from before the normalized layout hold wide rows in a
+    # ``parking_hot`` table; they move into nodes / snapshots / readings.
+    if _table_type(con, "parking_hot") == "BASE TABLE":
+        _migrate_wide(con)
+    set_storage_mode(con, storage or STORAGE_MODE)
+    missing = _missing_rollup_columns(con)
+    if missing:
+        # Recreated rather than ALTERed, so the columns stay in the order the
+        # rollup INSERTs fill them in.
+        for table in dict.fromkeys(table for table, _ in missing):
+            con.execute(f"DROP TABLE {table}")
+        con.execute(_SCHEMA)
+        for table in _ROLLUPS:
+            con.execute(f"DELETE FROM {table}")
+    _create_parking_view(con)
+
+
+def _setting(con: duckdb.DuckDBPyConnection, key: str) -> str | None:
+    row = con.execute("SELECT value FROM cache_settings WHERE key = ?", [key]).fetchone()
+    return row[0] if row else None
+
+
+def _set_setting(con: duckdb.DuckDBPyConnection, key: str, value: str | None) -> None:
+    con.execute(
+        "INSERT INTO cache_settings VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        [key, value],
+    )
+
+
+def storage_mode(con: duckdb.DuckDBPyConnection) -> str:
+    """How this cache stores readings: ``"full"`` or ``"changes"``."""
+    return _setting(con, "storage_mode") or "full"
+
+
+def set_storage_mode(con: duckdb.DuckDBPyConnection, mode: str) -> None:
+    """Store readings as ``mode``, converting the existing ones if needed.
+
+    ``full`` -> ``changes`` drops every reading equal to its node's previous
+    one (:func:`collapse_unchanged` over the whole history); ``changes`` ->
+    ``full`` writes the as-of rows back out. Either way ``parking_hot`` (and so
+    ``parking``) returns the same rows before and after.
+    """
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"unknown storage mode {mode!r}; expected one of {STORAGE_MODES}")
+    current = storage_mode(con)
+    con.begin()
+    try:
+        if mode != current and mode == "changes":
+            _set_setting(con, "collapsed_through", None)
+            _set_setting(con, "storage_mode", mode)
+            _collapse(con)
+        elif mode != current:
+            con.execute(
+                f"CREATE TEMP TABLE full_readings AS "
+                f"SELECT s.snapshot_id, n.node_id, r.total_bays, r.occupied_bays {_AS_OF_JOIN}"
+            )
+            con.execute("DELETE FROM readings")
+            con.execute("INSERT INTO readings SELECT * FROM full_readings ORDER BY ALL")
+            con.execute("DROP TABLE full_readings")
+            _set_setting(con, "storage_mode", mode)
+        con.execute(_HOT_VIEWS[mode])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def collapse_unchanged(con: duckdb.DuckDBPyConnection) -> int:
+    """Drop the redundant readings sync just inserted, in ``changes`` mode (else a no-op).
+
+    Inserts always write every node of each new snapshot; this pass then keeps
+    a node's reading only where its counts differ from the node's previous
+    reading, and marks a node that vanished from a snapshot with a "gone"
+    reading (NULL counts). It covers the snapshots newer than the last pass
+    (the ``collapsed_through`` watermark), so it must run once after each
+    sync's inserts, before the rollups read ``parking``; snapshots are assumed
+    to arrive newest-last across syncs, as :func:`parking.sync.sync` fetches
+    them. Returns readings removed.
+    """
+    if storage_mode(con) != "changes":
+        return 0
+    con.begin()
+    try:
+        removed = _collapse(con)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return removed
+
+
+def _collapse(con: duckdb.DuckDBPyConnection) -> int:
+    watermark = _setting(con, "collapsed_through")
+    # Snapshots past the watermark, in order (k = 1..K). k = 0 stands for each
+    # node's state as of the watermark: its newest reading at or before it.
+    con.execute(
+        """
+        CREATE OR REPLACE TEMP TABLE collapse_window AS
+        SELECT snapshot_id, request_timestamp,
+               row_number() OVER (ORDER BY request_timestamp) AS k
+        FROM snapshots WHERE $w IS NULL OR request_timestamp > $w
+        """,
+        {"w": watermark},
+    )
+    last_k, newest = con.execute(
+        "SELECT max(k), max(request_timestamp) FROM collapse_window"
+    ).fetchone()
+    if last_k is None:
+        con.execute("DROP TABLE collapse_window")
+        return 0
+    sequence = """
+        SELECT node_id, 0 AS k, v.total_bays, v.occupied_bays
+        FROM (
+            SELECT r.node_id,
+                   arg_max({'total_bays': r.total_bays, 'occupied_bays': r.occupied_bays},
+                           s.request_timestamp) AS v
+            FROM readings r JOIN snapshots s USING (snapshot_id)
+            WHERE s.request_timestamp <= $w GROUP BY r.node_id
+        )
+        UNION ALL
+        SELECT r.node_id, w.k, r.total_bays, r.occupied_bays
+        FROM readings r JOIN collapse_window w USING (snapshot_id)
+    """
+    # A node present at k but without a reading at k + 1 vanished there.
+    con.execute(
+        f"""
+        INSERT INTO readings
+        SELECT w.snapshot_id, g.node_id, NULL, NULL
+        FROM (
+            SELECT node_id, k + 1 AS k FROM (
+                SELECT node_id, k, total_bays,
+                       lead(k) OVER (PARTITION BY node_id ORDER BY k) AS next_k
+                FROM ({sequence})
+            )
+            WHERE total_bays IS NOT NULL AND k < $last_k AND (next_k IS NULL OR next_k > k + 1)
+        ) g JOIN collapse_window w USING (k)
+        """,
+        {"w": watermark, "last_k": last_k},
+    )
+    removed = con.execute(
+        f"""
+        DELETE FROM readings USING (
+            SELECT w.snapshot_id, x.node_id FROM (
+                SELECT node_id, k, total_bays, occupied_bays,
+                       lag(k) OVER seq AS prev_k,
+                       lag(total_bays) OVER seq AS prev_total,
+                       lag(occupied_bays) OVER seq AS prev_occupied
+                FROM ({sequence})
+                WINDOW seq AS (PARTITION BY node_id ORDER BY k)
+            ) x JOIN collapse_window w USING (k)
+            WHERE x.prev_k IS NOT NULL
+              AND x.total_bays IS NOT DISTINCT FROM x.prev_total
+              AND x.occupied_bays IS NOT DISTINCT FROM x.prev_occupied
+        ) dup
+        WHERE readings.snapshot_id = dup.snapshot_id AND readings.node_id = dup.node_id
+        """,
+        {"w": watermark},
+    ).fetchone()[0]
+    con.execute("DROP TABLE collapse_window")
+    _set_setting(con, "collapsed_through", newest)
+    return removed
+
+
+def _anchor_at(con: duckdb.DuckDBPyConnection, cutoff) -> None:
+    """Before readings older than ``cutoff`` (local) are deleted in ``changes``
+    mode, write each present node's state into the first snapshot kept, so the
+    as-of view still finds it."""
+    if storage_mode(con) != "changes":
+        return
+    con.execute(
+        f"""
+        INSERT INTO readings
+        SELECT s.snapshot_id, n.node_id, r.total_bays, r.occupied_bays {_AS_OF_JOIN}
+          AND s.request_timestamp = (
+              SELECT min(request_timestamp) FROM snapshots WHERE ts_local >= $cutoff
+          )
+        ON CONFLICT DO NOTHING
+        """,
+        {"cutoff": cutoff},
+    )
+
+
+def _migrate_wide(con: duckdb.DuckDBPyConnection) -> None:
+    """Move a wide ``parking_hot`` table's rows into the normalized tables, then drop it.
+
+    Snapshots come from the whole ``parking`` view, so months already archived
+    to Parquet are listed in ``snapshots`` too. The file keeps the wide table's
+    space (reused by later writes) until :func:`compact` rewrites it.
+    """
+    _create_parking_view(con)  # over the wide table, plus any archive
+    con.begin()
+    try:
+        con.execute(
+            """
+            INSERT INTO nodes
+            SELECT row_number() OVER (ORDER BY path), path, any_value(node_type),
+                   any_value(garage), any_value(level), any_value(zone), any_value(name)
+            FROM parking_hot GROUP BY path
+            """
+        )
+        con.execute(
+            """
+            INSERT INTO snapshots
+            SELECT row_number() OVER (ORDER BY request_timestamp), request_timestamp,
+                   any_value(ts_utc), any_value(ts_local)
+            FROM parking GROUP BY request_timestamp
+            """
+        )
+        con.execute(
+            """
+            INSERT INTO readings
+            SELECT s.snapshot_id, n.node_id, p.total_bays, p.occupied_bays
+            FROM parking_hot p JOIN snapshots s USING (request_timestamp) JOIN nodes n USING (path)
+            ORDER BY s.snapshot_id, n.node_id
+            """
+        )
+        con.execute("DROP VIEW parking")
+        con.execute("DROP TABLE parking_hot")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    con.execute("CHECKPOINT")
+
+
+def _db_file(con: duckdb.DuckDBPyConnection) -> Path | None:
+    """The file ``con``'s database lives in (None for in-memory DBs)."""
+    path = con.execute(
+        "SELECT path FROM duckdb_databases() WHERE database_name = current_database()"
+    ).fetchone()[0]
+    return Path(path) if path else None
+
+
+def archive_path(db_path=None) -> Path:
+    """Where a cache file's cold Parquet archive lives: ``<db stem>_archive/`` beside it."""
+    db = Path(db_path or DB_PATH)
+    return db.with_name(f"{db.stem}_archive")
+
+
+def archive_dir(con: duckdb.DuckDBPyConnection) -> Path | None:
+    """Where this cache file's cold Parquet archive lives (None for in-memory DBs)."""
+    db = _db_file(con)
+    return archive_path(db) if db else None
+
+
+def _archive_files(con: duckdb.DuckDBPyConnection) -> list[Path]:
+    root = archive_dir(con)
+    return sorted(root.rglob("*.parquet")) if root and root.exists() else []
+
+
+def _quote(path: Path) -> str:
+    """A filesystem path as a SQL string literal (for COPY / read_parquet)."""
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def _read_archive_sql(root: Path) -> str:
+    return (
+        f"read_parquet({_quote(root / '**' / '*.parquet')}, hive_partitioning = true, "
+        "hive_types = {'month': VARCHAR, 'node_type': VARCHAR})"
+    )
+
+
+def compact(db_path=None) -> tuple[int, int]:
+    """Rewrite the cache file without its free space. Returns (bytes before, bytes after).
+
+    DuckDB reuses the blocks that deleted rows free but never gives them back,
+    so a file that was migrated to the normalized layout (or heavily pruned)
+    stays at its high-water mark until it is copied into a fresh file. Holds
+    the writer lock; readers in other processes keep the old file until they
+    reopen, as after any sync.
+    """
+    path = Path(db_path or DB_PATH)
+    fresh = path.with_name(f".{path.name}.compact")
+    with writer_lock(path):
+        fresh.unlink(missing_ok=True)
+        con = connect(db_path=path, wait=WRITE_LOCK_WAIT_SECONDS)
+        try:
+            name = con.execute("SELECT current_database()").fetchone()[0]
+            con.execute(f"ATTACH {_quote(fresh)} AS compacted")
+            con.execute(f'COPY FROM DATABASE "{name}" TO compacted')
+            con.execute("DETACH compacted")
+        finally:
+            con.close()
+        before = path.stat().st_size
+        fresh.replace(path)
+    return before, path.stat().st_size
+
+
+def _create_parking_view(con: duckdb.DuckDBPyConnection) -> None:
+    """(Re)define ``parking`` as hot rows plus whatever is archived right now."""
+    sql = f"CREATE OR REPLACE VIEW parking AS SELECT {_COL_LIST} FROM parking_hot"
+    if _archive_files(con):
+        sql += f" UNION ALL SELECT {_COL_LIST} FROM {_read_archive_sql(archive_dir(con))}"
+    con.execute(sql)
+
+
+def _month_start(d: dt.date, months_back: int = 0) -> dt.date:
+    idx = d.year * 12 + (d.month - 1) - months_back
+    return dt.date(idx // 12, idx % 12 + 1, 1)
+
+
+def archive_closed_months(con: duckdb.DuckDBPyConnection, hot_months: int) -> int:
+    """Move hot rows older than the newest ``hot_months`` months into Parquet.
+
+    Only whole months move, so each ``month=`` partition is written once. The
+    ``parking`` view is redefined to include the new files. Returns rows moved.
+    """
+    root = archive_dir(con)
+    newest = con.execute("SELECT max(ts_local) FROM parking_hot").fetchone()[0]
+    if root is None or newest is None or hot_months < 1:
+        return 0
+    cutoff = dt.datetime.combine(_month_start(newest.date(), hot_months - 1), dt.time())
+    moved = con.execute(
+        "SELECT count(*) FROM parking_hot WHERE ts_local < ?", [cutoff]
+    ).fetchone()[0]
+    if not moved:
+        return 0
+
+    root.mkdir(parents=True, exist_ok=True)
+    data_cols = ", ".join(c for c in COLUMNS if c != "node_type")
+    # COPY can't take bound parameters; cutoff is a datetime we built ourselves.
+    con.execute(
+        f"COPY (SELECT {data_cols}, node_type, strftime(ts_local, '%Y-%m') AS month "
+        f"FROM parking_hot WHERE ts_local < TIMESTAMP '{cutoff.isoformat()}' "
+        f"ORDER BY request_timestamp, path) "
+        f"TO {_quote(root)} (FORMAT parquet, COMPRESSION zstd, PARTITION_BY (month, node_type), "
+        f"APPEND, FILENAME_PATTERN 'part_{{uuid}}')"
+    )
+    _anchor_at(con, cutoff)
+    con.execute(
+        "DELETE FROM readings WHERE snapshot_id IN (SELECT snapshot_id FROM snapshots WHERE ts_local < ?)",
+        [cutoff],
+    )
+    _create_parking_view(con)
+    return moved
+
+
+def _prune_archive(con: duckdb.DuckDBPyConnection, start_date: dt.date) -> int:
+    """Drop archived rows before ``start_date``; returns how many were removed."""
+    removed = 0
+    for month_dir in sorted(archive_dir(con).glob("month=*")):
+        month = dt.date.fromisoformat(month_dir.name.removeprefix("month=") + "-01")
+        if month >= start_date:
+            continue
+        for f in month_dir.rglob("*.parquet"):
+            before, kept = con.execute(
+                f"SELECT count(*), count(*) FILTER (ts_local >= ?) FROM read_parquet({_quote(f)})",
+                [start_date],
+            ).fetchone()
+            removed += before - kept
+            if kept == 0:
+                f.unlink()
+            elif kept < before:  # month straddles the cutoff: rewrite the kept rows
+                tmp = f.with_suffix(".tmp")
+                con.execute(
+                    f"COPY (SELECT * FROM read_parquet({_quote(f)}) "
+                    f"WHERE ts_local >= DATE '{start_date.isoformat()}') "
+                    f"TO {_quote(tmp)} (FORMAT parquet, COMPRESSION zstd)"
+                )
+                tmp.replace(f)
+        if not any(month_dir.rglob("*.parquet")):
+            shutil.rmtree(month_dir)
+    return removed
 
 
 def get_last_timestamp(con: duckdb.DuckDBPyConnection) -> str | None:
     """Newest ``request_timestamp`` already cached, or None if empty."""
-    row = con.execute("SELECT max(request_timestamp) FROM parking").fetchone()
+    row = con.execute("SELECT max(request_timestamp) FROM snapshots").fetchone()
     return row[0] if row and row[0] is not None else None
 
 
@@ -54,6 +1035,81 @@ def row_count(con: duckdb.DuckDBPyConnection) -> int:
     return con.execute("SELECT count(*) FROM parking").fetchone()[0]
 
 
+# Rows of the ``changes`` as-of view without building it: each stored reading
+# stands for every snapshot from its own up to the node's next reading (or the
+# newest snapshot), unless it is a "gone" marker.
+_CHANGES_ROW_COUNT = """
+WITH ord AS (
+    SELECT snapshot_id, row_number() OVER (ORDER BY request_timestamp) AS k FROM snapshots
+),
+spans AS (
+    SELECT r.total_bays,
+           coalesce(lead(o.k) OVER (PARTITION BY r.node_id ORDER BY o.k),
+                    (SELECT count(*) FROM snapshots) + 1) - o.k AS n
+    FROM readings r JOIN ord o USING (snapshot_id)
+)
+SELECT coalesce(sum(n), 0)::BIGINT FROM spans WHERE total_bays IS NOT NULL
+"""
+
+
+def _counted_rows(con: duckdb.DuckDBPyConnection) -> int:
+    """:func:`row_count` from the fact table and the archive's Parquet metadata."""
+    if storage_mode(con) == "changes":
+        rows = con.execute(_CHANGES_ROW_COUNT).fetchone()[0]
+    else:
+        rows = con.execute("SELECT count(*) FROM readings").fetchone()[0]
+    if _archive_files(con):
+        rows += con.execute(f"SELECT count(*) FROM {_read_archive_sql(archive_dir(con))}").fetchone()[0]
+    return rows
+
+
+class DataVersion(NamedTuple):
+    """What the cache holds, as of its last write. Cheap to read; hashable."""
+
+    generation: int  # bumped by every sync and every prune that removed rows
+    rows: int
+    last_timestamp: str | None
+
+
+def bump_generation(con: duckdb.DuckDBPyConnection) -> DataVersion:
+    """Record a write: bump the generation and store the new row count/newest timestamp.
+
+    Counting here, once per write, is what lets :func:`data_version` answer
+    readers without touching the data; the count comes from the stored
+    readings, never the (in ``changes`` mode, reconstructed) ``parking`` view.
+    """
+    rows, last = _counted_rows(con), get_last_timestamp(con)
+    generation = con.execute(
+        """
+        INSERT INTO sync_state VALUES (1, 1, ?, ?, now()::TIMESTAMP)
+        ON CONFLICT (id) DO UPDATE SET generation = sync_state.generation + 1,
+            row_count = excluded.row_count, last_timestamp = excluded.last_timestamp,
+            updated_at = excluded.updated_at
+        RETURNING generation
+        """,
+        [rows, last],
+    ).fetchone()[0]
+    return DataVersion(generation, rows, last)
+
+
+def data_version(con: duckdb.DuckDBPyConnection) -> DataVersion:
+    """The cache's current :class:`DataVersion` — a one-row lookup.
+
+    Caches not yet synced with this version have no ``sync_state`` row; they
+    are counted directly (generation 0) until their next sync.
+    """
+    try:
+        row = con.execute(
+            "SELECT generation, row_count, last_timestamp FROM sync_state WHERE id = 1"
+        ).fetchone()
+    except duckdb.CatalogException:
+        row = None
+    if row is None:  # read straight from ``parking``: the cache may predate ``snapshots`` too
+        last = con.execute("SELECT max(request_timestamp) FROM parking").fetchone()[0]
+        return DataVersion(0, row_count(con), last)
+    return DataVersion(*row)
+
+
 def prune_before(con: duckdb.DuckDBPyConnection, start_date) -> int:
     """Delete cached rows older than ``start_date`` (local). Returns rows removed.
 
@@ -62,21 +1118,200 @@ def prune_before(con: duckdb.DuckDBPyConnection, start_date) -> int:
     """
     if start_date is None:
         return 0
-    before = row_count(con)
-    con.execute("DELETE FROM parking WHERE ts_local < ?", [start_date])
-    return before - row_count(con)
+    for table, (bucket, _, _) in _ROLLUPS.items():
+        con.execute(f"DELETE FROM {table} WHERE {bucket} < ?", [start_date])
+    con.execute("DELETE FROM latest_snapshot WHERE ts_local < ?", [start_date])
+    _anchor_at(con, start_date)
+    removed = con.execute(
+        "DELETE FROM readings WHERE snapshot_id IN (SELECT snapshot_id FROM snapshots WHERE ts_local < ?)",
+        [start_date],
+    ).fetchone()[0]
+    con.execute("DELETE FROM snapshots WHERE ts_local < ?", [start_date])
+    if _archive_files(con):
+        removed += _prune_archive(con, start_date)
+        _create_parking_view(con)
+    if removed:
+        bump_generation(con)
+    return removed
+
+
+def rollups_ready(con: duckdb.DuckDBPyConnection) -> bool:
+    """True if the rollup tables exist, have every column and are populated for a non-empty cache.
+
+    Caches synced before ``latest_snapshot`` existed count as not ready, so
+    they get one full rebuild.
+    """
+    try:
+        has_rollups = all(
+            con.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None
+            for table in ("daily_rollup", "latest_snapshot")
+        )
+    except duckdb.CatalogException:
+        return False
+    if _missing_rollup_columns(con):
+        return False
+    return has_rollups or con.execute("SELECT 1 FROM parking LIMIT 1").fetchone() is None
+
+
+def refresh_rollups(con: duckdb.DuckDBPyConnection, after: str | None = None) -> None:
+    """Bring the rollups up to date with ``parking``.
+
+    ``after`` is the newest ``request_timestamp`` cached *before* the sync; only
+    the hour/day buckets touched by newer snapshots are recomputed. With
+    ``after=None`` (or unpopulated rollups, e.g. an older cache file) every
+    rollup is rebuilt from scratch.
+    """
+    since = None
+    if after is not None and rollups_ready(con):
+        since = con.execute(
+            "SELECT min(ts_local) FROM snapshots WHERE request_timestamp > ?", [after]
+        ).fetchone()[0]
+        if since is None:
+            return  # nothing new since the last refresh
+
+    con.begin()
+    try:
+        for table, (bucket, bucket_of, select) in _ROLLUPS.items():
+            if since is None:
+                con.execute(f"DELETE FROM {table}")
+                con.execute(f"INSERT INTO {table} " + select.format(where="true"))
+            else:
+                con.execute(f"DELETE FROM {table} WHERE {bucket} >= {bucket_of}", [since])
+                con.execute(
+                    f"INSERT INTO {table} "
+                    + select.format(where=f"ts_local >= {bucket_of}::TIMESTAMP"),
+                    [since],
+                )
+        _refresh_latest(con)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def _refresh_latest(con: duckdb.DuckDBPyConnection) -> None:
+    # Replace the two newest snapshots wholesale (callers hold a transaction, so
+    # readers see the old pair or the new one, never an empty table).
+    stamps = [
+        r[0]
+        for r in con.execute(
+            "SELECT DISTINCT request_timestamp FROM garage_snapshots ORDER BY 1 DESC LIMIT 2"
+        ).fetchall()
+    ]
+    con.execute("DELETE FROM latest_snapshot")
+    if not stamps:
+        return
+    con.execute(
+        f"""
+        INSERT INTO latest_snapshot (recency, {_COL_LIST})
+        SELECT (request_timestamp <> ?)::SMALLINT, {_COL_LIST}
+        FROM parking WHERE request_timestamp IN ({",".join(["?"] * len(stamps))})
+        """,
+        [stamps[0], *stamps],
+    )
+
+
+def ensure_rollups(db_path=None, pooled: bool = True) -> None:
+    """Build the rollups for a cache file synced before they existed (no-op otherwise).
+
+    Goes through the file's shared pool, so it is safe while an in-process sync
+    holds the pool's writer (a separate connection would clash with its config).
+    ``pooled=False`` uses connections of its own, closed on return, for a
+    process whose own pool opens the file with other settings (the query
+    service's sandbox).
+    """
+    if not pooled:
+        with connect(read_only=True, db_path=db_path) as con:
+            if rollups_ready(con):
+                return
+        with _write_intent(db_path), connect(db_path=db_path, wait=WRITE_LOCK_WAIT_SECONDS) as con:
+            _build_rollups(con)
+        return
+    shared = pool(db_path)
+    with shared.cursor() as cur:
+        if rollups_ready(cur):
+            return
+    with shared.writer() as con:
+        _build_rollups(con)
+
+
+def _build_rollups(con: duckdb.DuckDBPyConnection) -> None:
+    if rollups_ready(con):  # a sync finished them while we waited
+        return
+    init_schema(con)
+    refresh_rollups(con)
+    if READ_REPLICA:
+        publish_replica(con)
+
+
+def _insert_registered(con: duckdb.DuckDBPyConnection, incoming) -> int:
+    # New nodes and snapshots get the next ids, then the readings of the new
+    # snapshots are keyed on them. Snapshots already cached are skipped whole:
+    # their readings may since have been archived or collapsed. DuckDB reports
+    # the rows actually written, so there's no need to count(*) the whole table
+    # before and after every page.
+    con.register("incoming", incoming)
+    con.begin()
+    try:
+        known = con.execute("SELECT coalesce(max(snapshot_id), 0) FROM snapshots").fetchone()[0]
+        con.execute(
+            """
+            INSERT INTO nodes
+            SELECT (SELECT coalesce(max(node_id), 0) FROM nodes) + row_number() OVER (ORDER BY path),
+                   path, node_type, garage, level, zone, name
+            FROM (
+                SELECT path, any_value(node_type) AS node_type, any_value(garage) AS garage,
+                       any_value(level) AS level, any_value(zone) AS zone, any_value(name) AS name
+                FROM incoming GROUP BY path
+            ) i
+            WHERE NOT EXISTS (SELECT 1 FROM nodes n WHERE n.path = i.path)
+            """
+        )
+        con.execute(
+            """
+            INSERT INTO snapshots
+            SELECT (SELECT coalesce(max(snapshot_id), 0) FROM snapshots)
+                       + row_number() OVER (ORDER BY request_timestamp),
+                   request_timestamp, ts_utc, ts_local
+            FROM (
+                SELECT request_timestamp, any_value(ts_utc) AS ts_utc, any_value(ts_local) AS ts_local
+                FROM incoming GROUP BY request_timestamp
+            ) i
+            WHERE NOT EXISTS (SELECT 1 FROM snapshots s WHERE s.request_timestamp = i.request_timestamp)
+            """
+        )
+        written = con.execute(
+            """
+            INSERT INTO readings
+            SELECT s.snapshot_id, n.node_id, i.total_bays, i.occupied_bays
+            FROM incoming i JOIN snapshots s USING (request_timestamp) JOIN nodes n USING (path)
+            WHERE s.snapshot_id > ?
+            ON CONFLICT DO NOTHING
+            """,
+            [known],
+        ).fetchone()[0]
+        con.commit()
+        return written
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.unregister("incoming")
 
 
 def insert_rows(con: duckdb.DuckDBPyConnection, rows: list[dict]) -> int:
     """Insert flattened rows, ignoring any that already exist. Returns net new."""
     if not rows:
         return 0
-    df = pd.DataFrame(rows, columns=COLUMNS)
-    before = row_count(con)
-    con.register("incoming", df)
-    con.execute(
-        f"INSERT INTO parking ({_COL_LIST}) "
-        f"SELECT {_COL_LIST} FROM incoming ON CONFLICT DO NOTHING"
-    )
-    con.unregister("incoming")
-    return row_count(con) - before
+    return _insert_registered(con, pd.DataFrame(rows, columns=COLUMNS))
+
+
+def insert_arrow(con: duckdb.DuckDBPyConnection, table: pa.Table) -> int:
+    """Insert an Arrow table from ``flatten.flatten_page``. Returns net new rows.
+
+    DuckDB scans the registered Arrow buffers in place, so unlike
+    :func:`insert_rows` there is no intermediate pandas copy.
+    """
+    if table.num_rows == 0:
+        return 0
+    return _insert_registered(con, table)
@@ -7,84 +7,442 @@ big win is local: we only JSON-parse and store *new* snapshots, and the app
 reads DuckDB instead of ever scanning DynamoDB.
 
 The first run (empty cache) scans the whole table once to backfill.
+
+With ``PARKING_SYNC_MODE=auto`` (opt-in, see :mod:`parking.gsi`) and the
+time-bucket GSI in place, sync Queries it instead — one Query per monthly bucket
+since the last sync, each reading only items newer than what's cached — and
+falls back to the Scan when the index isn't usable.
+
+A sync is a three-stage pipeline joined by bounded queues::
+
+    fetch (N segment threads) -> decode/flatten (1 thread) -> stage (caller)
+
+The scan is split into ``Segment``/``TotalSegments`` parallel segments so a
+backfill scales with the segment count instead of one page's round-trip. The
+bounded queues apply backpressure: a slow stage stalls the ones upstream rather
+than buffering the whole table in memory. Throughput is set by the slowest
+stage, not the sum of all three; per-stage busy time is in the summary.
+
+Decoded batches are staged in a temporary Parquet file beside the cache, and
+the cache file is only opened for writing once the fetch is done, to insert
+them and refresh the rollups and anomalies. DuckDB's write lock also shuts out
+read-only opens from other processes (the app), so it is held for that short
+step rather than for the network-bound fetch. Only the calling thread writes to
+DuckDB, so there is still a single writer.
 """
 
 from __future__ import annotations
 
 import json
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Callable
 
 import boto3
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-from . import store
-from .config import AWS_REGION, START_DATE, TABLE_NAME
-from .flatten import flatten_response
+from . import anomalies, gsi, store
+from .config import (
+    ARCHIVE_HOT_MONTHS,
+    AWS_REGION,
+    DB_PATH,
+    GSI_NAME,
+    INSERT_BATCH_ROWS,
+    PIPELINE_DEPTH,
+    READ_REPLICA,
+    SCAN_SEGMENTS,
+    START_DATE,
+    SYNC_MODE,
+    TABLE_NAME,
+    WRITE_LOCK_WAIT_SECONDS,
+)
+from .flatten import ARROW_SCHEMA, flatten_page
 
-# Called after each scan page with cumulative (new_items, scanned, rows_inserted).
+# Called after each staged and each inserted batch with cumulative (new_items,
+# scanned, rows_inserted); rows_inserted stays 0 until the fetch is done.
 ProgressFn = Callable[[int, int, int], None]
 
+# Sentinel a stage enqueues once it has no more work for the next one.
+_DONE = object()
+
+
+class _Timer:
+    """Thread-safe accumulator of per-stage busy seconds."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.seconds: dict[str, float] = {
+            "fetch": 0.0, "decode": 0.0, "stage": 0.0, "insert": 0.0, "collapse": 0.0,
+            "rollups": 0.0, "anomalies": 0.0, "archive": 0.0, "publish": 0.0,
+        }
+
+    def add(self, stage: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.seconds[stage] += elapsed
+
 
 def _client():
     return boto3.client("dynamodb", region_name=AWS_REGION)
 
 
-def sync(db_path=None, progress: ProgressFn | None = None) -> dict:
-    """Pull snapshots newer than what's cached into DuckDB. Returns a summary."""
-    con = store.connect(read_only=False, db_path=db_path)
-    try:
-        store.init_schema(con)
-        pruned = store.prune_before(con, START_DATE)
-        last = store.get_last_timestamp(con)
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once ``stop`` is set. Returns False if stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
 
-        scan_kwargs: dict = {"TableName": TABLE_NAME}
-        if last:
-            # Incremental: only snapshots newer than what's cached.
-            scan_kwargs["FilterExpression"] = "#ts > :last"
-            scan_kwargs["ExpressionAttributeNames"] = {"#ts": "request_timestamp"}
-            scan_kwargs["ExpressionAttributeValues"] = {":last": {"S": last}}
-        elif START_DATE:
-            # Backfill: don't even download pre-cutoff data. request_timestamp is
-            # a UTC ISO string; a bare date sorts as its lexicographic prefix.
-            scan_kwargs["FilterExpression"] = "#ts >= :start"
-            scan_kwargs["ExpressionAttributeNames"] = {"#ts": "request_timestamp"}
-            scan_kwargs["ExpressionAttributeValues"] = {":start": {"S": START_DATE.isoformat()}}
-
-        client = _client()
-        new_items = 0
-        scanned = 0
-        rows_inserted = 0
-
-        while True:
-            resp = client.scan(**scan_kwargs)
-            items = resp.get("Items", [])
-            scanned += resp.get("ScannedCount", len(items))
-
-            rows: list[dict] = []
-            for item in items:
-                try:
-                    ts = item["request_timestamp"]["S"]
-                    api = json.loads(item["api_response"]["S"])
-                except (KeyError, TypeError, json.JSONDecodeError):
-                    continue
-                rows.extend(flatten_response(api, ts))
 
-            rows_inserted += store.insert_rows(con, rows)
-            new_items += len(items)
-            if progress:
-                progress(new_items, scanned, rows_inserted)
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that returns ``_DONE`` once ``stop`` is set and ``q`` is drained."""
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
 
+def _fetch_pages(
+    call: Callable[..., dict],
+    kwargs: dict,
+    pages: queue.Queue,
+    stop: threading.Event,
+    timer: _Timer,
+) -> None:
+    """Fetch stage: page through one Scan segment or Query, enqueueing every response page."""
+    kwargs = dict(kwargs)
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            resp = call(**kwargs)
+            timer.add("fetch", started)
+            if not _put(pages, resp, stop):
+                break
             lek = resp.get("LastEvaluatedKey")
             if not lek:
                 break
-            scan_kwargs["ExclusiveStartKey"] = lek
-
-        return {
-            "last_before": last,
-            "new_items": new_items,
-            "rows_inserted": rows_inserted,
-            "rows_pruned": pruned,
-            "scanned": scanned,
-            "total_rows": store.row_count(con),
-        }
+            kwargs["ExclusiveStartKey"] = lek
+    except BaseException:
+        stop.set()  # abort the other stages; the error surfaces via the future
+        raise
+    finally:
+        _put(pages, _DONE, stop)
+
+
+def _plan_fetch(client, last: str | None, segments: int) -> tuple[str, list[tuple[Callable, dict]]]:
+    """Pick Query (bucket index) or Scan mode and build one fetch per producer thread.
+
+    Query mode needs a lower bound to enumerate buckets from, so a backfill
+    without ``START_DATE`` always scans.
+    """
+    mode = SYNC_MODE
+    if not (last or START_DATE):
+        mode = "scan"
+    elif mode == "auto":
+        mode = "query" if gsi.index_ready(client) else "scan"
+    if mode == "query":
+        names = {"#b": gsi.BUCKET_ATTR, "#ts": "request_timestamp"}
+        if last:
+            cond, bound = "#b = :b AND #ts > :bound", last
+        else:
+            cond, bound = "#b = :b AND #ts >= :bound", START_DATE.isoformat()
+        return mode, [
+            (
+                client.query,
+                {
+                    "TableName": TABLE_NAME,
+                    "IndexName": GSI_NAME,
+                    "KeyConditionExpression": cond,
+                    "ExpressionAttributeNames": names,
+                    "ExpressionAttributeValues": {":b": {"S": bucket}, ":bound": {"S": bound}},
+                },
+            )
+            for bucket in gsi.buckets_between(gsi.bucket_of(bound))
+        ]
+
+    scan_kwargs: dict = {"TableName": TABLE_NAME}
+    if last:
+        # Incremental: only snapshots newer than what's cached.
+        scan_kwargs["FilterExpression"] = "#ts > :last"
+        scan_kwargs["ExpressionAttributeNames"] = {"#ts": "request_timestamp"}
+        scan_kwargs["ExpressionAttributeValues"] = {":last": {"S": last}}
+    elif START_DATE:
+        # Backfill: don't even download pre-cutoff data. request_timestamp is
+        # a UTC ISO string; a bare date sorts as its lexicographic prefix.
+        scan_kwargs["FilterExpression"] = "#ts >= :start"
+        scan_kwargs["ExpressionAttributeNames"] = {"#ts": "request_timestamp"}
+        scan_kwargs["ExpressionAttributeValues"] = {":start": {"S": START_DATE.isoformat()}}
+    if segments == 1:
+        return mode, [(client.scan, scan_kwargs)]
+    return mode, [
+        (client.scan, {**scan_kwargs, "Segment": seg, "TotalSegments": segments})
+        for seg in range(segments)
+    ]
+
+
+def _decode_page(items: list[dict]) -> pa.Table:
+    """Decode + flatten one page of items, skipping malformed ones."""
+    snapshots: list[tuple[str, dict]] = []
+    for item in items:
+        try:
+            ts = item["request_timestamp"]["S"]
+            api = json.loads(item["api_response"]["S"])
+        except (KeyError, TypeError, json.JSONDecodeError):
+            continue
+        snapshots.append((ts, api))
+    return flatten_page(snapshots)
+
+
+def _decode_pages(
+    pages: queue.Queue,
+    batches: queue.Queue,
+    producers: int,
+    stop: threading.Event,
+    timer: _Timer,
+) -> None:
+    """Decode stage: turn scan pages into ``(table, items, scanned)`` batches."""
+    try:
+        running = producers
+        while running and not stop.is_set():
+            resp = _get(pages, stop)
+            if resp is _DONE:
+                running -= 1
+                continue
+            started = time.perf_counter()
+            items = resp.get("Items", [])
+            batch = (_decode_page(items), len(items), resp.get("ScannedCount", len(items)))
+            timer.add("decode", started)
+            if not _put(batches, batch, stop):
+                break
+    except BaseException:
+        stop.set()
+        raise
     finally:
-        con.close()
+        _put(batches, _DONE, stop)
+
+
+def sync(
+    db_path=None, progress: ProgressFn | None = None, segments: int | None = None
+) -> dict:
+    """Pull snapshots newer than what's cached into DuckDB. Returns a summary.
+
+    ``segments`` overrides ``PARKING_SCAN_SEGMENTS`` (1 = a plain sequential
+    scan); it also caps how many bucket Queries run at once. The summary's
+    ``mode`` says which was used and ``segments`` how many fetches ran.
+    Raises :class:`store.WriterBusy` if another sync is already running.
+    """
+    with store.writer_lock(db_path):
+        return _sync(db_path, progress, max(1, segments or SCAN_SEGMENTS))
+
+
+def _cached_last(db_path) -> str | None:
+    """Newest cached ``request_timestamp``, read without the writer (None for a new cache).
+
+    With a read replica this is the last published state, which a failed
+    publish can leave behind the cache file; the re-fetched snapshots it
+    misses are skipped on insert.
+    """
+    if not Path(db_path or DB_PATH).exists():
+        return None
+    try:
+        with store.pool(db_path).cursor() as con:
+            return store.get_last_timestamp(con)
+    except duckdb.CatalogException:  # created but never synced
+        return None
+
+
+def _stage(
+    fetches: list[tuple[Callable, dict]],
+    segments: int,
+    staged: pq.ParquetWriter,
+    timer: _Timer,
+    progress: ProgressFn | None,
+) -> tuple[int, int]:
+    """Run the fetch/decode pipeline into ``staged``. Returns (new_items, scanned)."""
+    new_items = 0
+    scanned = 0
+    pages: queue.Queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+    batches: queue.Queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+    stop = threading.Event()
+    # At most ``segments`` fetches run at once (a Query backfill can span
+    # many monthly buckets); the decoder is submitted first so it always
+    # has a thread.
+    with ThreadPoolExecutor(max_workers=min(segments, len(fetches)) + 1) as executor:
+        futures = [executor.submit(_decode_pages, pages, batches, len(fetches), stop, timer)]
+        futures += [
+            executor.submit(_fetch_pages, call, kwargs, pages, stop, timer)
+            for call, kwargs in fetches
+        ]
+        try:
+            done = False
+            while not done:
+                # Coalesce whatever pages are already decoded into one row group.
+                tables, n_rows, items, seen = [], 0, 0, 0
+                batch = _get(batches, stop)
+                while True:
+                    if batch is _DONE:
+                        done = True
+                        break
+                    tables.append(batch[0])
+                    n_rows += batch[0].num_rows
+                    items += batch[1]
+                    seen += batch[2]
+                    if n_rows >= INSERT_BATCH_ROWS:
+                        break
+                    try:
+                        batch = batches.get_nowait()
+                    except queue.Empty:
+                        break
+                if not items and not seen:
+                    continue
+                if n_rows:
+                    started = time.perf_counter()
+                    staged.write_table(pa.concat_tables(tables))
+                    timer.add("stage", started)
+                new_items += items
+                scanned += seen
+                if progress:
+                    progress(new_items, scanned, 0)
+        finally:
+            stop.set()
+        for f in futures:
+            f.result()  # re-raise the first fetch/decode error, if any
+    return new_items, scanned
+
+
+def _sync(db_path, progress: ProgressFn | None, segments: int) -> dict:
+    wall_start = time.perf_counter()
+    db = Path(db_path or DB_PATH)
+    last = _cached_last(db)
+
+    client = _client()
+    mode, fetches = _plan_fetch(client, last, segments)
+    timer = _Timer()
+
+    db.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix=f".{db.name}.", dir=db.parent) as tmp:
+        staged = Path(tmp) / "staged.parquet"
+        with pq.ParquetWriter(staged, ARROW_SCHEMA) as writer:
+            new_items, scanned = _stage(fetches, segments, writer, timer, progress)
+
+        # Only now take the file: the DuckDB write lock also shuts out readers
+        # in other processes, so it is held for the insert and upkeep alone.
+        with store.writer(db_path, wait=WRITE_LOCK_WAIT_SECONDS) as con:
+            store.init_schema(con)
+            rows_inserted = 0
+            with pq.ParquetFile(staged) as rows:
+                for group in range(rows.num_row_groups):
+                    started = time.perf_counter()
+                    rows_inserted += store.insert_arrow(con, rows.read_row_group(group))
+                    timer.add("insert", started)
+                    if progress:
+                        progress(new_items, scanned, rows_inserted)
+            pruned = store.prune_before(con, START_DATE)
+
+            # Change-only storage keeps just the readings that differ from the last.
+            started = time.perf_counter()
+            unchanged = store.collapse_unchanged(con)
+            timer.add("collapse", started)
+
+            # Recompute only the hour/day rollup buckets the new snapshots touched.
+            started = time.perf_counter()
+            store.refresh_rollups(con, last)
+            timer.add("rollups", started)
+
+            # Re-judge only the days (and drifted series) this sync touched. A prune
+            # moves the first day, so it gets a full pass.
+            started = time.perf_counter()
+            anomalies.refresh(con, None if pruned else last)
+            timer.add("anomalies", started)
+
+            archived = 0
+            if ARCHIVE_HOT_MONTHS:
+                started = time.perf_counter()
+                archived = store.archive_closed_months(con, ARCHIVE_HOT_MONTHS)
+                timer.add("archive", started)
+
+            # One metadata write readers key their caches on (no count(*) per read).
+            version = store.bump_generation(con)
+
+            if READ_REPLICA:  # hand readers the new state as one atomic file swap
+                started = time.perf_counter()
+                store.publish_replica(con)
+                timer.add("publish", started)
+
+    return {
+        "last_before": last,
+        "new_items": new_items,
+        "rows_inserted": rows_inserted,
+        "rows_pruned": pruned,
+        "rows_archived": archived,
+        "rows_unchanged": unchanged,
+        "scanned": scanned,
+        "mode": mode,
+        "segments": len(fetches),
+        "total_rows": version.rows,
+        "generation": version.generation,
+        "timings": {
+            **{k: round(v, 3) for k, v in timer.seconds.items()},
+            "wall": round(time.perf_counter() - wall_start, 3),
+        },
+    }
+
+
+class BackgroundSync:
+    """Runs :func:`sync` on a worker thread and exposes its live progress.
+
+    One instance per cache file is meant to be shared process-wide (the app
+    keeps it in ``st.cache_resource``), so every session sees the same job.
+    Readers keep querying the previous data meanwhile: the write goes through
+    the file's shared pool, and the data version only changes once the sync
+    finishes.
+    """
+
+    def __init__(self, db_path=None) -> None:
+        self.db_path = db_path
+        self.progress: tuple[int, int, int] = (0, 0, 0)  # latest ProgressFn arguments
+        self.result: dict | None = None
+        self.error: BaseException | None = None
+        self.runs = 0  # finished runs, so callers can tell a new outcome from an old one
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Start a sync unless one is already running. Returns whether it started."""
+        with self._lock:
+            if self.running:
+                return False
+            self.progress, self.result, self.error = (0, 0, 0), None, None
+            self._thread = threading.Thread(target=self._run, name="parking-sync", daemon=True)
+            self._thread.start()
+            return True
+
+    def _on_progress(self, new_items: int, scanned: int, rows_inserted: int) -> None:
+        self.progress = (new_items, scanned, rows_inserted)
+
+    def _run(self) -> None:
+        try:
+            self.result = sync(db_path=self.db_path, progress=self._on_progress)
+        except BaseException as e:  # surfaced to the caller via .error
+            self.error = e
+        finally:
+            self.runs += 1
+
+    def wait(self, timeout: float | None = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,161 @@
+"""Deterministic synthetic DynamoDB items, shaped like the collector's output.
+
+Used by the tests (against moto / temp DuckDB files) and by benchmarks, so
+neither needs AWS access or a real cache. Each item mirrors what the Lambda
+writes: a naive UTC ISO ``request_timestamp`` plus the raw ``api_response`` tree
+(system -> garage -> level -> zone) serialized as a JSON string.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import datetime as dt
+import json
+import math
+import os
+import random
+from typing import Any, Callable, Iterator
+
+import pyarrow as pa
+
+from .config import AWS_REGION, TABLE_NAME
+from .flatten import flatten_page
+
+SNAPSHOT_INTERVAL = dt.timedelta(minutes=5)
+
+_GARAGE_NAMES = ["Second Avenue", "Fourth Avenue", "Fifth Avenue", "Main Street", "Church Street"]
+
+
+def garage_names(n: int) -> list[str]:
+    """``n`` distinct garage names, real-looking ones first."""
+    return [_GARAGE_NAMES[i] if i < len(_GARAGE_NAMES) else f"Garage {i + 1}" for i in range(n)]
+
+
+def _load(ts: dt.datetime, rng: random.Random) -> float:
+    """Fraction full at ``ts``: a weekday/weekend daily curve plus noise."""
+    hour = ts.hour + ts.minute / 60
+    peak = 0.55 if ts.weekday() >= 5 else 0.85
+    curve = max(0.0, math.sin(math.pi * (hour - 6) / 14)) if 6 <= hour <= 20 else 0.0
+    return min(1.0, max(0.0, 0.05 + peak * curve + rng.uniform(-0.03, 0.03)))
+
+
+def make_api(
+    ts: dt.datetime,
+    *,
+    garages: int = 2,
+    levels: int = 4,
+    zones: int = 1,
+    bays_per_zone: int = 40,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """One ``api_response`` tree for the snapshot taken at (naive UTC) ``ts``."""
+    rng = random.Random(f"{seed}:{ts.isoformat()}")
+    load = _load(ts, rng)
+    garage_nodes = []
+    for g in garage_names(garages):
+        level_nodes = []
+        for lv in range(1, levels + 1):
+            zone_nodes = []
+            for z in range(1, zones + 1):
+                occ = int(round(bays_per_zone * min(1.0, max(0.0, load + rng.uniform(-0.1, 0.1)))))
+                zone_nodes.append(
+                    {"Name": f"Zone {z}", "TotalBays": bays_per_zone, "OccupiedBays": occ}
+                )
+            level_nodes.append(
+                {
+                    "Name": f"Level {lv}",
+                    "TotalBays": sum(n["TotalBays"] for n in zone_nodes),
+                    "OccupiedBays": sum(n["OccupiedBays"] for n in zone_nodes),
+                    "Zones": zone_nodes,
+                }
+            )
+        garage_nodes.append(
+            {
+                "Name": g,
+                "TotalBays": sum(n["TotalBays"] for n in level_nodes),
+                "OccupiedBays": sum(n["OccupiedBays"] for n in level_nodes),
+                "Zones": level_nodes,
+            }
+        )
+    return {
+        "Name": "City of Franklin",
+        "TotalBays": sum(n["TotalBays"] for n in garage_nodes),
+        "OccupiedBays": sum(n["OccupiedBays"] for n in garage_nodes),
+        "Zones": garage_nodes,
+    }
+
+
+def timestamps(start: dt.datetime, count: int) -> Iterator[dt.datetime]:
+    """``count`` naive-UTC snapshot times at the 5-minute collection cadence."""
+    for i in range(count):
+        yield start + i * SNAPSHOT_INTERVAL
+
+
+def make_items(
+    start: dt.datetime,
+    count: int,
+    *,
+    skip: Callable[[dt.datetime], bool] | None = None,
+    edit: Callable[[dt.datetime, dict], None] | None = None,
+    **tree_kwargs,
+) -> list[dict]:
+    """``count`` DynamoDB items (low-level wire format) starting at ``start``.
+
+    ``skip(ts)`` drops a snapshot (simulating a collection gap) and
+    ``edit(ts, api)`` mutates its tree in place (simulating an outage).
+    """
+    items = []
+    for ts in timestamps(start, count):
+        if skip and skip(ts):
+            continue
+        api = make_api(ts, **tree_kwargs)
+        if edit:
+            edit(ts, api)
+        items.append(
+            {
+                "request_timestamp": {"S": ts.isoformat(timespec="microseconds")},
+                "api_response": {"S": json.dumps(api)},
+            }
+        )
+    return items
+
+
+def decode_items(items: list[dict]) -> list[tuple[str, dict]]:
+    """``(request_timestamp, api_response)`` pairs, as sync's decoder hands them to
+    :func:`~parking.flatten.flatten_page`."""
+    return [(i["request_timestamp"]["S"], json.loads(i["api_response"]["S"])) for i in items]
+
+
+def flatten_items(items: list[dict]) -> pa.Table:
+    """The rows a sync would insert for ``items``."""
+    return flatten_page(decode_items(items))
+
+
+@contextlib.contextmanager
+def moto_table():
+    """A moto DynamoDB stand-in for the collector's table (fake credentials meanwhile).
+
+    moto is a dev dependency, so it is imported only here.
+    """
+    import boto3
+    import moto
+
+    saved = {k: os.environ.get(k) for k in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_PROFILE")}
+    os.environ.update(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing")
+    os.environ.pop("AWS_PROFILE", None)
+    try:
+        with moto.mock_aws():
+            client = boto3.client("dynamodb", region_name=AWS_REGION)
+            client.create_table(
+                TableName=TABLE_NAME,
+                KeySchema=[{"AttributeName": "request_timestamp", "KeyType": "HASH"}],
+                AttributeDefinitions=[{"AttributeName": "request_timestamp", "AttributeType": "S"}],
+                BillingMode="PAY_PER_REQUEST",
+            )
+            yield client
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
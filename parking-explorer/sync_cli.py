@@ -1,12 +1,33 @@
 """Run an incremental sync from the terminal:
 
     poetry run python sync_cli.py
+
+or keep the cache current as a long-running service (see parking.daemon):
+
+    poetry run python sync_cli.py --daemon
+
+or, once, tag existing items with the GSI bucket attribute (see parking.gsi):
+
+    poetry run python sync_cli.py --backfill-gsi
+
+or rewrite the cache file without its free space (e.g. after the upgrade to
+the normalized layout; see parking.store.compact):
+
+    poetry run python sync_cli.py --compact
 """
 
 from __future__ import annotations
 
+import argparse
+import logging
+import signal
 import sys
+import threading
+
+import boto3
 
+from parking import daemon, gsi, store
+from parking.config import AWS_REGION, DB_PATH, GSI_NAME, SYNC_INTERVAL_SECONDS, SYNC_MODE, SYNC_OFFSET_SECONDS
 from parking.sync import sync
 
 
@@ -17,9 +38,66 @@ def _progress(new_items: int, scanned: int, rows_inserted: int) -> None:
     sys.stdout.flush()
 
 
+def run_daemon(interval: int, offset: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    logging.info("sync daemon: every %ds, offset %ds (Ctrl-C to stop)", interval, offset)
+    try:
+        daemon.run(interval=interval, offset=offset, stop=stop)
+    except KeyboardInterrupt:
+        pass
+
+
+def _backfill_progress(updated: int, scanned: int) -> None:
+    sys.stdout.write(f"\r  tagged: {updated:,} | scanned: {scanned:,}")
+    sys.stdout.flush()
+
+
+def backfill_gsi() -> None:
+    client = boto3.client("dynamodb", region_name=AWS_REGION)
+    print(f"Writing {gsi.BUCKET_ATTR} onto items that lack it ...")
+    result = gsi.backfill(client, progress=_backfill_progress)
+    print(f"\nDone: tagged {result['updated']:,} of {result['scanned']:,} scanned items.")
+    if not gsi.index_ready(client):
+        print(f"Note: index {GSI_NAME!r} isn't usable yet (missing or still building); sync keeps scanning.")
+    elif SYNC_MODE == "scan":
+        print("Once the collector tags every new item, set PARKING_SYNC_MODE=auto to sync through the index.")
+
+
+def compact() -> None:
+    try:
+        before, after = store.compact()
+    except store.WriterBusy as e:
+        sys.exit(f"Not compacting: {e}.")
+    print(f"Compacted {DB_PATH}: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB.")
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync parking snapshots from DynamoDB into DuckDB.")
+    parser.add_argument("--daemon", action="store_true", help="keep syncing on a schedule")
+    parser.add_argument("--interval", type=int, default=SYNC_INTERVAL_SECONDS, help="seconds between runs")
+    parser.add_argument("--offset", type=int, default=SYNC_OFFSET_SECONDS, help="seconds past each grid point")
+    parser.add_argument(
+        "--backfill-gsi", action="store_true", help=f"write {gsi.BUCKET_ATTR} onto untagged items, then exit"
+    )
+    parser.add_argument("--compact", action="store_true", help="rewrite the cache file without free space, then exit")
+    args = parser.parse_args()
+    if args.compact:
+        compact()
+        return
+    if args.backfill_gsi:
+        backfill_gsi()
+        return
+    if args.daemon:
+        run_daemon(args.interval, args.offset)
+        return
+
     print("Syncing new parking snapshots from DynamoDB -> DuckDB ...")
-    result = sync(progress=_progress)
+    try:
+        result = sync(progress=_progress)
+    except store.WriterBusy as e:
+        sys.exit(f"Not syncing: {e}.")
     print()
     if result.get("rows_pruned"):
         print(f"Pruned {result['rows_pruned']:,} rows before the start-date cutoff.")
@@ -30,7 +108,14 @@ def main() -> None:
             f"Done: {result['new_items']:,} new snapshots, "
             f"{result['rows_inserted']:,} rows inserted."
         )
-    print(f"Cache now holds {result['total_rows']:,} rows.")
+    if result.get("rows_archived"):
+        print(f"Archived {result['rows_archived']:,} rows from closed months to Parquet.")
+    print(f"Cache now holds {result['total_rows']:,} rows (fetched via {result['mode']}).")
+    t = result["timings"]
+    print(
+        f"Took {t['wall']:.1f}s (busy: fetch {t['fetch']:.1f}s, "
+        f"decode {t['decode']:.1f}s, insert {t['insert']:.1f}s, rollups {t['rollups']:.1f}s)."
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,15 @@
+"""Fixtures shared by the test modules."""
+
+from __future__ import annotations
+
+import pytest
+
+from parking.synthetic import moto_table
+
+
+@pytest.fixture
+def table():
+    """An empty moto stand-in for the collector's DynamoDB table (skipped without moto)."""
+    pytest.importorskip("moto")
+    with moto_table() as client:
+        yield client
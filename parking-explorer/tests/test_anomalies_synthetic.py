@@ -0,0 +1,253 @@
+"""Anomaly detector tests on synthetic history with injected incidents (temp DB)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import pytest
+
+from parking import anomalies, store
+from parking.config import LOCAL_TZ
+from parking.synthetic import flatten_items, make_items
+
+START = dt.datetime(2026, 2, 2, 6)  # midnight local (CST), a Monday
+DAYS = 28
+GAP_DAY = dt.date(2026, 2, 11)
+EMPTIED_DAY = dt.date(2026, 2, 17)
+QUIET_DAY = dt.date(2026, 2, 24)  # a Tuesday
+
+_LOCAL = ZoneInfo(LOCAL_TZ)
+
+
+def _local_day(ts: dt.datetime) -> dt.date:
+    return ts.replace(tzinfo=dt.timezone.utc).astimezone(_LOCAL).date()
+
+
+def _skip(ts: dt.datetime) -> bool:
+    # Lose the afternoon and evening of GAP_DAY.
+    return _local_day(ts) == GAP_DAY and ts.replace(tzinfo=dt.timezone.utc).astimezone(_LOCAL).hour >= 12
+
+
+def _edit(ts: dt.datetime, api: dict) -> None:
+    day = _local_day(ts)
+    for garage in api["Zones"]:
+        for level in garage["Zones"]:
+            if day == EMPTIED_DAY and garage["Name"] == "Second Avenue" and level["Name"] == "Level 1":
+                level["OccupiedBays"] = 0
+                for zone in level["Zones"]:
+                    zone["OccupiedBays"] = 0
+            elif day == QUIET_DAY:
+                level["OccupiedBays"] //= 5
+                for zone in level["Zones"]:
+                    zone["OccupiedBays"] //= 5
+        if day == QUIET_DAY:
+            garage["OccupiedBays"] = sum(lv["OccupiedBays"] for lv in garage["Zones"])
+
+
+def _items(first_snapshot: int, count: int) -> list[dict]:
+    start = START + dt.timedelta(minutes=5 * first_snapshot)
+    return make_items(start, count, skip=_skip, edit=_edit, garages=2, levels=4)
+
+
+def _sync_like(con, items) -> str | None:
+    """What sync does per run: insert, then refresh rollups and anomalies."""
+    last = store.get_last_timestamp(con)
+    store.insert_arrow(con, flatten_items(items))
+    store.refresh_rollups(con, last)
+    return anomalies.refresh(con, last)
+
+
+@pytest.fixture(scope="module")
+def history(tmp_path_factory):
+    db = tmp_path_factory.mktemp("anoms") / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    _sync_like(con, _items(0, DAYS * 288))
+    con.close()
+    return db
+
+
+@pytest.fixture
+def con(history):
+    c = store.connect(read_only=True, db_path=history)
+    yield c
+    c.close()
+
+
+def _on(df, day):
+    return df[pd.to_datetime(df["date"]).dt.date == day]
+
+
+def test_injected_incidents_are_detected(con):
+    found = anomalies.detect(con)
+    assert list(found.columns) == ["date", "garage", "level", "type", "severity", "detail"]
+    assert found["severity"].between(0, 1).all()
+
+    assert (_on(found, GAP_DAY)["type"] == "Collection gap").any()
+    emptied = _on(found, EMPTIED_DAY)
+    assert ((emptied["type"] == "Level emptied") & (emptied["level"] == "Level 1")).any()
+    assert set(_on(found, QUIET_DAY).query("type == 'Suppressed activity'")["garage"]) == {
+        "Second Avenue", "Fourth Avenue",
+    }
+    # The partial gap day isn't double-reported as suppressed activity.
+    assert not (_on(found, GAP_DAY)["type"] == "Suppressed activity").any()
+
+
+def test_persisted_log_matches_full_pass(con):
+    assert anomalies.load(con).equals(anomalies.detect(con))
+
+
+def test_incremental_refresh_matches_full_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(anomalies, "BASELINE_DRIFT", 0.0)  # any drift -> re-judge series
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    done = 20 * 288
+    _sync_like(con, _items(0, done))
+    while done < DAYS * 288:
+        step = 150  # ~12.5 hours per "sync", so runs straddle day boundaries
+        summary = _sync_like(con, _items(done, step))
+        assert summary["since"] is None or summary["since"] >= dt.date(2026, 2, 21)
+        done += step
+    assert anomalies.load(con).equals(anomalies.detect(con))
+    con.close()
+
+
+def _trending(ts: dt.datetime, api: dict) -> None:
+    """The incidents of :func:`_edit` on top of demand that grows steadily (5x over DAYS)."""
+    _edit(ts, api)
+    factor = 0.2 + 0.8 * (ts - START) / dt.timedelta(days=DAYS)
+    for garage in api["Zones"]:
+        for level in garage["Zones"]:
+            for zone in level["Zones"]:
+                zone["OccupiedBays"] = int(zone["OccupiedBays"] * factor)
+            level["OccupiedBays"] = sum(z["OccupiedBays"] for z in level["Zones"])
+        garage["OccupiedBays"] = sum(lv["OccupiedBays"] for lv in garage["Zones"])
+    api["OccupiedBays"] = sum(g["OccupiedBays"] for g in api["Zones"])
+
+
+def _typical(detail: str) -> float:
+    return float(re.search(r"typical (\d+)", detail).group(1))
+
+
+def test_incremental_refresh_tracks_a_slow_trend(tmp_path):
+    """At the default BASELINE_DRIFT, small per-sync moves still add up to a re-judge."""
+    def items(first: int, count: int) -> list[dict]:
+        start = START + dt.timedelta(minutes=5 * first)
+        # Large levels, so the daily medians move in steps well under BASELINE_DRIFT.
+        return make_items(start, count, skip=_skip, edit=_trending, garages=2, levels=4, bays_per_zone=200)
+
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    done = 4 * 288
+    _sync_like(con, items(0, done))
+    while done < DAYS * 288:
+        _sync_like(con, items(done, 144))  # 12 hours per "sync"
+        done += 144
+    logged, full = anomalies.load(con), anomalies.detect(con)
+    con.close()
+
+    key = ["date", "garage", "level", "type"]
+    assert logged[key].sort_values(key).values.tolist() == full[key].sort_values(key).values.tolist()
+    both = logged.merge(full, on=key, suffixes=("_log", "_full"))
+    assert ((both["severity_log"] - both["severity_full"]).abs() <= anomalies.BASELINE_DRIFT).all()
+    emptied = both[both["type"] == "Level emptied"]
+    assert not emptied.empty
+    for log_detail, full_detail in zip(emptied["detail_log"], emptied["detail_full"]):
+        # Judged against a baseline within BASELINE_DRIFT of today's (+1 for rounding).
+        assert abs(_typical(log_detail) - _typical(full_detail)) <= (
+            anomalies.BASELINE_DRIFT * _typical(full_detail) + 1
+        )
+
+
+def test_steady_state_refresh_only_rejudges_new_days(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    _sync_like(con, _items(0, DAYS * 288))
+    before = anomalies.load(con)
+
+    last_day = _local_day(START + dt.timedelta(minutes=5 * (DAYS * 288 - 1)))
+    summary = _sync_like(con, _items(DAYS * 288, 1))  # one more 5-minute snapshot
+    assert summary["since"] == last_day
+    assert summary["drifted_series"] == 0
+    assert anomalies.load(con).equals(before)
+    con.close()
+
+
+def test_current_prefers_the_persisted_log(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    items = _items(0, 14 * 288)
+    store.insert_arrow(con, flatten_items(items))
+    store.refresh_rollups(con)  # but no anomaly log yet, like a cache synced before it existed
+    assert anomalies.current(con).equals(anomalies.detect(con))
+    anomalies.refresh(con)
+    con.execute("DELETE FROM anomaly_log WHERE type = 'Collection gap'")
+    assert anomalies.current(con).equals(anomalies.load(con))
+    assert "Collection gap" not in set(anomalies.current(con)["type"])
+    con.close()
+
+
+def test_cache_without_rollups(tmp_path):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    store.insert_arrow(con, flatten_items(_items(0, 14 * 288)))
+    for table in ("garage_snapshots", "hourly_rollup", "daily_rollup", "latest_snapshot"):
+        con.execute(f"DROP TABLE {table}")  # as synced before the rollups existed
+    con.close()
+
+    con = store.connect(read_only=True, db_path=db)
+    found = anomalies.current(con)
+    con.close()
+    assert (_on(found, GAP_DAY)["type"] == "Collection gap").any()
+
+    store.ensure_rollups(db)
+    con = store.connect(read_only=True, db_path=db)
+    assert anomalies.detect(con).equals(found)
+    con.close()
+
+
+def test_empty_cache(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    assert anomalies.detect(con).empty
+    assert anomalies.load(con) is None
+    assert anomalies.refresh(con)["records"] == 0
+    assert anomalies.load(con).empty
+    con.close()
+
+
+def test_registered_detector_joins_the_pass(tmp_path, monkeypatch):
+    shrunk = dt.date(2026, 2, 9)
+
+    def shrink(ts, api):
+        if _local_day(ts) == shrunk:
+            level = api["Zones"][1]["Zones"][2]  # Fourth Avenue > Level 3
+            level["TotalBays"] = level["Zones"][0]["TotalBays"] = 10
+
+    monkeypatch.setattr(anomalies, "DETECTORS", dict(anomalies.DETECTORS))
+    anomalies.register(anomalies.Detector(
+        name="capacity",
+        node_type="level",
+        key=("d.garage", "d.level", "''"),
+        baseline="median(d.max_total)",
+        when="d.min_total < b.baseline",
+        type="'Capacity reduced'",
+        severity="1 - d.min_total / b.baseline",
+        detail="format('{}: {} of {} bays', d.level, d.min_total, trunc(b.baseline)::BIGINT)",
+    ))
+
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    _sync_like(con, make_items(START, 14 * 288, edit=shrink))
+    found = anomalies.detect(con)
+    con.close()
+
+    capacity = found[found["type"] == "Capacity reduced"]
+    assert capacity[["date", "garage", "level", "detail"]].values.tolist() == [
+        [shrunk, "Fourth Avenue", "Level 3", "Level 3: 10 of 40 bays"],
+    ]
+    assert capacity["severity"].tolist() == [0.75]
@@ -0,0 +1,44 @@
+"""Tests for the benchmark harness (a tiny synthetic history, moto for the sync stage)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+
+import pytest
+
+from parking import bench
+
+SHAPE = {"garages": 2, "levels": 2, "zones": 1}
+
+
+def test_history_lengths():
+    assert [bench.history_days(v) for v in ["30", "30d", "2w", "1m", "5y"]] == [30, 30, 14, 30, 1825]
+    for bad in ["0d", "3x", "y"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            bench.history_days(bad)
+
+
+def test_report_times_every_stage_and_dashboard_query(tmp_path):
+    result = bench.report([1], tmp_path, shape=SHAPE, repeat=1, sync_days=0.1)
+    json.dumps(result)  # the report is plain JSON
+    run = result["runs"]["1d"]
+    assert run["snapshots"] == 288 and run["rows"] == 288 * (1 + 2 + 4 + 4)
+    timings = run["timings"]
+    assert {
+        "generate", "decode", "flatten", "insert", "collapse", "rollups", "anomalies.refresh",
+        "anomalies.detect",
+    } <= set(timings)
+    for name in ["latest", "levels", "calendar", "daily_peaks", "trend@28d", "heatmap@all", "net_flow@28d"]:
+        assert f"query.{name}" in timings
+    if bench.moto is not None:
+        assert timings["sync"] > 0 and "sync.fetch" in timings
+    assert all(v >= 0 for v in timings.values())
+
+
+def test_compare_lines_up_matching_timings():
+    before = {"runs": {"30d": {"timings": {"insert": 2.0, "query.latest": 0.01, "gone": 1.0}}}}
+    after = {"runs": {"30d": {"timings": {"insert": 1.0, "query.latest": 0.02}}, "1y": {"timings": {}}}}
+    diff = bench.compare(before, after).set_index("timing")
+    assert list(diff.index) == ["insert", "query.latest"]
+    assert diff["ratio"].round(3).tolist() == [0.5, 2.0]
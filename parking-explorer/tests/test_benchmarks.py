@@ -0,0 +1,235 @@
+"""Micro-benchmarks over synthetic data (opt-in: ``PARKING_BENCH=1``).
+
+They print timings and assert only coarse relative bounds, so they're useful
+for spotting regressions locally without making the normal suite flaky::
+
+    PARKING_BENCH=1 poetry run pytest tests/test_benchmarks.py -s
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+import time
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import pytest
+
+from parking import anomalies, store
+from parking.config import LOCAL_TZ
+from parking.flatten import (
+    COLUMNS,
+    flatten_page,
+    flatten_response,
+    parse_timestamp,
+    parse_timestamps,
+)
+from parking.synthetic import decode_items, flatten_items, make_items
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("PARKING_BENCH"), reason="benchmarks are opt-in; set PARKING_BENCH=1"
+)
+
+START = dt.datetime(2026, 1, 5, 12, 0)
+
+
+def _best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+@pytest.fixture(scope="module")
+def page():
+    """One scan page's worth of decoded snapshots (~1 MB of items)."""
+    items = make_items(START, 300, garages=3, levels=6, zones=3)
+    return decode_items(items)
+
+
+def test_columnar_flatten_vs_dict_path(page, tmp_path):
+    def dict_path(con):
+        rows = [r for ts, api in page for r in flatten_response(api, ts)]
+        store.insert_rows(con, rows)
+
+    def arrow_path(con):
+        store.insert_arrow(con, flatten_page(page))
+
+    timings = {}
+    for label, fn in [("dict", dict_path), ("arrow", arrow_path)]:
+        def run(fn=fn, label=label):
+            con = store.connect(db_path=tmp_path / f"{label}-{time.perf_counter_ns()}.duckdb")
+            try:
+                store.init_schema(con)
+                fn(con)
+            finally:
+                con.close()
+
+        timings[label] = _best_of(run)
+
+    n = flatten_page(page).num_rows
+    print(
+        f"\nflatten+insert {n:,} rows: dict {timings['dict'] * 1e3:.0f} ms, "
+        f"arrow {timings['arrow'] * 1e3:.0f} ms ({timings['dict'] / timings['arrow']:.1f}x)"
+    )
+    assert timings["arrow"] < timings["dict"]
+
+
+def test_columnar_flatten_only(page):
+    dict_s = _best_of(lambda: pd.DataFrame(
+        [r for ts, api in page for r in flatten_response(api, ts)], columns=COLUMNS
+    ))
+    arrow_s = _best_of(lambda: flatten_page(page))
+    print(f"\nflatten only: dict->DataFrame {dict_s * 1e3:.0f} ms, arrow {arrow_s * 1e3:.0f} ms")
+    assert arrow_s < dict_s
+
+
+def test_vectorized_timestamps(page):
+    raws = [ts for ts, _ in page] * 20
+    local_tz = ZoneInfo(LOCAL_TZ)
+
+    def per_item():
+        for raw in raws:
+            aware = parse_timestamp(raw)
+            aware.replace(tzinfo=None), aware.astimezone(local_tz).replace(tzinfo=None)
+
+    scalar_s = _best_of(per_item)
+    vector_s = _best_of(lambda: parse_timestamps(raws))
+    print(f"\n{len(raws):,} timestamps: per-item {scalar_s * 1e3:.1f} ms, vectorized {vector_s * 1e3:.1f} ms")
+    assert vector_s < scalar_s
+
+
+def test_insert_latency_flat_as_table_grows(tmp_path):
+    """Per-page insert cost must not scale with table size (no full-table counts)."""
+    con = store.connect(db_path=tmp_path / "grow.duckdb")
+    try:
+        store.init_schema(con)
+        latencies = []
+        start = START
+        for _ in range(60):
+            items = make_items(start, 100, garages=3, levels=6, zones=3)
+            table = flatten_items(items)
+            t0 = time.perf_counter()
+            assert store.insert_arrow(con, table) == table.num_rows
+            latencies.append(time.perf_counter() - t0)
+            start += 100 * dt.timedelta(minutes=5)
+        rows = store.row_count(con)
+    finally:
+        con.close()
+
+    early = sorted(latencies[2:12])[5]  # medians, skipping warm-up pages
+    late = sorted(latencies[-10:])[5]
+    print(f"\nper-page insert at {rows:,} rows: early {early * 1e3:.1f} ms, late {late * 1e3:.1f} ms")
+    assert late < 3 * early
+
+
+def _fill_daily_rollup(con, years: int, garages: int, levels: int) -> None:
+    """Synthetic day-level history straight into ``daily_rollup`` (~5% incidents)."""
+    con.execute(
+        """
+        INSERT INTO daily_rollup (day, node_type, garage, level, path, snaps, max_occupied,
+                                  sd_occupied, max_pct)
+        WITH days AS (
+            SELECT (DATE '2021-01-01' + INTERVAL (i) DAY)::DATE AS day
+            FROM range(?) r(i)
+        ),
+        g AS (SELECT 'Garage ' || i AS garage FROM range(?) r(i)),
+        l AS (SELECT 'Level ' || i AS level FROM range(?) r(i))
+        SELECT day, 'system', NULL, NULL, 'root',
+               CASE WHEN random() < 0.03 THEN 100 ELSE 288 END, NULL, NULL, NULL
+        FROM days
+        UNION ALL
+        SELECT day, 'garage', garage, NULL, garage, 288, NULL, NULL,
+               CASE WHEN random() < 0.05 THEN 10 + 10 * random() ELSE 60 + 30 * random() END
+        FROM days, g
+        UNION ALL
+        SELECT day, 'level', garage, level, garage || ' > ' || level, 288,
+               CASE WHEN random() < 0.05 THEN (random() * 4)::INTEGER ELSE 30 + (random() * 10)::INTEGER END,
+               CASE WHEN random() < 0.02 THEN 0 ELSE 2 + random() END, NULL
+        FROM days, g, l
+        """,
+        [years * 365, garages, levels],
+    )
+
+
+def _row_loop_detect(con) -> pd.DataFrame:
+    """Reference: the detectors as they were before vectorizing — raw columns from
+    SQL, then one Python dict per anomaly built with ``iterrows``."""
+    with anomalies._series_days(con):
+        base = anomalies._baselines(con)
+    expected = int(base.loc[base["detector"] == "gap", "baseline"].iloc[0])
+    min_full = int(anomalies.MIN_FULL_SNAPS_RATIO * expected)
+    con.register("base", base)
+    records = []
+    counts = con.execute(
+        "SELECT day, snaps FROM daily_rollup WHERE node_type = 'system' ORDER BY day"
+    ).df()
+    first_day, last_day = counts["day"].min(), counts["day"].max()
+    for _, r in counts.iterrows():
+        if r["day"] in (first_day, last_day) or r["snaps"] >= anomalies.GAP_RATIO * expected:
+            continue
+        records.append({
+            "date": r["day"], "garage": "All", "level": "", "type": "Collection gap",
+            "severity": round(1 - r["snaps"] / expected, 2),
+            "detail": f"{int(r['snaps'])}/{expected} snapshots logged",
+        })
+    sup = con.execute(
+        "SELECT d.garage, d.day, d.max_pct AS peak, b.baseline AS typ_peak "
+        "FROM daily_rollup d JOIN base b ON b.detector = 'peak' AND b.garage = d.garage "
+        "AND b.dow = dayname(d.day) WHERE d.node_type = 'garage' AND d.snaps >= ? "
+        "AND b.baseline >= ? AND d.max_pct < ? * b.baseline",
+        [min_full, anomalies.MIN_TYP_PEAK, anomalies.PEAK_RATIO],
+    ).df()
+    for _, r in sup.iterrows():
+        records.append({
+            "date": r["day"], "garage": r["garage"], "level": "", "type": "Suppressed activity",
+            "severity": round(1 - r["peak"] / r["typ_peak"], 2),
+            "detail": f"peak {r['peak']:.0f}% vs typical {r['typ_peak']:.0f}% for this weekday",
+        })
+    lvl = con.execute(
+        "SELECT d.garage, d.level, d.day, d.max_occupied AS day_max, d.sd_occupied AS day_sd, "
+        "b.baseline AS typ_max, b.spread AS typ_sd FROM daily_rollup d JOIN base b "
+        "ON b.detector = 'level' AND b.garage = d.garage AND b.level = d.level "
+        "WHERE d.node_type = 'level' AND d.snaps >= ? AND b.baseline > ? AND (d.max_occupied = 0 "
+        "OR (d.sd_occupied = 0 AND b.spread > 1) OR d.max_occupied < ? * b.baseline)",
+        [min_full, anomalies.MIN_TYP_LEVEL_MAX, anomalies.LEVEL_REDUCED_RATIO],
+    ).df()
+    for _, r in lvl.iterrows():
+        if r["day_max"] == 0:
+            mode, severity = "emptied", 1.0
+        elif r["day_sd"] == 0 and r["typ_sd"] > 1:
+            mode, severity = "frozen sensor", 0.8
+        else:
+            mode, severity = "far below normal", round(1 - r["day_max"] / r["typ_max"], 2)
+        records.append({
+            "date": r["day"], "garage": r["garage"], "level": r["level"], "type": f"Level {mode}",
+            "severity": severity,
+            "detail": f"{r['level']}: peak {int(r['day_max'])} cars vs typical {int(r['typ_max'])}",
+        })
+    con.unregister("base")
+    return anomalies._to_frame(pd.DataFrame.from_records(records))
+
+
+def test_vectorized_anomaly_records(tmp_path):
+    con = store.connect(db_path=tmp_path / "anoms.duckdb")
+    try:
+        store.init_schema(con)
+        _fill_daily_rollup(con, years=5, garages=20, levels=8)
+        vector_s = _best_of(lambda: anomalies.detect(con))
+        loop_s = _best_of(lambda: _row_loop_detect(con))
+        found = anomalies.detect(con)
+        n = len(found)
+        reference = _row_loop_detect(con)
+    finally:
+        con.close()
+    print(f"\ndetect over 5y x 20 garages x 8 levels -> {n:,} records: "
+          f"vectorized {vector_s * 1e3:.0f} ms, SQL + iterrows {loop_s * 1e3:.0f} ms")
+    assert n > 10_000
+    key = ["date", "garage", "level", "type"]
+    assert found.sort_values(key).reset_index(drop=True).equals(
+        reference.sort_values(key).reset_index(drop=True)
+    )
+    assert vector_s < loop_s
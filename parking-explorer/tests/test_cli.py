@@ -0,0 +1,127 @@
+"""Tests for the headless ``parking`` CLI (temp DB, no AWS)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+
+import pandas as pd
+import pytest
+
+from parking import cli, queries, resultcache, series, store
+from parking.synthetic import flatten_items, make_items
+
+START = dt.datetime(2026, 1, 5)
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("cli") / "t.duckdb"
+    con = store.connect(db_path=path)
+    store.init_schema(con)
+    items = make_items(START, 3 * 24, garages=2, levels=2, zones=1)
+    store.insert_arrow(con, flatten_items(items))
+    store.refresh_rollups(con)
+    store.bump_generation(con)
+    con.close()
+    return path
+
+
+def run(db, capsys, *argv) -> str:
+    assert cli.main(["--db", str(db), *argv]) == 0
+    return capsys.readouterr().out
+
+
+def test_latest_reports_each_garage_with_its_delta(db, capsys):
+    rows = json.loads(run(db, capsys, "latest"))
+    assert sorted(r["garage"] for r in rows) == ["Fourth Avenue", "Second Avenue"]
+    assert {r["request_timestamp"] for r in rows} == {max(r["request_timestamp"] for r in rows)}
+    assert all("available_delta" in r for r in rows)
+
+
+def test_trend_matches_the_app_series(db, capsys, tmp_path):
+    out = tmp_path / "trend.csv"
+    run(db, capsys, "trend", "--start", "2026-01-05", "--end", "2026-01-06", "-f", "csv", "-o", str(out))
+    got = pd.read_csv(out, parse_dates=["bucket"])
+
+    _, sql, params = series.plan(dt.date(2026, 1, 5), dt.date(2026, 1, 7), ["Fourth Avenue", "Second Avenue"])
+    con = store.connect(read_only=True, db_path=db)
+    want = series.reduce(con.execute(sql, params).df())
+    con.close()
+    pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+def test_heatmap_parquet_is_in_week_order(db, capsys, tmp_path):
+    out = tmp_path / "heat.parquet"
+    run(db, capsys, "heatmap", "--garage", "Second Avenue", "-f", "parquet", "-o", str(out))
+    heat = pd.read_parquet(out)
+    week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    order = list(zip(heat["dow"].map(week.index), heat["hr"]))
+    assert order == sorted(order)
+    assert len(set(order)) == len(heat)
+
+
+def test_repeat_runs_read_the_result_cache(db, capsys):
+    cache = resultcache.for_db(db)
+    run(db, capsys, "heatmap")
+    hits = cache.hits
+    first = run(db, capsys, "heatmap")
+    assert cache.hits > hits  # bounds, garages and the heatmap itself
+    assert run(db, capsys, "heatmap") == first
+
+
+def test_cli_shares_the_apps_cache_entries(db, capsys):
+    """Same SQL and params as the app's Patterns tab -> the same cache key."""
+    con = store.connect(read_only=True, db_path=db)
+    version = store.data_version(con)
+    con.close()
+    start, end = dt.date(2026, 1, 5), dt.date(2026, 1, 7)
+    sql, params = queries.heatmap(start, end, ["Fourth Avenue", "Second Avenue"])
+    key = resultcache.cache_key(sql, params, version)
+    run(db, capsys, "heatmap", "--start", "2026-01-05", "--end", "2026-01-06")
+    assert resultcache.for_db(db).get(key) is not None
+
+
+def test_anomalies_filters(db, capsys):
+    everything = json.loads(run(db, capsys, "anomalies", "--full"))
+    later = json.loads(run(db, capsys, "anomalies", "--full", "--since", "2026-01-07"))
+    assert len(later) <= len(everything)
+    assert all(r["date"] >= "2026-01-07" for r in later)
+
+
+def test_export_writes_the_file(db, capsys, tmp_path):
+    out = tmp_path / "levels.csv"
+    assert cli.main(["--db", str(db), "export", "--granularity", "level", "-o", str(out)]) == 0
+    assert "Wrote 288 rows" in capsys.readouterr().err  # 72 snapshots x 2 garages x 2 levels
+    assert len(pd.read_csv(out)) == 288
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda g: queries.heatmap(dt.date(2026, 1, 5), dt.date(2026, 1, 8), g),
+        queries.calendar,
+        lambda g: queries.typical_day(dt.date(2026, 1, 5), dt.date(2026, 1, 8), g),
+        lambda g: queries.typical_day(dt.date(2026, 1, 5), dt.date(2026, 1, 8), g, ["Monday"]),
+        lambda g: queries.net_flow(dt.date(2026, 1, 5), dt.date(2026, 1, 8), g),
+        queries.daily_peaks,
+        lambda g: queries.snapshot_rows(dt.date(2026, 1, 5), dt.date(2026, 1, 8), g),
+        *(
+            lambda g, days=days: series.plan(START, START + dt.timedelta(days=days), g)[1:]
+            for days in (1, 30, 400)
+        ),
+    ],
+)
+def test_builders_accept_no_garages(db, build):
+    con = store.connect(read_only=True, db_path=db)
+    try:
+        some = con.execute(*build(["Second Avenue"])).df()
+        none = con.execute(*build([])).df()
+    finally:
+        con.close()
+    assert none.empty and list(none.columns) == list(some.columns)
+
+
+def test_missing_cache_exits(tmp_path):
+    with pytest.raises(SystemExit, match="No cache"):
+        cli.main(["--db", str(tmp_path / "nope.duckdb"), "latest"])
@@ -0,0 +1,72 @@
+"""Scheduled sync daemon tests (moto DynamoDB, temp DuckDB file)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import threading
+
+import pytest
+
+pytest.importorskip("moto")
+
+from parking import daemon, store, sync as sync_mod  # noqa: E402
+from parking.config import TABLE_NAME  # noqa: E402
+from parking.synthetic import make_items  # noqa: E402
+
+START = dt.datetime(2026, 1, 5, 12, 0)
+
+
+def _put(client, items):
+    for item in items:
+        client.put_item(TableName=TABLE_NAME, Item=item)
+
+
+def test_next_run_is_aligned_to_the_cadence():
+    assert daemon.next_run(0, 300, 60) == 60
+    assert daemon.next_run(60, 300, 60) == 360  # strictly after now
+    assert daemon.next_run(359.5, 300, 60) == 360
+    assert daemon.next_run(1_000_000, 300) % 300 == 0
+
+
+def test_daemon_picks_up_new_snapshots_each_run(table, tmp_path):
+    _put(table, make_items(START, 6))
+    db = tmp_path / "p.duckdb"
+    arriving = [make_items(START + dt.timedelta(minutes=30), 2), []]
+
+    def clock():
+        # Called once per run, after the sync: the collector lands more data
+        # and the next grid point is 10 ms away.
+        _put(table, arriving.pop(0))
+        return 299.99
+
+    assert daemon.run(db, interval=300, offset=0, max_runs=2, clock=clock) == 2
+    con = store.connect(read_only=True, db_path=db)
+    try:
+        version = store.data_version(con)
+    finally:
+        con.close()
+    assert version.generation == 2
+    assert version.last_timestamp == make_items(START + dt.timedelta(minutes=30), 2)[-1][
+        "request_timestamp"
+    ]["S"]
+
+
+def test_second_writer_is_refused(table, tmp_path):
+    db = tmp_path / "p.duckdb"
+    with store.writer_lock(db):
+        with pytest.raises(store.WriterBusy):
+            sync_mod.sync(db_path=db)
+        # The daemon skips a busy run instead of dying.
+        assert daemon.run(db, interval=300, max_runs=1) == 1
+    assert sync_mod.sync(db_path=db)["new_items"] == 0
+
+
+def test_daemon_stops_promptly(table, tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(
+        target=daemon.run, args=(tmp_path / "p.duckdb",), kwargs={"interval": 3600, "stop": stop}
+    )
+    worker.start()
+    stop.set()
+    worker.join(timeout=30)
+    assert not worker.is_alive()
@@ -0,0 +1,81 @@
+"""Tests for the COPY-based export (temp DB, no AWS)."""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import duckdb
+import pytest
+
+from parking import export, store
+from parking.synthetic import flatten_items, make_items
+
+START = dt.datetime(2026, 1, 5, 12)
+RANGE = {"start": dt.date(2026, 1, 5), "end": dt.date(2026, 1, 6)}
+
+
+@pytest.fixture(scope="module")
+def con(tmp_path_factory):
+    db = tmp_path_factory.mktemp("export") / "t.duckdb"
+    c = store.connect(db_path=db)
+    store.init_schema(c)
+    items = make_items(START, 24, garages=2, levels=3, zones=2)
+    store.insert_arrow(c, flatten_items(items))
+    store.refresh_rollups(c)
+    yield c
+    c.close()
+
+
+@pytest.mark.parametrize("granularity, per_snapshot", [("garage", 1), ("level", 3), ("zone", 6)])
+@pytest.mark.parametrize("fmt", export.FORMATS)
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_round_trips(con, tmp_path, granularity, per_snapshot, fmt, compress):
+    path = tmp_path / export.file_name(granularity, fmt, compress)
+    n = export.export(
+        con, path, garages=["Fourth Avenue"], granularity=granularity, fmt=fmt, compress=compress, **RANGE
+    )
+    assert n == 24 * per_snapshot
+
+    reader = "read_csv" if fmt == "csv" else "read_parquet"
+    back = duckdb.connect().execute(f"SELECT * FROM {reader}('{path}')").df()
+    assert len(back) == n
+    assert set(back["garage"]) == {"Fourth Avenue"}
+    assert list(back.columns[:2]) == ["ts_local", "garage"]
+    if granularity == "zone":
+        assert {"level", "zone"} <= set(back.columns)
+    assert back["ts_local"].is_monotonic_increasing
+
+
+def test_garage_export_matches_the_data_tab(con, tmp_path):
+    path = tmp_path / "g.parquet"
+    export.export(con, path, garages=["Second Avenue", "Fourth Avenue"], fmt="parquet", **RANGE)
+    exported = duckdb.connect().execute(f"SELECT * FROM read_parquet('{path}')").fetchall()
+    shown = con.execute(
+        "SELECT ts_local, garage, available_bays, occupied_bays, total_bays, occupancy_pct "
+        "FROM garage_snapshots WHERE ts_local >= ? AND ts_local < ? ORDER BY ts_local, garage",
+        [RANGE["start"], RANGE["end"]],
+    ).fetchall()
+    assert exported == shown
+
+
+def test_export_file_is_self_cleaning(con):
+    fh = export.export_file(con, garages=["Second Avenue"], **RANGE)
+    try:
+        header = fh.readline().decode()
+        assert header.startswith("ts_local,garage,available_bays")
+        assert not export.Path(fh.name).exists()  # already unlinked
+    finally:
+        fh.close()
+
+
+def test_unknown_format_is_rejected(con, tmp_path):
+    with pytest.raises(ValueError):
+        export.export(con, tmp_path / "x", garages=["A"], fmt="xlsx", **RANGE)
+
+
+def test_no_garages_exports_no_rows(con, tmp_path):
+    path = tmp_path / "none.csv"
+    assert export.export(con, path, garages=[], **RANGE) == 0
+    assert path.read_text().splitlines() == [
+        "ts_local,garage,available_bays,occupied_bays,total_bays,occupancy_pct"
+    ]
@@ -3,8 +3,16 @@
 from __future__ import annotations
 
 import datetime as dt
+from zoneinfo import ZoneInfo
 
-from parking.flatten import flatten_response, parse_timestamp
+from parking.config import LOCAL_TZ
+from parking.flatten import (
+    COLUMNS,
+    flatten_page,
+    flatten_response,
+    parse_timestamp,
+    parse_timestamps,
+)
 
 SAMPLE = {
     "Name": "City of Franklin",
@@ -82,3 +90,40 @@ def test_paths_are_unique_within_snapshot():
     rows = _rows()
     paths = [r["path"] for r in rows]
     assert len(paths) == len(set(paths))
+
+
+def test_flatten_page_matches_per_snapshot_rows():
+    snaps = [("2026-04-17T01:45:36.669559", SAMPLE), ("2026-04-17T01:50:36.123456Z", SAMPLE)]
+    expected = [r for ts, api in snaps for r in flatten_response(api, ts)]
+    got = flatten_page(snaps).to_pylist()
+    assert len(got) == len(expected)
+    for g, e in zip(got, expected):
+        assert g.keys() == e.keys()
+        for k in e:
+            if k == "occupancy_pct" and e[k] is not None:
+                assert abs(g[k] - e[k]) < 1e-9
+            else:
+                assert g[k] == e[k], k
+
+
+def test_flatten_page_empty():
+    table = flatten_page([])
+    assert table.num_rows == 0
+    assert table.column_names == COLUMNS
+
+
+def test_parse_timestamps_matches_scalar_across_dst():
+    raws = [
+        "2025-11-02T06:30:00",  # 01:30 CDT, before fall-back
+        "2025-11-02T07:30:00",  # 01:30 CST, after fall-back (same wall clock)
+        "2026-03-08T07:59:59.5Z",  # 01:59:59.5 CST, just before spring-forward
+        "2026-03-08T08:00:00+00:00",  # 03:00 CDT
+        " 2026-04-17T01:45:36.669559 ",
+        "2026-04-16T20:45:36.669559-05:00",
+    ]
+    utc, local = parse_timestamps(raws)
+    for raw, u, loc in zip(raws, utc.to_pylist(), local.to_pylist()):
+        aware = parse_timestamp(raw)
+        assert u == aware.replace(tzinfo=None)
+        assert loc == aware.astimezone(ZoneInfo(LOCAL_TZ)).replace(tzinfo=None)
+    assert local[0].as_py().hour == local[1].as_py().hour == 1
@@ -0,0 +1,85 @@
+"""Tests for the on-disk query result cache (temp dirs, no AWS)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+
+import pandas as pd
+
+from parking import anomalies, store
+from parking.resultcache import ResultCache, cache_key
+
+VERSION = store.DataVersion(3, 100, "2026-01-05T12:00:00")
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "date": [dt.date(2026, 1, 5), dt.date(2026, 1, 6)],
+            "ts": pd.to_datetime(["2026-01-05 08:00", "2026-01-06 09:30"]),
+            "garage": ["Second Avenue", None],
+            "occupied": [12, 40],
+            "pct": [30.5, float("nan")],
+        }
+    )
+
+
+def test_key_normalizes_sql_and_tags_param_types():
+    sql = "SELECT *\n  FROM garage_snapshots WHERE ts_local >= ?"
+    assert cache_key(sql, (1,), VERSION) == cache_key(" ".join(sql.split()), (1,), VERSION)
+    assert cache_key(sql, (dt.date(2026, 1, 1),), VERSION) != cache_key(sql, ("2026-01-01",), VERSION)
+    assert cache_key(sql, (1,), VERSION) != cache_key(sql, (1,), VERSION._replace(generation=4))
+
+
+def test_round_trip_and_hit_counting(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=10 * 1024 * 1024)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return _frame()
+
+    first = cache.get_or_compute("SELECT 1", (), VERSION, compute)
+    # A fresh instance (a restarted process) reads the same blob back.
+    second = ResultCache(tmp_path, max_bytes=10 * 1024 * 1024).get_or_compute(
+        "SELECT 1", (), VERSION, compute
+    )
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second, check_dtype=False)
+    assert second["date"].tolist() == [dt.date(2026, 1, 5), dt.date(2026, 1, 6)]
+
+
+def test_anomalies_frame_round_trips(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    empty = anomalies.detect(con)
+    con.close()
+    cache = ResultCache(tmp_path / "results", max_bytes=1024 * 1024)
+    cache.get_or_compute("-- anomalies", (), VERSION, lambda: empty)
+    back = cache.get_or_compute("-- anomalies", (), VERSION, lambda: 1 / 0)  # a hit
+    assert list(back.columns) == list(empty.columns) and back.empty
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=10 * 1024 * 1024)  # measure one blob first
+    cache.put("probe", _frame())
+    size = (tmp_path / "probe.parquet").stat().st_size
+    cache.clear()
+
+    cache.max_bytes = int(2.5 * size)
+    for i, key in enumerate(["a", "b"]):
+        cache.put(key, _frame())
+        os.utime(tmp_path / f"{key}.parquet", ns=(i * 10**9, i * 10**9))
+    assert cache.get("a") is not None  # touch "a": now "b" is least recent
+    cache.put("c", _frame())
+    assert sorted(p.stem for p in tmp_path.glob("*.parquet")) == ["a", "c"]
+
+
+def test_disabled_cache_always_computes(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=0)
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute("SELECT 1", (), VERSION, lambda: calls.append(1) or _frame())
+    assert len(calls) == 2
+    assert not list(tmp_path.glob("*.parquet"))
@@ -0,0 +1,108 @@
+"""Tests for the downsampled trend series (temp DB, no AWS)."""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from parking import series, store
+from parking.synthetic import flatten_items, make_items
+
+START = dt.datetime(2026, 1, 5, 6)  # midnight local
+
+
+@pytest.fixture(scope="module")
+def con(tmp_path_factory):
+    db = tmp_path_factory.mktemp("series") / "t.duckdb"
+    c = store.connect(db_path=db)
+    store.init_schema(c)
+    items = make_items(START, 21 * 288, garages=2, levels=2)
+    store.insert_arrow(c, flatten_items(items))
+    store.refresh_rollups(c)
+    yield c
+    c.close()
+
+
+@pytest.mark.parametrize(
+    "days, tier",
+    [(1, "5min"), (14, "5min"), (60, "hour"), (365, "day"), (5 * 365, "day"), (30 * 365, "week")],
+)
+def test_tier_follows_the_range(days, tier):
+    start = dt.date(2026, 1, 1)
+    assert series.choose_tier(start, start + dt.timedelta(days=days), series.max_points()).name == tier
+
+
+def test_narrow_charts_switch_tiers_sooner():
+    start = dt.date(2026, 1, 1)
+    assert series.plan(start, start + dt.timedelta(days=14), ["A"], width_px=300)[0].name == "hour"
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500)
+    y[6_543] = 50.0
+    keep = series.lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 6_543 in keep
+    assert list(series.lttb(x[:50], y[:50], 200)) == list(range(50))  # nothing to drop
+
+
+@pytest.mark.parametrize("tier", series.TIERS, ids=lambda t: t.name)
+def test_every_tier_agrees_with_the_raw_snapshots(con, tier):
+    start, end = dt.date(2026, 1, 5), dt.date(2026, 1, 26)
+    sql = tier.sql.format(garages="(?, ?)")
+    df = con.execute(sql, [start, end, "Second Avenue", "Fourth Avenue"]).df()
+    assert list(df.columns) == series.COLUMNS
+    raw = con.execute(
+        "SELECT garage, min(occupancy_pct), avg(occupancy_pct), max(occupancy_pct) "
+        "FROM garage_snapshots WHERE ts_local >= ? AND ts_local < ? GROUP BY 1 ORDER BY 1",
+        [start, end],
+    ).fetchall()
+    for garage, lo, mean, hi in raw:
+        g = df[df["garage"] == garage]
+        assert g["occ_min"].min() == pytest.approx(lo)
+        assert g["occ_max"].max() == pytest.approx(hi)
+        if tier.name in ("5min", "hour", "day"):  # equal-size buckets
+            assert g["occ_avg"].mean() == pytest.approx(mean)
+
+
+def test_reduce_bounds_points_and_keeps_the_envelope(con):
+    start, end = dt.date(2026, 1, 5), dt.date(2026, 1, 26)
+    sql = series.TIERS[0].sql.format(garages="(?, ?)")
+    full = con.execute(sql, [start, end, "Second Avenue", "Fourth Avenue"]).df()
+    assert len(full) == 2 * 21 * 288
+
+    slim = series.reduce(full, width_px=400)
+    assert slim.groupby("garage").size().tolist() == [400, 400]
+    for garage, g in full.groupby("garage"):
+        s = slim[slim["garage"] == garage]
+        assert s["bucket"].is_monotonic_increasing
+        assert s["bucket"].iloc[[0, -1]].tolist() == g["bucket"].iloc[[0, -1]].tolist()
+        assert s["occ_min"].min() == g["occ_min"].min()
+        assert s["occ_max"].max() == g["occ_max"].max()
+    assert series.reduce(full.head(10)).equals(full.head(10))
+    assert series.reduce(full.iloc[:0]).empty
+
+
+def test_old_rollups_gain_band_columns_on_upgrade(tmp_path):
+    db = tmp_path / "old.duckdb"
+    c = store.connect(db_path=db)
+    store.init_schema(c)
+    items = make_items(START, 30)
+    store.insert_arrow(c, flatten_items(items))
+    store.refresh_rollups(c)
+    c.execute("ALTER TABLE hourly_rollup DROP COLUMN min_pct")  # as shipped before
+    c.execute("ALTER TABLE daily_rollup DROP COLUMN min_pct")
+    assert not store.rollups_ready(c)
+    c.close()
+
+    store.ensure_rollups(db)
+    c = store.connect(read_only=True, db_path=db)
+    assert store.rollups_ready(c)
+    assert c.execute("SELECT count(*) FROM daily_rollup WHERE min_pct IS NULL").fetchone()[0] == 0
+    c.close()
@@ -0,0 +1,222 @@
+"""Tests for the local query service and its client (temp DB, no AWS)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from parking import export, queries, resultcache, service, store
+from parking.synthetic import flatten_items, make_items
+
+START = dt.datetime(2026, 1, 5)
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("service") / "t.duckdb"
+    con = store.connect(db_path=path)
+    store.init_schema(con)
+    items = make_items(START, 2 * 24, garages=2, levels=2, zones=1)
+    store.insert_arrow(con, flatten_items(items))
+    store.refresh_rollups(con)
+    store.bump_generation(con)
+    con.close()
+    return path
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def served(db, request, tmp_path):
+    """(service, client) for a server running on a background thread."""
+    svc = service.QueryService(db, memory_mb=16)
+    if request.param == "unix":
+        sock = tmp_path / "q.sock"
+        server = service.make_server(svc, socket_path=sock)
+        address = f"unix:{sock}"
+    else:
+        server = service.make_server(svc, port=0)
+        address = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield svc, service.Client(address, timeout=30)
+    finally:
+        server.shutdown()
+        server.server_close()
+        svc.pool.close()
+
+
+def test_params_round_trip_with_their_types():
+    params = (
+        dt.date(2026, 1, 5), dt.datetime(2026, 1, 5, 6, 30), pd.Timestamp("2026-01-05 07:00"),
+        np.int64(3), 1.5, "Second Avenue", None,
+    )
+    wire = json.loads(json.dumps(service.encode_params(params)))
+    decoded = service.decode_params(wire)
+    assert decoded == (*params[:3], 3, 1.5, "Second Avenue", None)
+    assert [type(p) for p in decoded[:3]] == [dt.date, dt.datetime, pd.Timestamp]
+    # Same result-cache key as the app computes for the original params.
+    version = store.DataVersion(1, 2, "x")
+    assert resultcache.cache_key("SELECT 1", decoded[:3], version) == resultcache.cache_key(
+        "SELECT 1", params[:3], version
+    )
+
+
+def test_queries_match_a_direct_read(served, db):
+    svc, client = served
+    con = store.connect(read_only=True, db_path=db)
+    try:
+        assert client.version() == store.data_version(con)
+        sql, params = queries.heatmap(dt.date(2026, 1, 5), dt.date(2026, 1, 7), ["Second Avenue"])
+        want = con.execute(sql, params).df()
+    finally:
+        con.close()
+    pd.testing.assert_frame_equal(client.query(sql, params), want)
+    assert client.query(queries.GARAGES_SQL)["garage"].tolist() == ["Fourth Avenue", "Second Avenue"]
+    svc.pool.execute("SELECT 1")  # the results above may all have come from the disk cache
+    assert list(client.timings().columns) == ["sql", "open_ms", "execute_ms", "reopened"]
+
+
+def test_repeat_queries_are_served_from_memory(served):
+    svc, client = served
+    sql, params = queries.LEVELS_SQL, ("Second Avenue",)
+    first = client.query(sql, params)
+    misses, hits = svc.results.misses, svc.results.hits
+    for _ in range(3):
+        pd.testing.assert_frame_equal(client.query(sql, params), first)
+    assert (svc.results.misses, svc.results.hits) == (misses, hits)  # never reached the disk cache
+
+
+def test_anomalies_endpoint(served):
+    _, client = served
+    found = client.anomalies()
+    assert {"date", "garage", "type"} <= set(found.columns)
+
+
+def test_export_endpoint_streams_the_file(served, db):
+    svc, client = served
+    options = dict(
+        start=dt.date(2026, 1, 4), end=dt.date(2026, 1, 6), garages=["Second Avenue"],
+        granularity="level", fmt="parquet",
+    )
+    # Before the service opens the file: its connections share one sandboxed instance.
+    con = store.connect(read_only=True, db_path=db)
+    try:
+        with export.export_file(con, **options) as fh:
+            want = pd.read_parquet(fh)
+    finally:
+        con.close()
+    with client.export_file(**options) as fh:
+        got = pd.read_parquet(fh)
+    pd.testing.assert_frame_equal(got, want)
+    assert len(got) and list(svc.export_dir.iterdir()) == []  # unlinked once sent
+    with pytest.raises(service.ServiceError, match="ValueError: unknown export format"):
+        client.export_file(**{**options, "fmt": "xlsx"})
+
+
+def test_errors_are_raised_on_the_client(served):
+    _, client = served
+    with pytest.raises(service.ServiceError, match="CatalogException"):
+        client.query("SELECT * FROM no_such_table")
+    with pytest.raises(service.ServiceError, match="LookupError"):
+        client._request("GET", "/nope")
+    assert client.query("SELECT 42 AS n")["n"].tolist() == [42]  # the connection is still usable
+
+
+def test_only_a_single_select_is_run(served, tmp_path):
+    _, client = served
+    target = tmp_path / "out.csv"
+    for sql in (
+        f"COPY (SELECT 1) TO '{target}'",
+        "SELECT 1; SELECT 2",
+        "CREATE TEMP TABLE t AS SELECT 1",
+    ):
+        with pytest.raises(service.ServiceError, match="ValueError: only a single SELECT"):
+            client.query(sql)
+    assert not target.exists()
+    assert client.query("WITH x AS (SELECT 7 AS n) SELECT n FROM x")["n"].tolist() == [7]
+
+
+def test_queries_cannot_read_other_files(served, tmp_path):
+    _, client = served
+    secret = tmp_path / "secret.csv"
+    secret.write_text("a\n1\n")
+    with pytest.raises(service.ServiceError, match="PermissionException"):
+        client.query(f"SELECT * FROM read_csv('{secret}')")
+
+
+def test_non_json_posts_are_refused(served):
+    _, client = served
+    con = client._connect()
+    try:
+        # What a cross-origin form or fetch() without a preflight can send.
+        con.request("POST", "/query", json.dumps({"sql": "SELECT 1"}), {"Content-Type": "text/plain"})
+        resp = con.getresponse()
+        assert resp.status == 415
+        assert json.loads(resp.read())["type"] == "ValueError"
+        # The unread body isn't taken for a second request: the server hangs up.
+        assert con.sock.recv(1) == b""
+    finally:
+        con.close()
+
+
+def test_client_disconnects_are_not_printed(tmp_path, capsys):
+    server = service.make_server(service.QueryService(tmp_path / "t.duckdb"), port=0)
+    try:
+        try:
+            raise BrokenPipeError
+        except BrokenPipeError:
+            server.handle_error(None, ("127.0.0.1", 1))
+    finally:
+        server.server_close()
+    assert capsys.readouterr().err == ""
+
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_main_leaves_the_file_to_the_sandboxed_pool(tmp_path, monkeypatch, legacy):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    store.insert_arrow(con, flatten_items(make_items(START, 12)))
+    if not legacy:
+        store.refresh_rollups(con)
+    con.close()
+    seen = {}
+
+    class Server:  # stands in for the HTTP server: checks the file, then stops
+        server_address = ("127.0.0.1", 0)
+
+        def serve_forever(self):
+            seen["pooled"] = store.pool(db)._con is not None
+            with seen["svc"].pool.cursor() as cur:
+                seen["ready"] = store.rollups_ready(cur)
+                seen["sandboxed"] = not cur.execute("SELECT current_setting('enable_external_access')").fetchone()[0]
+            raise KeyboardInterrupt
+
+        def server_close(self):
+            seen["svc"].pool.close()
+
+    monkeypatch.setattr(service, "make_server", lambda svc, **kw: seen.update(svc=svc) or Server())
+    assert service.main(["--db", str(db)]) == 0
+    assert seen == {"svc": seen["svc"], "pooled": False, "ready": True, "sandboxed": True}
+
+
+def test_archived_months_stay_readable(tmp_path):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    items = make_items(dt.datetime(2025, 11, 20), 12) + make_items(dt.datetime(2026, 1, 5), 12)
+    store.insert_arrow(con, flatten_items(items))
+    assert store.archive_closed_months(con, hot_months=1) > 0
+    total = con.execute("SELECT count(*) FROM parking").fetchone()[0]
+    con.close()
+    svc = service.QueryService(db, memory_mb=16)
+    try:
+        body, _ = svc.query("SELECT count(*) AS n FROM parking")
+        assert service.from_ipc(body)["n"].tolist() == [total]
+    finally:
+        svc.pool.close()
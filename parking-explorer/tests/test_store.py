@@ -3,9 +3,18 @@
 from __future__ import annotations
 
 import datetime as dt
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
 
-from parking import store
-from parking.flatten import COLUMNS
+import duckdb
+import pytest
+
+from parking import anomalies, queries, store
+from parking.flatten import COLUMNS, flatten_page, flatten_response
+from parking.synthetic import decode_items, flatten_items, make_items
 
 
 def _row(ts: dt.datetime, rt: str) -> dict:
@@ -48,3 +57,586 @@ def test_insert_is_idempotent(tmp_path):
     assert store.insert_rows(con, rows) == 0  # same key -> ignored
     assert store.row_count(con) == 1
     con.close()
+
+
+def test_insert_arrow_is_idempotent(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    table = flatten_page([("2026-01-01T18:00:00", {"Name": "City", "TotalBays": 4, "OccupiedBays": 1})])
+    assert store.insert_arrow(con, table) == 1
+    assert store.insert_arrow(con, table) == 0
+    assert store.insert_arrow(con, table.slice(0, 0)) == 0
+    assert con.execute("SELECT path, available_bays, occupancy_pct FROM parking").fetchall() == [
+        ("City", 3, 25.0)
+    ]
+    con.close()
+
+
+def _load(con, start: dt.datetime, count: int) -> None:
+    items = make_items(start, count, garages=2, levels=3)
+    store.insert_arrow(con, flatten_items(items))
+
+
+def _rollup_contents(con) -> dict:
+    # Float aggregates are rounded: summation order differs between rebuilds.
+    return {
+        table: [
+            tuple(round(v, 9) if isinstance(v, float) else v for v in row)
+            for row in con.execute(f"SELECT * FROM {table} ORDER BY ALL").fetchall()
+        ]
+        for table in ("garage_snapshots", "hourly_rollup", "daily_rollup", "latest_snapshot")
+    }
+
+
+def test_incremental_rollups_match_full_rebuild(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    start = dt.datetime(2026, 1, 5, 22, 10)  # batches straddle hour and day boundaries
+    _load(con, start, 20)
+    store.refresh_rollups(con)
+    for batch in range(3):
+        last = store.get_last_timestamp(con)
+        _load(con, start + dt.timedelta(minutes=5 * (20 + 7 * batch)), 7)
+        store.refresh_rollups(con, last)
+    store.refresh_rollups(con, store.get_last_timestamp(con))  # nothing new -> no-op
+    incremental = _rollup_contents(con)
+
+    store.refresh_rollups(con)
+    assert incremental == _rollup_contents(con)
+    assert len(incremental["daily_rollup"]) > 0
+    con.close()
+
+
+def test_latest_snapshot_tracks_the_two_newest(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    start = dt.datetime(2026, 1, 5, 12)
+    _load(con, start, 10)
+    store.refresh_rollups(con)
+    for batch in range(2):
+        last = store.get_last_timestamp(con)
+        _load(con, start + dt.timedelta(minutes=5 * (10 + batch)), 1)
+        store.refresh_rollups(con, last)
+
+        newest = con.execute(
+            """
+            SELECT DISTINCT request_timestamp FROM parking
+            ORDER BY request_timestamp DESC LIMIT 2
+            """
+        ).fetchall()
+        expected = con.execute(
+            f"SELECT (request_timestamp <> ?)::SMALLINT, * FROM parking "
+            f"WHERE request_timestamp IN (?, ?) ORDER BY ALL",
+            [newest[0][0], newest[0][0], newest[1][0]],
+        ).fetchall()
+        assert con.execute("SELECT * FROM latest_snapshot ORDER BY ALL").fetchall() == expected
+        assert con.execute(
+            "SELECT DISTINCT request_timestamp FROM latest_snapshot WHERE recency = 0"
+        ).fetchall() == [(store.get_last_timestamp(con),)]
+    con.close()
+
+
+def test_rollups_agree_with_raw_table(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    _load(con, dt.datetime(2026, 1, 5, 12), 50)
+    store.refresh_rollups(con)
+
+    raw = con.execute(
+        "SELECT dayname(ts_local), hour(ts_local), sum(occupied_bays) / sum(total_bays) "
+        "FROM parking WHERE node_type='garage' GROUP BY 1, 2 ORDER BY 1, 2"
+    ).fetchall()
+    rolled = con.execute(
+        "SELECT dayname(hour), hour(hour), sum(sum_occupied) / sum(sum_total) "
+        "FROM hourly_rollup WHERE node_type='garage' GROUP BY 1, 2 ORDER BY 1, 2"
+    ).fetchall()
+    assert raw == rolled
+
+    snaps = con.execute(
+        "SELECT snaps FROM daily_rollup WHERE node_type='system'"
+    ).fetchall()
+    assert sum(s for (s,) in snaps) == 50
+    assert con.execute("SELECT count(*) FROM garage_snapshots").fetchone()[0] == 100
+    con.close()
+
+
+def test_pattern_queries_read_the_rollups(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    _load(con, dt.datetime(2026, 1, 5, 12), 12 * 48)  # two days of whole hours
+    store.refresh_rollups(con)
+    garages = [g for (g,) in con.execute(queries.GARAGES_SQL).fetchall()]
+    start, end = dt.date(2026, 1, 1), dt.date(2026, 2, 1)
+
+    # Per-snapshot deltas sum to each hour's closing minus the previous close.
+    raw = con.execute(
+        """
+        WITH snap AS (
+            SELECT ts_local, sum(occupied_bays) AS occ FROM garage_snapshots GROUP BY ts_local
+        ),
+        deltas AS (SELECT ts_local, occ - lag(occ) OVER (ORDER BY ts_local) AS delta FROM snap)
+        SELECT hour(ts_local), avg(delta) * 12 FROM deltas
+        WHERE ts_local >= (SELECT date_trunc('hour', min(ts_local)) + INTERVAL 1 HOUR FROM snap)
+        GROUP BY 1 ORDER BY 1
+        """
+    ).fetchall()
+    flow = con.execute(*queries.net_flow(start, end, garages)).fetchall()
+    assert [h for h, _ in flow] == [h for h, _ in raw]
+    assert [v for _, v in flow] == pytest.approx([v for _, v in raw])
+
+    cal = con.execute(*queries.calendar(garages)).df()
+    assert (cal["peak"] >= cal["avg_occ"]).all()
+    typical = con.execute(*queries.typical_day(start, end, garages)).df()
+    assert ((typical["lo"] <= typical["med"]) & (typical["med"] <= typical["hi"])).all()
+    con.close()
+
+
+def test_prune_and_legacy_cache_rollups(tmp_path):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    _load(con, dt.datetime(2026, 1, 5, 12), 300)  # spans Jan 5-6
+    assert not store.rollups_ready(con)  # data but no rollups, like a pre-rollup cache
+    con.close()
+
+    store.ensure_rollups(db_path=db)
+    con = store.connect(db_path=db)
+    assert store.rollups_ready(con)
+    store.prune_before(con, dt.date(2026, 1, 6))
+    assert con.execute("SELECT min(day) FROM daily_rollup").fetchone()[0] == dt.date(2026, 1, 6)
+    assert con.execute("SELECT min(hour) FROM hourly_rollup").fetchone()[0] >= dt.datetime(2026, 1, 6)
+    con.close()
+
+
+def _parking(con) -> list:
+    return con.execute("SELECT * FROM parking ORDER BY request_timestamp, path").fetchall()
+
+
+def test_archive_closed_months_keeps_parking_view_whole(tmp_path):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    for day in (dt.datetime(2025, 10, 14), dt.datetime(2025, 11, 3), dt.datetime(2025, 11, 30, 23),
+                dt.datetime(2025, 12, 9)):
+        _load(con, day, 12)
+    store.refresh_rollups(con)
+    before = _parking(con)
+    anoms_before = anomalies.detect(con)
+
+    moved = store.archive_closed_months(con, hot_months=1)
+    assert moved == con.execute("SELECT count(*) FROM parking").fetchone()[0] - con.execute(
+        "SELECT count(*) FROM parking_hot"
+    ).fetchone()[0]
+    assert moved > 0
+    assert con.execute("SELECT min(ts_local) FROM parking_hot").fetchone()[0] >= dt.datetime(2025, 12, 1)
+    root = tmp_path / "t_archive"
+    assert (root / "month=2025-10" / "node_type=garage").is_dir()
+    assert not (root / "month=2025-12").exists()
+
+    assert _parking(con) == before
+    assert anomalies.detect(con).equals(anoms_before)
+    assert store.archive_closed_months(con, hot_months=1) == 0  # nothing left to move
+    con.close()
+
+    # Read-only readers (the app) see the archive through the view, and a full
+    # rollup rebuild over hot + cold matches the incrementally built rollups.
+    ro = store.connect(read_only=True, db_path=db)
+    assert _parking(ro) == before
+    ro.close()
+    con = store.connect(db_path=db)
+    rollups = _rollup_contents(con)
+    store.refresh_rollups(con)
+    assert _rollup_contents(con) == rollups
+    con.close()
+
+
+def test_prune_reaches_into_archive(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    for day in (dt.datetime(2025, 9, 5), dt.datetime(2025, 10, 2), dt.datetime(2025, 10, 20),
+                dt.datetime(2025, 12, 1, 12)):
+        _load(con, day, 6)
+    cutoff = dt.date(2025, 10, 10)
+    expected = con.execute(
+        "SELECT count(*) FROM parking WHERE ts_local < ?", [cutoff]
+    ).fetchone()[0]
+    remaining = _parking(con)[expected:]
+    store.archive_closed_months(con, hot_months=1)
+
+    assert store.prune_before(con, cutoff) == expected
+    assert _parking(con) == remaining
+    assert not (tmp_path / "t_archive" / "month=2025-09").exists()
+    assert (tmp_path / "t_archive" / "month=2025-10").exists()
+    con.close()
+
+
+# The raw table as caches before the normalized layout stored it.
+_WIDE_TABLE = """
+CREATE TABLE {name} (
+    request_timestamp VARCHAR NOT NULL, ts_utc TIMESTAMP, ts_local TIMESTAMP,
+    node_type VARCHAR, garage VARCHAR, level VARCHAR, zone VARCHAR, name VARCHAR,
+    path VARCHAR NOT NULL, total_bays INTEGER, occupied_bays INTEGER,
+    available_bays INTEGER, occupancy_pct DOUBLE,
+    PRIMARY KEY (request_timestamp, path)
+)
+"""
+
+
+def test_legacy_parking_table_is_migrated(tmp_path):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    # Older cache files hold the raw rows directly in a ``parking`` table.
+    con.execute(_WIDE_TABLE.format(name="parking"))
+    con.execute(
+        "INSERT INTO parking (request_timestamp, path, node_type) VALUES ('2026-01-01T00:00:00', 'root', 'system')"
+    )
+    store.init_schema(con)
+    assert con.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = 'parking'"
+    ).fetchone()[0] == "VIEW"
+    assert store.row_count(con) == 1
+    assert store.insert_rows(con, [_row(dt.datetime(2026, 1, 1), "2026-01-01T00:00:00")]) == 0
+    con.close()
+
+
+def test_wide_cache_is_normalized_in_place(tmp_path):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    for day in (dt.datetime(2025, 11, 3), dt.datetime(2025, 12, 9)):
+        _load(con, day, 12)
+    store.archive_closed_months(con, hot_months=1)  # November goes to Parquet
+    store.refresh_rollups(con)
+    before, rollups = _parking(con), _rollup_contents(con)
+
+    # Rewrite the hot rows into the old wide table, as an older cache holds them.
+    con.execute("CREATE TABLE wide AS SELECT * FROM parking_hot")
+    for view in ("parking", "parking_hot"):
+        con.execute(f"DROP VIEW {view}")
+    con.execute("DROP TABLE readings; DROP TABLE snapshots; DROP TABLE nodes")
+    con.execute(_WIDE_TABLE.format(name="parking_hot"))
+    con.execute("INSERT INTO parking_hot SELECT * FROM wide; DROP TABLE wide")
+    con.close()
+
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    assert con.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = 'parking_hot'"
+    ).fetchone()[0] == "VIEW"
+    assert _parking(con) == before
+    # Archived months keep their snapshot rows, so the index covers all history.
+    assert con.execute("SELECT count(*) FROM snapshots").fetchone()[0] == 24
+    assert con.execute("SELECT count(*) FROM readings").fetchone()[0] == len(before) / 2
+    assert store.get_last_timestamp(con) == before[-1][0]
+    assert store.rollups_ready(con)
+    store.refresh_rollups(con)
+    assert _rollup_contents(con) == rollups
+
+    # New snapshots and nodes continue the id sequences.
+    _load(con, dt.datetime(2025, 12, 10), 1)
+    assert con.execute("SELECT count(DISTINCT snapshot_id), max(snapshot_id) FROM snapshots").fetchone() == (25, 25)
+    con.close()
+
+
+def test_normalized_rows_match_flatten(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    items = decode_items(make_items(dt.datetime(2026, 1, 5, 12), 5, garages=2, levels=3, zones=2))
+    items.append(("2026-01-05T19:00:00", {  # a zero-capacity node: occupancy_pct is NULL
+        "Name": "City", "TotalBays": 7, "OccupiedBays": 3,
+        "Zones": [{"Name": "Closed", "TotalBays": 0, "OccupiedBays": 0,
+                   "Zones": [{"Name": "L1", "TotalBays": 7, "OccupiedBays": 3}]}],
+    }))
+    rows = [row for ts, api in items for row in flatten_response(api, ts)]
+    assert store.insert_rows(con, rows) == len(rows)
+
+    rows.sort(key=lambda r: (r["request_timestamp"], r["path"]))
+    expected = [tuple(r[c] for c in COLUMNS) for r in rows]
+    assert con.execute("SELECT * FROM parking ORDER BY request_timestamp, path").fetchall() == expected
+    assert con.execute("SELECT count(*) FROM nodes").fetchone()[0] == (1 + 2 + 6 + 12) + 3  # one row per path
+    con.close()
+
+
+def test_compact_reclaims_free_space(tmp_path):
+    db = tmp_path / "t.duckdb"
+    con = store.connect(db_path=db)
+    store.init_schema(con)
+    _load(con, dt.datetime(2026, 1, 5), 2000)
+    store.refresh_rollups(con)
+    store.bump_generation(con)
+    before = _parking(con)
+    store.prune_before(con, dt.date(2026, 1, 11))  # frees most of the readings
+    kept = _parking(con)
+    con.close()
+
+    size, compacted = store.compact(db)
+    assert compacted < size
+    con = store.connect(read_only=True, db_path=db)
+    assert _parking(con) == kept == before[-len(kept):]
+    assert store.data_version(con).generation == 2
+    con.close()
+
+
+def _synced_file(path, start=dt.datetime(2026, 1, 5, 12), count=6):
+    con = store.connect(db_path=path)
+    store.init_schema(con)
+    items = make_items(start, count)
+    store.insert_arrow(con, flatten_items(items))
+    con.close()
+
+
+def test_pool_reuses_connection_and_reopens_after_writes(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    shared = store.ConnectionPool(db, idle_seconds=0)
+    try:
+        first = shared.execute("SELECT count(*) AS n FROM parking")["n"].iloc[0]
+        shared.execute("SELECT 1")
+        assert [t.reopened for t in shared.timings] == [True, False]
+        assert all(t.open_ms >= 0 and t.execute_ms >= 0 for t in shared.timings)
+
+        # Each thread checks out its own cursor of the one shared connection.
+        cursors = []
+        def grab():
+            with shared.cursor() as cur:
+                cursors.append(cur)
+        threads = [threading.Thread(target=grab) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with shared.cursor() as mine:
+            assert len({id(c) for c in [*cursors, mine]}) == 3
+
+        # A sync changes the file: the next checkout sees the new rows.
+        shared.close()  # what store.connect(read_only=False) does in-process
+        _synced_file(db, start=dt.datetime(2026, 1, 6, 12))
+        assert shared.execute("SELECT count(*) AS n FROM parking")["n"].iloc[0] == 2 * first
+        assert shared.timings[-1].reopened
+    finally:
+        shared.close()
+
+
+def test_pool_opens_the_file_outside_its_lock(tmp_path, monkeypatch):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    shared = store.ConnectionPool(db, idle_seconds=0)
+    opening, release, opens = threading.Event(), threading.Event(), []
+    real_open = store._open
+
+    def slow_open(*args, **kwargs):  # like waiting out another process's write lock
+        opens.append(args)
+        opening.set()
+        release.wait(5)
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(store, "_open", slow_open)
+    try:
+        threads = [threading.Thread(target=shared.execute, args=("SELECT 1",)) for _ in range(3)]
+        threads[0].start()
+        assert opening.wait(5)
+        for t in threads[1:]:
+            t.start()
+        assert shared._cond.acquire(timeout=1)  # not held while the file opens
+        shared._cond.release()
+        release.set()
+        for t in threads:
+            t.join(5)
+        assert len(opens) == 1  # the waiting checkouts reuse that connection
+        assert [t.reopened for t in shared.timings].count(True) == 1
+    finally:
+        release.set()
+        shared.close()
+
+
+def test_writable_connect_releases_the_shared_pool(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    shared = store.pool(db)
+    try:
+        shared.execute("SELECT 1")
+        # Would raise "different configuration" if the read-only handle stayed open.
+        store.connect(db_path=db).close()
+        assert shared.execute("SELECT count(*) AS n FROM parking")["n"].iloc[0] > 0
+    finally:
+        shared.close()
+
+
+def test_ensure_rollups_during_an_in_process_sync(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    try:
+        with store.writer(db) as con:
+            store.refresh_rollups(con)
+            # A separate read-only handle would clash with the writer's configuration.
+            store.ensure_rollups(db)
+
+        # A legacy cache waits for the writer, then builds its rollups.
+        _synced_file(db, start=dt.datetime(2026, 1, 6, 12))
+        with store.connect(db_path=db) as con:
+            con.execute("DELETE FROM daily_rollup")
+        with store.writer(db):
+            waiter = threading.Thread(target=store.ensure_rollups, args=(db,))
+            waiter.start()
+            waiter.join(0.2)
+            assert waiter.is_alive()
+        waiter.join(30)
+        assert store.pool(db).execute("SELECT count(*) AS n FROM daily_rollup")["n"].iloc[0] > 0
+    finally:
+        store.pool(db).close()
+
+
+def test_pool_closes_when_idle(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    shared = store.ConnectionPool(db, idle_seconds=0.05)
+    shared.execute("SELECT 1")
+    deadline = time.monotonic() + 5
+    while shared._con is not None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert shared._con is None
+
+
+def test_pool_lets_go_while_a_writer_waits(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    shared = store.ConnectionPool(db, idle_seconds=60)
+    try:
+        shared.execute("SELECT 1")
+        assert shared._con is not None and not store.writer_waiting(db)
+        with store._write_intent(db):
+            assert store.writer_waiting(db)
+            shared.execute("SELECT 1")
+            assert shared._con is None  # closed on release, not after idle_seconds
+        shared.execute("SELECT 1")
+        assert shared._con is not None
+    finally:
+        shared.close()
+
+
+_SYNC_WRITE = """
+import datetime as dt, sys
+from parking import store
+from parking.synthetic import flatten_items, make_items
+with store.writer(sys.argv[1], wait=10) as con:
+    store.insert_arrow(con, flatten_items(make_items(dt.datetime(2026, 1, 6, 12), 6)))
+    store.bump_generation(con)
+"""
+
+
+def test_polling_readers_do_not_starve_another_process_writer(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    shared = store.ConnectionPool(db, idle_seconds=60)
+    stop = threading.Event()
+
+    def poll():  # like the app's data-version fragment, far more often
+        while not stop.is_set():
+            with shared.cursor() as cur:
+                store.data_version(cur)
+            time.sleep(0.02)
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    try:
+        done = subprocess.run(
+            [sys.executable, "-c", _SYNC_WRITE, str(db)],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert done.returncode == 0, done.stderr
+        with shared.cursor() as cur:
+            assert store.data_version(cur).generation == 1
+    finally:
+        stop.set()
+        poller.join()
+        shared.close()
+
+
+def test_data_version_is_bumped_by_writes(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    store.init_schema(con)
+    assert store.data_version(con) == (0, 0, None)  # never synced: counted directly
+
+    store.insert_rows(
+        con,
+        [
+            _row(dt.datetime(2025, 2, 10, 12), "2025-02-10T18:00:00"),
+            _row(dt.datetime(2026, 1, 1, 12), "2026-01-01T18:00:00"),
+        ],
+    )
+    assert store.bump_generation(con) == (1, 2, "2026-01-01T18:00:00")
+    assert store.data_version(con) == (1, 2, "2026-01-01T18:00:00")
+
+    store.prune_before(con, dt.date(2025, 1, 1))  # removes nothing -> no bump
+    assert store.data_version(con).generation == 1
+    store.prune_before(con, dt.date(2025, 8, 20))
+    assert store.data_version(con) == (2, 1, "2026-01-01T18:00:00")
+    con.close()
+
+
+def test_publish_replica_copies_committed_state(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    assert store.read_path(db, replica=True) == db  # nothing published yet
+    con = store.connect(db_path=db)
+    store.bump_generation(con)
+    replica = store.publish_replica(con)
+    expected = _parking(con), store.data_version(con)
+    con.close()
+
+    assert replica == store.replica_path(db) == store.read_path(db, replica=True)
+    assert replica.name == "t.read.duckdb"
+    assert [p.name for p in tmp_path.iterdir() if "staging" in p.name] == []
+    con = store.connect(read_only=True, db_path=replica)
+    assert (_parking(con), store.data_version(con)) == expected
+    con.close()
+
+
+_HOLD_WRITER = """
+import datetime as dt, sys
+from parking import store
+from parking.synthetic import flatten_items, make_items
+con = store.connect(db_path=sys.argv[1])
+items = make_items(dt.datetime(2026, 1, 6, 12), 6)
+store.insert_arrow(con, flatten_items(items))
+store.bump_generation(con)
+store.publish_replica(con)
+print("published", flush=True)
+sys.stdin.readline()
+con.close()
+"""
+
+
+def test_replica_readers_keep_reading_while_another_process_writes(tmp_path):
+    db = tmp_path / "t.duckdb"
+    _synced_file(db)
+    con = store.connect(db_path=db)
+    store.bump_generation(con)
+    store.publish_replica(con)
+    con.close()
+    shared = store.ConnectionPool(db, idle_seconds=0, replica=True)
+    first = shared.execute("SELECT count(*) AS n FROM parking")["n"].iloc[0]
+
+    writer = subprocess.Popen(
+        [sys.executable, "-c", _HOLD_WRITER, str(db)],
+        cwd=Path(__file__).resolve().parent.parent,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert writer.stdout.readline().strip() == "published"
+        # The cache file is locked by the writer; the replica is not.
+        with pytest.raises(duckdb.IOException):
+            duckdb.connect(str(db), read_only=True)
+        assert shared.execute("SELECT count(*) AS n FROM parking")["n"].iloc[0] == 2 * first
+        assert shared.timings[-1].reopened  # switched to the newly published file
+        with shared.cursor() as cur:
+            assert store.data_version(cur).generation == 2
+    finally:
+        writer.communicate("\n", timeout=30)
+        shared.close()
+    assert writer.returncode == 0
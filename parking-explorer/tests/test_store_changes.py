@@ -0,0 +1,187 @@
+"""Change-only storage (``PARKING_STORAGE_MODE=changes``) must be invisible to readers:
+every test builds the same history in a full-row cache and a change-only one
+and compares what ``parking`` and the rollups return (temp DBs, no AWS)."""
+
+from __future__ import annotations
+
+import datetime as dt
+
+import pytest
+
+from parking import anomalies, store
+from parking.synthetic import flatten_items, make_items
+
+START = dt.datetime(2025, 11, 29, 18)  # spans a month boundary for the archive test
+
+
+def _resum(node: dict) -> None:
+    for child in node.get("Zones") or []:
+        _resum(child)
+    if node.get("Zones"):
+        node["TotalBays"] = sum(c["TotalBays"] for c in node["Zones"])
+        node["OccupiedBays"] = sum(c["OccupiedBays"] for c in node["Zones"])
+
+
+def _leaves(node: dict):
+    children = node.get("Zones") or []
+    if not children:
+        yield node
+    for child in children:
+        yield from _leaves(child)
+
+
+def _quiet_nights(ts: dt.datetime, api: dict) -> None:
+    """Overnight (UTC 06-12) nothing moves; one zone vanishes for a few hours and
+    comes back; a level briefly reports zero capacity."""
+    if 6 <= ts.hour < 12:
+        for leaf in _leaves(api):
+            leaf["OccupiedBays"] = 1
+    if dt.datetime(2025, 11, 30, 2) <= ts < dt.datetime(2025, 11, 30, 5):
+        level = api["Zones"][0]["Zones"][0]
+        level["Zones"] = level["Zones"][:1]
+    if ts == dt.datetime(2025, 12, 1, 8):
+        for leaf in _leaves(api["Zones"][1]["Zones"][1]):
+            leaf["TotalBays"] = leaf["OccupiedBays"] = 0
+    _resum(api)
+
+
+def _batches(sizes: list[int]) -> list:
+    items = make_items(START, sum(sizes), garages=2, levels=2, zones=2, edit=_quiet_nights)
+    pages, at = [], 0
+    for n in sizes:
+        chunk = items[at:at + n]
+        pages.append(flatten_items(chunk))
+        at += n
+    return pages
+
+
+def _cache(path, storage: str, pages: list, order=None):
+    """A cache holding ``pages``, each one synced like a sync run would."""
+    con = store.connect(db_path=path)
+    store.init_schema(con, storage=storage)
+    for page in pages if order is None else [pages[i] for i in order]:
+        last = store.get_last_timestamp(con)
+        store.insert_arrow(con, page)
+        store.collapse_unchanged(con)
+        store.refresh_rollups(con, last)
+    return con
+
+
+def _rows(con) -> list:
+    return con.execute("SELECT * FROM parking ORDER BY request_timestamp, path").fetchall()
+
+
+def _rollups(con) -> dict:
+    return {
+        table: [
+            tuple(round(v, 9) if isinstance(v, float) else v for v in row)
+            for row in con.execute(f"SELECT * FROM {table} ORDER BY ALL").fetchall()
+        ]
+        for table in ("garage_snapshots", "hourly_rollup", "daily_rollup", "latest_snapshot")
+    }
+
+
+def _readings(con) -> int:
+    return con.execute("SELECT count(*) FROM readings").fetchone()[0]
+
+
+@pytest.fixture()
+def pair(tmp_path):
+    pages = _batches([150, 1, 40, 97])
+    full = _cache(tmp_path / "full.duckdb", "full", pages)
+    changes = _cache(tmp_path / "changes.duckdb", "changes", pages)
+    yield full, changes
+    full.close()
+    changes.close()
+
+
+def test_as_of_view_matches_full_rows(pair):
+    full, changes = pair
+    assert _rows(changes) == _rows(full)
+    assert _rollups(changes) == _rollups(full)
+    assert anomalies.detect(changes).equals(anomalies.detect(full))
+    assert store.get_last_timestamp(changes) == store.get_last_timestamp(full)
+    for con in pair:  # counted from the stored readings, not the view
+        assert store.bump_generation(con).rows == store.row_count(con)
+    # Quiet nights are stored once per node rather than once per snapshot.
+    assert _readings(changes) < 0.75 * _readings(full)
+
+
+def test_vanished_node_is_absent_not_carried_forward(pair):
+    full, changes = pair
+    sql = (
+        "SELECT count(*) FROM parking WHERE path = 'Second Avenue > Level 1 > Zone 2' "
+        "AND ts_utc >= '2025-11-30 02:00' AND ts_utc < '2025-11-30 05:00'"
+    )
+    assert changes.execute(sql).fetchone()[0] == full.execute(sql).fetchone()[0] == 0
+    gone = changes.execute("SELECT count(*) FROM readings WHERE total_bays IS NULL").fetchone()[0]
+    assert gone == 1
+
+
+def test_backfill_pages_in_any_order(tmp_path):
+    pages = _batches([60, 60, 60])
+    full = _cache(tmp_path / "full.duckdb", "full", pages)
+    con = store.connect(db_path=tmp_path / "changes.duckdb")
+    store.init_schema(con, storage="changes")
+    for i in (2, 0, 1):  # parallel scan segments deliver pages out of order
+        store.insert_arrow(con, pages[i])
+    store.collapse_unchanged(con)
+    store.refresh_rollups(con)
+    assert _rows(con) == _rows(full)
+    assert store.collapse_unchanged(con) == 0  # nothing new past the watermark
+    assert _rows(con) == _rows(full)
+    con.close()
+    full.close()
+
+
+def test_converting_between_modes_round_trips(tmp_path):
+    pages = _batches([200, 88])
+    con = _cache(tmp_path / "t.duckdb", "full", pages)
+    before, readings = _rows(con), con.execute("SELECT * FROM readings ORDER BY ALL").fetchall()
+
+    store.init_schema(con, storage="changes")
+    assert store.storage_mode(con) == "changes"
+    assert _readings(con) < len(readings)
+    assert _rows(con) == before
+    # Later syncs keep collapsing from where the conversion stopped.
+    extra = _batches([288, 12])[1]
+    last = store.get_last_timestamp(con)
+    store.insert_arrow(con, extra)
+    store.collapse_unchanged(con)
+    store.refresh_rollups(con, last)
+    grown = _rows(con)
+
+    store.init_schema(con, storage="full")
+    assert store.storage_mode(con) == "full"
+    assert _rows(con) == grown
+    assert con.execute("SELECT * FROM readings ORDER BY ALL").fetchall()[: len(readings)] == readings
+    con.close()
+
+
+def test_prune_and_archive_keep_the_state_they_cut_through(pair):
+    full, changes = pair
+    for con in pair:
+        store.archive_closed_months(con, hot_months=1)  # November -> Parquet
+        store.prune_before(con, dt.date(2025, 11, 30))
+        store.refresh_rollups(con)
+    assert _rows(changes) == _rows(full)
+    assert _rollups(changes) == _rollups(full)
+    assert _readings(changes) < _readings(full)
+    for con in pair:
+        assert store.bump_generation(con).rows == store.row_count(con)
+
+
+def test_reinserting_cached_snapshots_is_a_no_op(pair):
+    _, changes = pair
+    before = _readings(changes)
+    for page in _batches([150, 1, 40, 97]):
+        assert store.insert_arrow(changes, page) == 0
+    assert store.collapse_unchanged(changes) == 0
+    assert _readings(changes) == before
+
+
+def test_unknown_storage_mode_is_rejected(tmp_path):
+    con = store.connect(db_path=tmp_path / "t.duckdb")
+    with pytest.raises(ValueError):
+        store.init_schema(con, storage="sparse")
+    con.close()
@@ -0,0 +1,329 @@
+"""Sync tests against a moto DynamoDB stand-in and a temp DuckDB file."""
+
+from __future__ import annotations
+
+import contextlib
+import datetime as dt
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("moto")
+
+from parking import gsi, store, sync as sync_mod  # noqa: E402
+from parking.config import GSI_NAME, TABLE_NAME  # noqa: E402
+from parking.flatten import flatten_response  # noqa: E402
+from parking.synthetic import make_items  # noqa: E402
+
+START = dt.datetime(2026, 1, 5, 12, 0)
+
+
+def _put(client, items):
+    for item in items:
+        client.put_item(TableName=TABLE_NAME, Item=item)
+
+
+def _snapshot(db_path):
+    con = store.connect(read_only=True, db_path=db_path)
+    try:
+        return con.execute(
+            "SELECT request_timestamp, path, occupied_bays FROM parking ORDER BY 1, 2"
+        ).fetchall()
+    finally:
+        con.close()
+
+
+@pytest.mark.parametrize("segments", [1, 4])
+def test_backfill_then_incremental(table, tmp_path, segments):
+    _put(table, make_items(START, 24))
+    db = tmp_path / "p.duckdb"
+
+    calls = []
+    first = sync_mod.sync(db_path=db, progress=lambda *a: calls.append(a), segments=segments)
+    assert first["mode"] == "scan"
+    assert first["new_items"] == 24
+    assert first["segments"] == segments
+    assert first["rows_inserted"] == first["total_rows"] > 0
+    # Progress stays cumulative and ends on the summary totals.
+    assert calls == sorted(calls)
+    assert calls[-1] == (first["new_items"], first["scanned"], first["rows_inserted"])
+
+    _put(table, make_items(START + dt.timedelta(hours=2), 6))
+    second = sync_mod.sync(db_path=db, segments=segments)
+    assert second["new_items"] == 6
+    assert second["total_rows"] == first["total_rows"] + second["rows_inserted"]
+    assert (first["generation"], second["generation"]) == (1, 2)
+
+    con = store.connect(read_only=True, db_path=db)
+    try:
+        assert store.data_version(con) == (2, second["total_rows"], store.get_last_timestamp(con))
+    finally:
+        con.close()
+
+
+def test_parallel_scan_matches_sequential(table, tmp_path):
+    _put(table, make_items(START, 40))
+    sync_mod.sync(db_path=tmp_path / "seq.duckdb", segments=1)
+    sync_mod.sync(db_path=tmp_path / "par.duckdb", segments=8)
+    assert _snapshot(tmp_path / "seq.duckdb") == _snapshot(tmp_path / "par.duckdb")
+
+
+def test_scan_error_propagates(table, tmp_path, monkeypatch):
+    _put(table, make_items(START, 4))
+
+    class Boom(Exception):
+        pass
+
+    def bad_scan(**kwargs):
+        raise Boom
+
+    client = type("C", (), {"scan": staticmethod(bad_scan), "describe_table": table.describe_table})
+    monkeypatch.setattr(sync_mod, "_client", client)
+    with pytest.raises(Boom):
+        sync_mod.sync(db_path=tmp_path / "p.duckdb", segments=3)
+
+
+def test_pipeline_with_small_pages_and_tight_queues(table, tmp_path, monkeypatch):
+    """Many pages through depth-1 queues: backpressure must not deadlock or drop pages."""
+    _put(table, make_items(START, 30))
+
+    class SmallPages:
+        describe_table = table.describe_table
+
+        def scan(self, **kwargs):
+            return table.scan(Limit=2, **kwargs)
+
+    monkeypatch.setattr(sync_mod, "_client", SmallPages)
+    monkeypatch.setattr(sync_mod, "PIPELINE_DEPTH", 1)
+    monkeypatch.setattr(sync_mod, "INSERT_BATCH_ROWS", 1)
+
+    calls = []
+    result = sync_mod.sync(db_path=tmp_path / "p.duckdb", progress=lambda *a: calls.append(a), segments=3)
+    assert result["new_items"] == 30
+    assert len(calls) >= 15  # one staged batch (and progress call) per 2-item page
+    assert set(result["timings"]) == {
+        "fetch", "decode", "stage", "insert", "collapse", "rollups", "anomalies", "archive",
+        "publish", "wall",
+    }
+    assert all(v >= 0 for v in result["timings"].values())
+    assert _snapshot(tmp_path / "p.duckdb") == _snapshot_of(make_items(START, 30), tmp_path)
+
+
+def _snapshot_of(items, tmp_path):
+    """Expected table contents for ``items``, built without the pipeline."""
+    con = store.connect(db_path=tmp_path / "expected.duckdb")
+    try:
+        store.init_schema(con)
+        rows = []
+        for item in items:
+            api = json.loads(item["api_response"]["S"])
+            rows.extend(flatten_response(api, item["request_timestamp"]["S"]))
+        store.insert_rows(con, rows)
+    finally:
+        con.close()
+    return _snapshot(tmp_path / "expected.duckdb")
+
+
+def test_background_sync_keeps_pooled_readers_working(table, tmp_path, monkeypatch):
+    db = tmp_path / "p.duckdb"
+    _put(table, make_items(START, 6))
+    sync_mod.sync(db_path=db)
+    shared = store.pool(db)
+    with shared.cursor() as con:
+        before = store.data_version(con)
+    _put(table, make_items(START + dt.timedelta(hours=1), 20))
+
+    class SlowPages:
+        describe_table = table.describe_table
+
+        def scan(self, **kwargs):
+            time.sleep(0.05)
+            return table.scan(Limit=2, **kwargs)
+
+    monkeypatch.setattr(sync_mod, "_client", SlowPages)
+    monkeypatch.setattr(sync_mod, "INSERT_BATCH_ROWS", 1)
+
+    job = sync_mod.BackgroundSync(db)
+    assert job.start()
+    assert not job.start()  # one at a time
+    reads = []
+    try:
+        while job.running:
+            with shared.cursor() as con:
+                reads.append(store.data_version(con))
+            time.sleep(0.01)
+    finally:
+        job.wait()
+        shared.close()
+
+    assert job.error is None and job.result["new_items"] == 20
+    assert job.runs == 1 and job.progress[0] == 20
+    # Readers were served throughout, on the previous version until the end.
+    assert reads and all(v.generation in (before.generation, job.result["generation"]) for v in reads)
+    assert reads[0] == before
+    expected = make_items(START, 6) + make_items(START + dt.timedelta(hours=1), 20)
+    assert _snapshot(db) == _snapshot_of(expected, tmp_path)
+
+
+def test_fetch_runs_before_the_cache_file_is_opened_for_writing(table, tmp_path, monkeypatch):
+    db = tmp_path / "p.duckdb"
+    _put(table, make_items(START, 6))
+    sync_mod.sync(db_path=db)
+    _put(table, make_items(START + dt.timedelta(hours=1), 10))
+    events = []
+
+    class RecordedPages:
+        describe_table = table.describe_table
+
+        def scan(self, **kwargs):
+            events.append("scan")
+            return table.scan(Limit=2, **kwargs)
+
+    real_writer = store.writer
+
+    @contextlib.contextmanager
+    def recorded_writer(*args, **kwargs):
+        events.append("writer")
+        with real_writer(*args, **kwargs) as con:
+            yield con
+
+    monkeypatch.setattr(sync_mod, "_client", RecordedPages)
+    monkeypatch.setattr(store, "writer", recorded_writer)
+    result = sync_mod.sync(db_path=db, segments=2)
+    assert result["new_items"] == 10
+    assert events.count("writer") == 1 and events[-1] == "writer"
+    assert not list(tmp_path.glob(".p.duckdb.*"))  # the staging file is cleaned up
+    expected = make_items(START, 6) + make_items(START + dt.timedelta(hours=1), 10)
+    assert _snapshot(db) == _snapshot_of(expected, tmp_path)
+
+
+def test_sync_publishes_a_read_replica(table, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_mod, "READ_REPLICA", True)
+    monkeypatch.setattr(store, "READ_REPLICA", True)
+    db = tmp_path / "p.duckdb"
+    _put(table, make_items(START, 6))
+    first = sync_mod.sync(db_path=db)
+    assert store.read_path(db) == store.replica_path(db)
+    shared = store.pool(db)
+    with shared.cursor() as con:
+        assert store.data_version(con).generation == first["generation"]
+    _put(table, make_items(START + dt.timedelta(hours=1), 20))
+
+    class SlowPages:
+        describe_table = table.describe_table
+
+        def scan(self, **kwargs):
+            time.sleep(0.05)
+            return table.scan(Limit=2, **kwargs)
+
+    monkeypatch.setattr(sync_mod, "_client", SlowPages)
+    monkeypatch.setattr(sync_mod, "INSERT_BATCH_ROWS", 1)
+
+    job = sync_mod.BackgroundSync(db)
+    assert job.start()
+    reads = []
+    try:
+        while job.running:
+            with shared.cursor() as con:
+                reads.append((store._db_file(con), store.data_version(con).generation))
+            time.sleep(0.01)
+        # Readers stayed on the published replica; the writer had the cache file.
+        assert reads and {path for path, _ in reads} == {store.replica_path(db)}
+        assert {gen for _, gen in reads} <= {first["generation"], job.result["generation"]}
+        assert reads[0][1] == first["generation"]
+        with shared.cursor() as con:
+            assert store.data_version(con).generation == job.result["generation"]
+    finally:
+        job.wait()
+        shared.close()
+    assert job.error is None and job.result["timings"]["publish"] > 0
+    assert _snapshot(store.replica_path(db)) == _snapshot(db)
+
+
+def _create_with_index(client, projection: dict) -> None:
+    client.delete_table(TableName=TABLE_NAME)
+    client.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "request_timestamp", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "request_timestamp", "AttributeType": "S"},
+            {"AttributeName": gsi.BUCKET_ATTR, "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": GSI_NAME,
+                "KeySchema": [
+                    {"AttributeName": gsi.BUCKET_ATTR, "KeyType": "HASH"},
+                    {"AttributeName": "request_timestamp", "KeyType": "RANGE"},
+                ],
+                "Projection": projection,
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def _tagged(items):
+    """Items as the updated collector writes them, with the bucket attribute."""
+    return [{**i, gsi.BUCKET_ATTR: {"S": gsi.bucket_of(i["request_timestamp"]["S"])}} for i in items]
+
+
+def test_bucket_index_query_sync_reads_only_new_items(table, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_mod, "SYNC_MODE", "auto")
+    _create_with_index(table, {"ProjectionType": "ALL"})
+    old = make_items(START - dt.timedelta(days=40), 12)  # spans the month before
+    _put(table, old)  # stored before the collector tagged items
+    assert gsi.backfill(table) == {"updated": 12, "scanned": 12}
+    assert gsi.backfill(table)["updated"] == 0  # idempotent
+
+    db = tmp_path / "q.duckdb"
+    first = sync_mod.sync(db_path=db)
+    assert first["mode"] == "query" and first["new_items"] == 12
+
+    new = make_items(START, 8)
+    _put(table, _tagged(new))
+    second = sync_mod.sync(db_path=db)
+    assert second["mode"] == "query"
+    assert second["new_items"] == second["scanned"] == 8  # no already-synced item read
+    assert _snapshot(db) == _snapshot_of(old + new, tmp_path)
+
+
+def test_sync_falls_back_to_scan_without_a_usable_index(table, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_mod, "SYNC_MODE", "auto")
+    assert sync_mod.sync(db_path=tmp_path / "a.duckdb")["mode"] == "scan"  # no index
+    _create_with_index(table, {"ProjectionType": "KEYS_ONLY"})  # can't decode from it
+    _put(table, _tagged(make_items(START, 4)))
+    result = sync_mod.sync(db_path=tmp_path / "b.duckdb")
+    assert result["mode"] == "scan" and result["new_items"] == 4
+
+
+def test_query_mode_is_opt_in(table, tmp_path):
+    # The collector may not tag items yet; the sparse index would never return them.
+    _create_with_index(table, {"ProjectionType": "ALL"})
+    _put(table, make_items(START, 4))
+    result = sync_mod.sync(db_path=tmp_path / "a.duckdb")
+    assert result["mode"] == "scan" and result["new_items"] == 4
+
+
+def test_query_mode_backfill_without_a_start_date_scans(table, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_mod, "SYNC_MODE", "query")
+    monkeypatch.setattr(sync_mod, "START_DATE", None)
+    _put(table, make_items(START, 4))
+    result = sync_mod.sync(db_path=tmp_path / "a.duckdb")
+    assert result["mode"] == "scan" and result["new_items"] == 4
+
+
+def test_unknown_sync_mode_is_rejected():
+    done = subprocess.run(
+        [sys.executable, "-c", "import parking.config"],
+        cwd=Path(__file__).resolve().parent.parent,
+        env={**os.environ, "PARKING_SYNC_MODE": "sacn"},
+        capture_output=True,
+        text=True,
+    )
+    assert done.returncode != 0 and "PARKING_SYNC_MODE must be one of" in done.stderr